@@ -7,10 +7,24 @@ Revit → Grasshopper → ArcGIS Online
 
 Modules:
 - merge_engine: Core sync & versioning
+- content_hash: Canonical content hashes shared by sync, diffs and publishing
+- metadata_store: Sync metadata backends (JSON, SQLite)
+- object_store: Columnar in-memory object storage
+- checkpoints: Full/delta checkpoint chains and compaction
 - revit_gh_bridge: Revit ↔ GH data exchange
+- snapshot_diff: Change sets between successive Revit exports
+- audit_store: Rotating, indexed audit trail of GH imports
+- geometry_tools: Export-time geometry simplification and quantization
 - agol_exporter: GH → ArcGIS Online
+- agol_session: Pooled, retrying HTTP session for AGOL calls
+- agol_async: Concurrent, rate-limited AGOL publishing engine
+- agol_upsert: Diff-based republishing to existing feature services
 - integration_pipeline: Main orchestrator
 - gh_helper: Grasshopper utilities
+- geo_exchange: JSON + binary coordinate sidecar exchange format
+- json_stream: Incremental reader for large JSON / NDJSON files
+- ndjson_exchange: Appendable NDJSON exchange format with optional parallel loading
+- artifact_io: Compressed/compact JSON artifact I/O
 - config: Configuration
 
 Quick start:
@@ -0,0 +1,479 @@
+"""
+Asynchronous AGOL publishing engine
+Creates services and adds, updates and deletes features with many requests
+in flight, bounded by a concurrency cap and a token-bucket rate limit.
+Requests go through the authentication's pooled, retrying AGOLSession on a
+thread pool, so retries, timeouts and token refresh behave exactly as in
+the sync API (agol_exporter.AGOLUploader wraps this class).
+
+Example:
+    uploader = AsyncAGOLUploader(auth, concurrency=16, requests_per_second=20)
+    reports = asyncio.run(uploader.upload_layers({service_id: features, ...}))
+"""
+
+import asyncio
+import json
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Dict, List, Any, Callable, Coroutine, Optional, Tuple
+import logging
+
+from artifact_io import DEFAULT
+from config import AGOL_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# AGOL error codes for invalid/expired (498) and missing (499) tokens
+INVALID_TOKEN_CODES = (498, 499)
+
+
+def plan_batches(encoded: List[str], max_count: int, max_bytes: int) -> List[Tuple[int, int]]:
+    """
+    Split serialized features into (start, end) batches
+
+    Each batch holds at most max_count features and its JSON array at most
+    max_bytes bytes (a single larger feature gets a batch of its own).
+    """
+    batches = []
+    start, size = 0, 2  # "[]"
+    for i, text in enumerate(encoded):
+        feature_bytes = len(text.encode("utf-8")) + 1  # separator
+        if i > start and (i - start >= max_count or size + feature_bytes > max_bytes):
+            batches.append((start, i))
+            start, size = i, 2
+        size += feature_bytes
+    if start < len(encoded):
+        batches.append((start, len(encoded)))
+    return batches
+
+
+def merge_results(batches: List[Tuple[int, int]], results: List[Any],
+                  key: str = "addResults") -> Dict[str, Any]:
+    """
+    One report from per-batch results
+
+    results holds each batch's result list (addResults, updateResults or
+    deleteResults), or the error (str) of a batch that failed as a whole;
+    its items get failed entries so that report[key] stays aligned with the
+    input.
+    """
+    merged, failed_batches = [], []
+    for index, ((start, end), result) in enumerate(zip(batches, results)):
+        if isinstance(result, list):
+            merged.extend(result)
+        else:
+            failed_batches.append({"batch": index, "start": start, "count": end - start, "error": result})
+            merged.extend({"success": False, "error": {"description": result}}
+                          for _ in range(end - start))
+    success_count = sum(1 for r in merged if r.get("success"))
+    return {
+        key: merged,
+        "success_count": success_count,
+        "failure_count": len(merged) - success_count,
+        "batches": len(batches),
+        "failed_batches": failed_batches
+    }
+
+
+def merge_add_results(batches: List[Tuple[int, int]], results: List[Any]) -> Dict[str, Any]:
+    return merge_results(batches, results, "addResults")
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """Run a coroutine to completion from sync code (also inside a running event loop)"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    # Called from async code (e.g. a notebook): use a loop on another thread
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter for coroutines
+
+    Args:
+        rate: Tokens (requests) per second; None disables limiting
+        capacity: Burst size (default: one second's worth, at least 1)
+    """
+
+    def __init__(self, rate: Optional[float], capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AsyncAGOLUploader:
+    """Concurrent, rate-limited AGOL operations"""
+
+    def __init__(self, auth: Any, max_batch_size: int = None, max_batch_bytes: int = None,
+                 concurrency: int = None, requests_per_second: Any = DEFAULT,
+                 burst: float = None, timeout: float = None):
+        """
+        Args:
+            auth: agol_exporter.AGOLAuthentication (token and session)
+            max_batch_size: Max features per request
+            max_batch_bytes: Max JSON payload bytes per request
+            concurrency: Max requests in flight (shared by all calls on this uploader)
+            requests_per_second: Token-bucket rate (None: unlimited)
+            burst: Token-bucket capacity
+            timeout: Request timeout in seconds (default: the session's)
+
+        Unset arguments default to AGOL_CONFIG.
+        """
+        self.auth = auth
+        self.portal_url = auth.portal_url
+        self.max_batch_size = max_batch_size or AGOL_CONFIG["max_batch_size"]
+        self.max_batch_bytes = max_batch_bytes or AGOL_CONFIG["max_batch_bytes"]
+        self.concurrency = concurrency or AGOL_CONFIG["upload_workers"]
+        self.timeout = timeout
+        if requests_per_second is DEFAULT:
+            requests_per_second = AGOL_CONFIG["requests_per_second"]
+        self.bucket = TokenBucket(requests_per_second, burst or AGOL_CONFIG["rate_burst"])
+
+        # Feature service URL by item ID (layer operations address the service, not the item)
+        self.service_urls: Dict[str, str] = {}
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # asyncio primitives belong to one event loop
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _limit(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.concurrency)
+        return semaphore
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency,
+                                                thread_name_prefix="agol")
+        return self._executor
+
+    async def _token(self) -> Optional[str]:
+        # May block on a refresh; keep that off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self.auth.get_token)
+
+    async def _post(self, url: str, payload: Callable[[], Dict[str, Any]],
+                    idempotent: bool) -> Dict[str, Any]:
+        """POST the form built by payload() (built only once a slot is free, to bound memory)"""
+        async with self._limit():
+            await self.bucket.acquire()
+            call = partial(self.auth.session.post_json, url, payload(),
+                           timeout=self.timeout, idempotent=idempotent)
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), call)
+
+    async def _post_batch(self, url: str, key: Optional[str], fields: Callable[[], Dict[str, Any]],
+                          idempotent: bool) -> Any:
+        """
+        Result list (result[key]) of one batch, or the error message if the
+        request failed; with key None the whole result
+        """
+        for attempt in range(2):
+            token = await self._token()
+            try:
+                result = await self._post(url, lambda: {**fields(), "token": token, "f": "json"}, idempotent)
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+
+            error = result.get("error")
+            if attempt == 0 and isinstance(error, dict) and error.get("code") in INVALID_TOKEN_CODES:
+                # Rejected before anything was applied: retry once with a new token
+                logger.warning(f"AGOL rejected the token ({error.get('code')}), refreshing")
+                self.auth.invalidate(token)
+                continue
+            break
+
+        if key is None and "error" not in result:
+            return result
+        if key in result:
+            return result[key]
+        return str(result.get("error", result))
+
+    async def _send_batches(self, service_id: str, operation: str, key: str, items: List[str],
+                            batches: List[Tuple[int, int]],
+                            fields: Callable[[List[str]], Dict[str, Any]],
+                            idempotent: bool) -> Dict[str, Any]:
+        url = await self._layer_url(service_id, operation)
+        if url is None:
+            results = [f"Unknown feature service URL of {service_id}"] * len(batches)
+        else:
+            results = await asyncio.gather(*(
+                self._post_batch(url, key, partial(fields, items[start:end]), idempotent)
+                for start, end in batches
+            ))
+        report = merge_results(batches, list(results), key)
+
+        for failed in report["failed_batches"]:
+            logger.error(f"{operation} batch {failed['batch']} ({failed['count']} items) failed: "
+                         f"{failed['error']}")
+        logger.info(f"✅ {operation}: {report['success_count']}/{len(items)} succeeded "
+                    f"in {len(batches)} batches")
+        return report
+
+    async def service_url(self, service_id: str) -> Optional[str]:
+        """Feature service URL of an item (cached; looked up in the item details if unknown)"""
+        url = self.service_urls.get(service_id)
+        if url:
+            return url
+
+        token = await self._token()
+        try:
+            result = await self._post(f"{self.portal_url}/content/items/{service_id}",
+                                      lambda: {"token": token, "f": "json"}, idempotent=True)
+        except Exception as e:
+            logger.error(f"Error reading item {service_id}: {e}")
+            return None
+        url = result.get("url")
+        if not url:
+            logger.error(f"Item {service_id} has no feature service URL: {result.get('error', result)}")
+            return None
+        self.service_urls[service_id] = url
+        return url
+
+    async def _layer_url(self, service_id: str, operation: str) -> Optional[str]:
+        """<service URL>/<layer>/<operation> (None if the service URL is unknown)"""
+        url = await self.service_url(service_id)
+        if not url:
+            return None
+        return f"{url.rstrip('/')}/{AGOL_CONFIG['layer_index']}/{operation}"
+
+    def _feature_batches(self, features: List[Dict[str, Any]]) -> Tuple[List[str], List[Tuple[int, int]]]:
+        encoded = [json.dumps(feature, separators=(",", ":")) for feature in features]
+        return encoded, plan_batches(encoded, self.max_batch_size, self.max_batch_bytes)
+
+    @staticmethod
+    def _feature_fields(encoded: List[str]) -> Dict[str, Any]:
+        return {"features": "[" + ",".join(encoded) + "]"}
+
+    # Operations
+
+    async def create_feature_service(self, title: str, description: str,
+                                     tags: List[str] = None) -> Optional[str]:
+        """Create a feature service, returning its item ID (None on failure)"""
+        token = await self._token()
+        if not token:
+            logger.error("Not authenticated with AGOL")
+            return None
+
+        create_url = f"{self.portal_url}/content/users/{self.auth.username}/createService"
+        payload = {
+            "name": title.replace(" ", "_"),
+            "displayName": title,
+            "description": description,
+            "tags": ",".join(tags or []),
+            "serviceDescription": description,
+            "hasStaticData": False,
+            "maxRecordCount": 2000,
+            "token": token,
+            "f": "json"
+        }
+        try:
+            result = await self._post(create_url, lambda: payload, idempotent=False)
+        except Exception as e:
+            logger.error(f"Error creating feature service: {e}")
+            return None
+
+        if result.get("success"):
+            service_id = result.get("itemId")
+            if result.get("serviceurl"):
+                self.service_urls[service_id] = result["serviceurl"]
+            logger.info(f"✅ Created feature service: {service_id}")
+            return service_id
+        logger.error(f"Failed to create service: {result}")
+        return None
+
+    async def add_features(self, features: List[Dict[str, Any]], service_id: str) -> Dict[str, Any]:
+        """
+        Add AGOL {"geometry", "attributes"} features in concurrent batches
+
+        Returns:
+            Report (see merge_results) with "addResults" aligned with features
+        """
+        encoded, batches = self._feature_batches(features)
+        return await self._send_batches(service_id, "addFeatures", "addResults", encoded, batches,
+                                        self._feature_fields, idempotent=False)
+
+    async def update_features(self, features: List[Dict[str, Any]], service_id: str) -> Dict[str, Any]:
+        """Update features (attributes must include the objectId); report has "updateResults" """
+        encoded, batches = self._feature_batches(features)
+        return await self._send_batches(service_id, "updateFeatures", "updateResults", encoded, batches,
+                                        self._feature_fields, idempotent=True)
+
+    async def delete_features(self, object_ids: List[Any], service_id: str) -> Dict[str, Any]:
+        """Delete features by objectId; report has "deleteResults" """
+        ids = [str(object_id) for object_id in object_ids]
+        batches = [(start, min(start + self.max_batch_size, len(ids)))
+                   for start in range(0, len(ids), self.max_batch_size)]
+        return await self._send_batches(service_id, "deleteFeatures", "deleteResults", ids, batches,
+                                        lambda chunk: {"objectIds": ",".join(chunk)}, idempotent=True)
+
+    async def apply_edits(self, service_id: str, adds: List[Dict[str, Any]] = (),
+                          updates: List[Dict[str, Any]] = (), deletes: List[Any] = ()) -> Dict[str, Any]:
+        """
+        Adds, updates and deletes in concurrent, batched applyEdits calls
+
+        Edits are packed in that order into batches capped like add_features,
+        so a batch may mix all three kinds.
+
+        Returns:
+            {"addResults", "updateResults", "deleteResults" (each aligned with
+            its input), "success_count", "failure_count", "batches",
+            "failed_batches", "request_bytes"}
+        """
+        kinds = (("adds", "addResults", [json.dumps(f, separators=(",", ":")) for f in adds]),
+                 ("updates", "updateResults", [json.dumps(f, separators=(",", ":")) for f in updates]),
+                 ("deletes", "deleteResults", [str(object_id) for object_id in deletes]))
+        encoded = [text for _, _, items in kinds for text in items]
+        batches = plan_batches(encoded, self.max_batch_size, self.max_batch_bytes)
+
+        # Range of each kind within encoded
+        ranges, position = [], 0
+        for _, _, items in kinds:
+            ranges.append((position, position + len(items)))
+            position += len(items)
+
+        def fields(start: int, end: int) -> Dict[str, Any]:
+            payload = {"rollbackOnFailure": "false"}
+            for (name, _, _), (first, last) in zip(kinds, ranges):
+                chunk = encoded[max(start, first):min(end, last)]
+                if chunk:
+                    payload[name] = ",".join(chunk) if name == "deletes" else "[" + ",".join(chunk) + "]"
+            return payload
+
+        url = await self._layer_url(service_id, "applyEdits")
+        if url is None:
+            results = [f"Unknown feature service URL of {service_id}"] * len(batches)
+        else:
+            results = await asyncio.gather(*(
+                self._post_batch(url, None, partial(fields, start, end), idempotent=False)
+                for start, end in batches
+            ))
+
+        report = {"batches": len(batches), "request_bytes": sum(len(text.encode("utf-8")) for text in encoded)}
+        for (_, key, _), (first, last) in zip(kinds, ranges):
+            kind_batches, kind_results = [], []
+            for (start, end), result in zip(batches, results):
+                low, high = max(start, first), min(end, last)
+                if low < high:
+                    kind_batches.append((low - first, high - first))
+                    kind_results.append(result.get(key, []) if isinstance(result, dict) else result)
+            report[key] = merge_results(kind_batches, kind_results, key)[key]
+
+        report["success_count"] = sum(1 for key in ("addResults", "updateResults", "deleteResults")
+                                      for r in report[key] if r.get("success"))
+        report["failure_count"] = len(encoded) - report["success_count"]
+        report["failed_batches"] = [
+            {"batch": index, "start": start, "count": end - start, "error": result}
+            for index, ((start, end), result) in enumerate(zip(batches, results))
+            if not isinstance(result, dict)
+        ]
+        for failed in report["failed_batches"]:
+            logger.error(f"applyEdits batch {failed['batch']} ({failed['count']} edits) failed: "
+                         f"{failed['error']}")
+        logger.info(f"✅ applyEdits: {report['success_count']}/{len(encoded)} edits succeeded "
+                    f"({len(adds)} adds, {len(updates)} updates, {len(deletes)} deletes) "
+                    f"in {len(batches)} batches")
+        return report
+
+    async def find_feature_service(self, title: str) -> Optional[str]:
+        """
+        Item ID of the user's feature service with this title (None if there is none)
+
+        The service URL is kept in service_urls for applyEdits and query.
+        """
+        token = await self._token()
+        if not token:
+            logger.error("Not authenticated with AGOL")
+            return None
+
+        payload = {
+            "q": f'title:"{title}" AND owner:{self.auth.username} AND type:"Feature Service"',
+            "num": 100,
+            "token": token,
+            "f": "json"
+        }
+        try:
+            result = await self._post(f"{self.portal_url}/search", lambda: payload, idempotent=True)
+        except Exception as e:
+            logger.error(f"Error searching for feature service: {e}")
+            return None
+
+        for item in result.get("results", []):
+            if item.get("title") == title:
+                if item.get("url"):
+                    self.service_urls[item["id"]] = item["url"]
+                return item.get("id")
+        return None
+
+    async def query_object_ids(self, service_id: str, id_field: str = "id") -> Optional[Dict[str, Any]]:
+        """
+        {id_field value: objectId} of all features in a service (paged query)
+
+        Returns:
+            The mapping, or None if a query failed
+        """
+        url = await self._layer_url(service_id, "query")
+        if url is None:
+            return None
+        object_id_field = AGOL_CONFIG["object_id_field"]
+        ids, offset = {}, 0
+        while True:
+            token = await self._token()
+            payload = {
+                "where": "1=1",
+                "outFields": f"{object_id_field},{id_field}",
+                "returnGeometry": "false",
+                "resultOffset": offset,
+                "resultRecordCount": self.max_batch_size,
+                "token": token,
+                "f": "json"
+            }
+            try:
+                result = await self._post(url, lambda: payload, idempotent=True)
+            except Exception as e:
+                logger.error(f"Error querying feature IDs: {e}")
+                return None
+            if "error" in result:
+                logger.error(f"Error querying feature IDs: {result['error']}")
+                return None
+
+            features = result.get("features", [])
+            for feature in features:
+                attributes = feature.get("attributes", {})
+                if attributes.get(id_field) is not None:
+                    ids[attributes[id_field]] = attributes.get(object_id_field)
+            if not features or not result.get("exceededTransferLimit"):
+                return ids
+            offset += len(features)
+
+    async def upload_layers(self, layers: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """Add features to several services at once: {service_id: report}"""
+        reports = await asyncio.gather(*(self.add_features(features, service_id)
+                                         for service_id, features in layers.items()))
+        return dict(zip(layers, reports))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
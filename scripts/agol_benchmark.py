@@ -0,0 +1,279 @@
+"""
+Benchmark for AGOL feature uploads against a local stand-in server
+The server mimics addFeatures: per-request latency, per-feature processing
+time, AGOL-like limits on record count and request size and, optionally,
+random 503 responses to exercise retries. Like AGOL it answers feature
+operations only under /services/<id>/FeatureServer/<layer>/ (the request
+counts include each service's one item lookup for that URL).
+
+Usage:
+    python agol_benchmark.py --features 20000 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Any, Optional, Tuple
+from urllib.parse import parse_qs
+
+from agol_async import AsyncAGOLUploader
+from agol_exporter import AGOLAuthentication, AGOLUploader
+from agol_session import AGOLSession
+from config import AGOL_CONFIG
+
+
+# Item details (service URL lookup) and feature layer operations; anything else is a 404
+ITEM_PATH = re.compile(r"^/content/items/([^/]+)$")
+LAYER_PATH = re.compile(r"^/services/([^/]+)/FeatureServer/\d+/"
+                        r"(addFeatures|updateFeatures|deleteFeatures|applyEdits)$")
+
+
+class StandInFeatureServer:
+    """
+    Local HTTP server answering addFeatures, updateFeatures, deleteFeatures
+    and applyEdits like a hosted feature layer
+
+    Args:
+        latency: Seconds added to every request
+        per_feature: Seconds added per feature
+        max_record_count: Requests with more features are rejected
+        max_request_bytes: Larger request bodies are rejected
+        error_rate: Fraction of requests answered with HTTP 503
+    """
+
+    def __init__(self, latency: float = 0.1, per_feature: float = 0.0001,
+                 max_record_count: int = 2000, max_request_bytes: int = 10 * 1024 * 1024,
+                 error_rate: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.per_feature = per_feature
+        self.max_record_count = max_record_count
+        self.max_request_bytes = max_request_bytes
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self._object_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def setup(self):
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if not (ITEM_PATH.match(self.path) or LAYER_PATH.match(self.path)):
+                    self._send({"error": {"code": 404, "message": f"Unknown endpoint {self.path}"}},
+                               status=404)
+                elif random.random() < server.error_rate:
+                    self._send({"error": "Service unavailable"}, status=503)
+                else:
+                    self._send(server.handle(self.path, body))
+
+            def _send(self, result: Dict[str, Any], status: int = 200):
+                data = json.dumps(result).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def handle(self, path: str, body: bytes) -> Dict[str, Any]:
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += len(body)
+        item = ITEM_PATH.match(path)
+        if item:
+            return {"id": item.group(1), "url": f"{self.url}/services/{item.group(1)}/FeatureServer"}
+        operation = LAYER_PATH.match(path).group(2)
+        if operation == "applyEdits":
+            return self.apply_edits(body)
+        if len(body) > self.max_request_bytes:
+            return {"error": {"code": 413, "message": "Request entity too large"}}
+
+        fields = parse_qs(body.decode())
+        if operation == "deleteFeatures":
+            items = [int(i) for i in fields["objectIds"][0].split(",")]
+        else:
+            items = json.loads(fields["features"][0])
+        if len(items) > self.max_record_count:
+            return {"error": {"code": 400, "message": f"Exceeded {self.max_record_count} records"}}
+
+        time.sleep(self.latency + self.per_feature * len(items))
+        if operation == "addFeatures":
+            with self._lock:
+                ids = [next(self._object_ids) for _ in items]
+            return {"addResults": [{"objectId": i, "success": True} for i in ids]}
+        if operation == "updateFeatures":
+            return {"updateResults": [{"objectId": f["attributes"].get(AGOL_CONFIG["object_id_field"]),
+                                       "success": True} for f in items]}
+        return {"deleteResults": [{"objectId": i, "success": True} for i in items]}
+
+    def apply_edits(self, body: bytes) -> Dict[str, Any]:
+        fields = parse_qs(body.decode())
+        adds = json.loads(fields.get("adds", ["[]"])[0])
+        updates = json.loads(fields.get("updates", ["[]"])[0])
+        deletes = [int(i) for i in fields.get("deletes", [""])[0].split(",") if i]
+        time.sleep(self.latency + self.per_feature * (len(adds) + len(updates) + len(deletes)))
+        with self._lock:
+            ids = [next(self._object_ids) for _ in adds]
+        return {
+            "addResults": [{"objectId": i, "success": True} for i in ids],
+            "updateResults": [{"objectId": f["attributes"].get(AGOL_CONFIG["object_id_field"]),
+                               "success": True} for f in updates],
+            "deleteResults": [{"objectId": i, "success": True} for i in deletes],
+        }
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def sample_features(count: int, vertices: int = 20) -> List[Dict[str, Any]]:
+    return [
+        {
+            "geometry": {"type": "LineString",
+                         "coordinates": [[i + v * 0.5, v * 0.25, 0.0] for v in range(vertices)]},
+            "attributes": {"id": f"wall_{i:08x}", "type": "Wall", "name": "Wall " * 4,
+                           "version": 1, "height": 3.5}
+        }
+        for i in range(count)
+    ]
+
+
+def _auth(server: StandInFeatureServer) -> AGOLAuthentication:
+    auth = AGOLAuthentication("benchmark", "benchmark", portal_url=server.url,
+                              session=AGOLSession(backoff_factor=0.05), cache_path=None)
+    auth.token = "benchmark-token"
+    auth.token_expiry = datetime.now() + timedelta(hours=1)
+    return auth
+
+
+def run(server: StandInFeatureServer, features: List[Dict[str, Any]], max_batch_size: int,
+        workers: int, max_batch_bytes: Optional[int] = None) -> Tuple[float, Dict[str, Any]]:
+    """(seconds, report) of one upload through AGOLUploader"""
+    auth = _auth(server)
+    uploader = AGOLUploader(auth, max_batch_size=max_batch_size, workers=workers,
+                            max_batch_bytes=max_batch_bytes)
+    start = time.perf_counter()
+    report = uploader.upload_features(features, "benchmark")
+    seconds = time.perf_counter() - start
+    auth.session.close()
+    return seconds, report
+
+
+def run_layers(server: StandInFeatureServer, features: List[Dict[str, Any]], layers: int,
+               concurrency: int, requests_per_second: Optional[float]) -> Tuple[float, Dict[str, Any]]:
+    """(seconds, combined report) of publishing features split over several layers at once"""
+    auth = _auth(server)
+    uploader = AsyncAGOLUploader(auth, max_batch_size=500, concurrency=concurrency,
+                                 requests_per_second=requests_per_second)
+    per_layer = -(-len(features) // layers)
+    start = time.perf_counter()
+    reports = asyncio.run(uploader.upload_layers({
+        f"layer{i}": features[i * per_layer:(i + 1) * per_layer] for i in range(layers)
+    }))
+    seconds = time.perf_counter() - start
+    uploader.close()
+    auth.session.close()
+    return seconds, {
+        "success_count": sum(r["success_count"] for r in reports.values()),
+        "failure_count": sum(r["failure_count"] for r in reports.values()),
+        "batches": sum(r["batches"] for r in reports.values()),
+    }
+
+
+def run_republish(server: StandInFeatureServer, features: List[Dict[str, Any]],
+                  changed_fraction: float) -> Tuple[int, int, Dict[str, Any]]:
+    """(bytes of the initial publish, bytes of the republish, republish report)"""
+    auth = _auth(server)
+    uploader = AGOLUploader(auth, max_batch_size=1000, workers=8)
+    _, published = uploader.upsert_features(features, "benchmark", {})
+    initial_bytes = server.bytes_received
+
+    changed = [dict(feature) for feature in features[:-1]]  # one feature removed
+    for feature in changed[:int(len(changed) * changed_fraction)]:
+        feature["attributes"] = {**feature["attributes"], "height": 4.0}
+    changed.append({"geometry": None, "attributes": {"id": "new_wall", "type": "Wall"}})
+    report, _ = uploader.upsert_features(changed, "benchmark", published)
+    auth.session.close()
+    return initial_bytes, server.bytes_received - initial_bytes, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--features", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per request")
+    parser.add_argument("--per-feature", type=float, default=0.00005, help="Seconds per feature")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 503 responses")
+    parser.add_argument("--layers", type=int, default=50, help="Layers in the multi-layer scenarios")
+    parser.add_argument("--rate", type=float, default=20, help="Requests per second in the rate-limited scenario")
+    args = parser.parse_args()
+
+    features = sample_features(args.features)
+    scenarios = [
+        ("single request", 10 ** 9, 1, 10 ** 12),
+        ("batches of 1000, 1 worker", 1000, 1, None),
+        ("batches of 1000, 4 workers", 1000, 4, None),
+        ("batches of 1000, 8 workers", 1000, 8, None),
+        ("batches of 500, 8 workers", 500, 8, None),
+    ]
+
+    print(f"{args.features} features, {args.latency}s latency per request, "
+          f"{args.error_rate:.0%} errors")
+    print(f"{'scenario':<30} {'seconds':>8} {'ok':>8} {'failed':>8} {'batches':>8} "
+          f"{'requests':>8} {'conns':>6}")
+    for name, batch_size, workers, max_bytes in scenarios:
+        with StandInFeatureServer(latency=args.latency, per_feature=args.per_feature,
+                                  error_rate=args.error_rate) as server:
+            seconds, report = run(server, features, batch_size, workers, max_bytes)
+        print(f"{name:<30} {seconds:>8.2f} {report['success_count']:>8} "
+              f"{report['failure_count']:>8} {report['batches']:>8} "
+              f"{server.requests:>8} {server.connections:>6}")
+
+    with StandInFeatureServer(latency=args.latency, per_feature=args.per_feature) as server:
+        initial, republish, report = run_republish(server, features, 0.01)
+    print(f"\nupsert: initial publish {initial / 1024:.0f} KB, republish after 1% change "
+          f"{republish / 1024:.0f} KB ({len(report['addResults'])} adds, "
+          f"{len(report['updateResults'])} updates, {len(report['deleteResults'])} deletes, "
+          f"{report['unchanged']} unchanged)")
+
+    layer_scenarios = [
+        (f"{args.layers} layers, 16 in flight", 16, None),
+        (f"{args.layers} layers, 16 in flight, {args.rate:g}/s", 16, args.rate),
+    ]
+    for name, concurrency, rate in layer_scenarios:
+        with StandInFeatureServer(latency=args.latency, per_feature=args.per_feature,
+                                  error_rate=args.error_rate) as server:
+            seconds, report = run_layers(server, features, args.layers, concurrency, rate)
+        print(f"{name:<30} {seconds:>8.2f} {report['success_count']:>8} "
+              f"{report['failure_count']:>8} {report['batches']:>8} "
+              f"{server.requests:>8} {server.connections:>6}")
+
+
+if __name__ == "__main__":
+    main()
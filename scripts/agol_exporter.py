@@ -4,12 +4,19 @@ Converts GH geometry to GIS-compatible formats and uploads to AGOL
 """
 
 import json
-import requests
+import os
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 
+from agol_async import AsyncAGOLUploader, run_sync
+from agol_upsert import PublishState, plan_edits, apply_report
+from artifact_io import write_json, DEFAULT
+from agol_session import AGOLSession, get_session
+from config import AGOL_CONFIG
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -85,21 +92,111 @@ class GeoJSONConverter:
             },
             "features": features
         }
+    
+    @classmethod
+    def change_set_to_geojson(cls, changes: Dict[str, Any],
+                              epsg_code: str = "EPSG:32633") -> Dict[str, Any]:
+        """
+        Convert a snapshot_diff change set for an incremental publish
+    
+        Returns:
+            {"added": FeatureCollection, "changed": FeatureCollection,
+             "removed": [element IDs]}
+        """
+        elements = changes.get("elements", {})
+        changed_ids = dict.fromkeys(changes.get("geometry_changed", []) +
+                                    changes.get("attribute_changed", []))
+        return {
+            "added": cls.gh_to_geojson([elements[i] for i in changes.get("added", [])], epsg_code),
+            "changed": cls.gh_to_geojson([elements[i] for i in changed_ids], epsg_code),
+            "removed": list(changes.get("removed", []))
+        }
 
 
 class AGOLAuthentication:
-    """Handles ArcGIS Online authentication and token management"""
+    """
+    Handles ArcGIS Online authentication and token management
+    
+    Tokens are reused until shortly before they expire, also across runs
+    via an optional cache file. get_token() refreshes a token in its last
+    refresh_margin seconds; meanwhile other threads keep using the current
+    one, so concurrent uploads don't wait for the refresh.
+    """
     
     def __init__(self, username: str, password: str, 
-                 portal_url: str = "https://www.arcgisonline.com/sharing/rest"):
+                 portal_url: str = "https://www.arcgisonline.com/sharing/rest",
+                 session: AGOLSession = None, cache_path: Any = DEFAULT,
+                 refresh_margin: float = None):
+        """
+        Args:
+            session: HTTP session (default: the shared one)
+            cache_path: Token cache file (default AGOL_CONFIG["token_cache"], None disables)
+            refresh_margin: Seconds before expiry at which tokens are refreshed
+        """
         self.username = username
         self.password = password
         self.portal_url = portal_url
+        self.session = session or get_session()
+        self.cache_path = AGOL_CONFIG["token_cache"] if cache_path is DEFAULT else cache_path
+        self.refresh_margin = timedelta(seconds=AGOL_CONFIG["token_refresh_margin"]
+                                        if refresh_margin is None else refresh_margin)
         self.token = None
         self.token_expiry = None
+        self._lock = threading.Lock()
+    
+    def _valid_until(self, moment: datetime) -> bool:
+        return self.token is not None and self.token_expiry is not None and self.token_expiry > moment
+    
+    @property
+    def _cache_key(self) -> str:
+        return f"{self.username}@{self.portal_url}"
     
-    def authenticate(self) -> bool:
-        """Obtain authentication token from AGOL"""
+    def _load_cached(self) -> bool:
+        """Adopt a still-valid token from the cache file"""
+        if not self.cache_path or not Path(self.cache_path).exists():
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding="utf-8") as f:
+                entry = json.load(f).get(self._cache_key)
+            if not entry:
+                return False
+            token, expiry = entry["token"], datetime.fromisoformat(entry["expires"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable token cache {self.cache_path}: {e}")
+            return False
+        
+        if expiry - self.refresh_margin <= datetime.now():
+            return False
+        self.token, self.token_expiry = token, expiry
+        logger.info(f"Reusing cached AGOL token for {self.username} (expires {expiry:%H:%M})")
+        return True
+    
+    def _save_cached(self, rejected: Optional[str] = None):
+        """Store the current token, or drop a rejected one from the cache"""
+        if not self.cache_path:
+            return
+        path = Path(self.cache_path)
+        try:
+            entries = {}
+            if path.exists():
+                with open(path, 'r', encoding="utf-8") as f:
+                    entries = json.load(f)
+            now = datetime.now()
+            entries = {key: entry for key, entry in entries.items()
+                       if datetime.fromisoformat(entry["expires"]) > now and entry["token"] != rejected}
+            if self.token is not None:
+                entries[self._cache_key] = {"token": self.token, "expires": self.token_expiry.isoformat()}
+            
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(path.name + ".tmp")
+            with open(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w', encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Could not write token cache {path}: {e}")
+    
+    def _request_token(self) -> bool:
+        """Obtain a new token from AGOL"""
         try:
             auth_url = f"{self.portal_url}/generateToken"
             
@@ -108,15 +205,20 @@ class AGOLAuthentication:
                 "password": self.password,
                 "client": "referer",
                 "referer": "https://www.arcgis.com",
-                "expiration": 60,
+                "expiration": AGOL_CONFIG["token_expiration"],
                 "f": "json"
             }
             
-            response = requests.post(auth_url, data=payload)
-            result = response.json()
+            result = self.session.post_json(auth_url, payload)
             
             if "token" in result:
                 self.token = result["token"]
+                if "expires" in result:
+                    # Epoch milliseconds
+                    self.token_expiry = datetime.fromtimestamp(result["expires"] / 1000)
+                else:
+                    self.token_expiry = datetime.now() + timedelta(minutes=AGOL_CONFIG["token_expiration"])
+                self._save_cached()
                 logger.info(f"✅ Authenticated as {self.username}")
                 return True
             else:
@@ -127,108 +229,186 @@ class AGOLAuthentication:
             logger.error(f"Authentication error: {e}")
             return False
     
+    def authenticate(self, force: bool = False) -> bool:
+        """
+        Ensure a token that is valid for at least refresh_margin
+        
+        Args:
+            force: Request a new token even if the current one is valid
+        """
+        with self._lock:
+            if not force:
+                if self._valid_until(datetime.now() + self.refresh_margin):
+                    return True
+                if self._load_cached():
+                    return True
+            return self._request_token()
+    
+    def get_token(self) -> Optional[str]:
+        """
+        Current token, refreshed when it is about to expire
+        
+        While one thread refreshes an expiring token, the others return the
+        current one; only an expired token makes callers wait.
+        """
+        now = datetime.now()
+        if self._valid_until(now + self.refresh_margin):
+            return self.token
+        
+        if self._valid_until(now):
+            if self._lock.acquire(blocking=False):
+                try:
+                    if not self._valid_until(datetime.now() + self.refresh_margin):
+                        self._request_token()
+                finally:
+                    self._lock.release()
+            return self.token
+        
+        self.authenticate()
+        return self.token if self._valid_until(datetime.now()) else None
+    
+    def invalidate(self, token: str):
+        """Drop a token the server rejected (unless it was already replaced)"""
+        with self._lock:
+            if self.token == token:
+                self.token = None
+                self.token_expiry = None
+                self._save_cached(rejected=token)
+    
     def is_authenticated(self) -> bool:
-        return self.token is not None
+        return self._valid_until(datetime.now())
+
+
+def to_agol_features(geojson_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """GeoJSON features as AGOL {"geometry", "attributes"} features"""
+    return [
+        {"geometry": feature.get("geometry"), "attributes": feature.get("properties", {})}
+        for feature in geojson_data.get("features", [])
+    ]
 
 
 class AGOLUploader:
-    """Handles uploading data to ArcGIS Online"""
+    """
+    Handles uploading data to ArcGIS Online
     
-    def __init__(self, auth: AGOLAuthentication):
+    Blocking front end of agol_async.AsyncAGOLUploader: each call runs the
+    async operation to completion.
+    """
+    
+    def __init__(self, auth: AGOLAuthentication, max_batch_size: int = None,
+                 max_batch_bytes: int = None, workers: int = None, timeout: float = None,
+                 requests_per_second: Any = DEFAULT):
+        """
+        Args:
+            auth: Authenticated session
+            max_batch_size: Max features per request
+            max_batch_bytes: Max JSON payload bytes per request
+            workers: Max requests in flight
+            timeout: Request timeout in seconds (default: the session's)
+            requests_per_second: Rate limit (None: unlimited)
+        
+        Requests go through the authentication's session (see agol_session).
+        Unset limits default to AGOL_CONFIG.
+        """
         self.auth = auth
         self.portal_url = auth.portal_url
+        self.engine = AsyncAGOLUploader(auth, max_batch_size=max_batch_size,
+                                        max_batch_bytes=max_batch_bytes, concurrency=workers,
+                                        requests_per_second=requests_per_second, timeout=timeout)
+        
+        # Report of the last upload (see agol_async.merge_results)
+        self.last_report: Optional[Dict[str, Any]] = None
     
     def create_feature_service(self, title: str, description: str, 
                                tags: List[str] = None) -> Optional[str]:
         """Create new Feature Service in AGOL"""
-        
-        if not self.auth.is_authenticated():
-            logger.error("Not authenticated with AGOL")
-            return None
-        
-        try:
-            create_url = f"{self.portal_url}/content/users/{self.auth.username}/createService"
-            
-            payload = {
-                "name": title.replace(" ", "_"),
-                "displayName": title,
-                "description": description,
-                "tags": ",".join(tags or []),
-                "serviceDescription": description,
-                "hasStaticData": False,
-                "maxRecordCount": 2000,
-                "token": self.auth.token,
-                "f": "json"
-            }
-            
-            response = requests.post(create_url, data=payload)
-            result = response.json()
-            
-            if "success" in result and result["success"]:
-                service_id = result.get("itemId")
-                logger.info(f"✅ Created feature service: {service_id}")
-                return service_id
-            else:
-                logger.error(f"Failed to create service: {result}")
-                return None
-        
-        except Exception as e:
-            logger.error(f"Error creating feature service: {e}")
-            return None
+        return run_sync(self.engine.create_feature_service(title, description, tags))
     
     def upload_geojson(self, geojson_data: Dict[str, Any], 
                        feature_service_id: str) -> bool:
         """Upload GeoJSON to existing feature service"""
         
-        if not self.auth.is_authenticated():
+        if not self.auth.get_token():
             logger.error("Not authenticated with AGOL")
             return False
         
         try:
-            # Convert GeoJSON features to AGOL format
-            features = []
-            
-            for feature in geojson_data.get("features", []):
-                agol_feature = {
-                    "geometry": feature.get("geometry"),
-                    "attributes": feature.get("properties", {})
-                }
-                features.append(agol_feature)
-            
-            # Add features to service
-            add_url = f"{self.portal_url}/content/items/{feature_service_id}/addFeatures"
-            
-            payload = {
-                "features": json.dumps(features),
-                "token": self.auth.token,
-                "f": "json"
-            }
-            
-            response = requests.post(add_url, data=payload)
-            result = response.json()
-            
-            if "addResults" in result:
-                success_count = sum(1 for r in result["addResults"] if r.get("success"))
-                logger.info(f"✅ Added {success_count}/{len(features)} features to AGOL")
-                return True
-            else:
-                logger.error(f"Failed to add features: {result}")
-                return False
-        
+            report = self.upload_features(to_agol_features(geojson_data), feature_service_id)
         except Exception as e:
             logger.error(f"Error uploading to AGOL: {e}")
             return False
+        
+        return not report["failed_batches"]
+    
+    def upload_features(self, features: List[Dict[str, Any]],
+                        feature_service_id: str) -> Dict[str, Any]:
+        """
+        Add AGOL features in concurrent batches
+        
+        Batches are capped by max_batch_size features and max_batch_bytes
+        of payload. A failed batch doesn't stop the others.
+        
+        Returns:
+            Merged report: {"addResults" (aligned with features),
+            "success_count", "failure_count", "batches", "failed_batches"}
+        """
+        self.last_report = run_sync(self.engine.add_features(features, feature_service_id))
+        return self.last_report
+    
+    def update_features(self, features: List[Dict[str, Any]],
+                        feature_service_id: str) -> Dict[str, Any]:
+        """Update features by their objectId attribute (report has "updateResults")"""
+        self.last_report = run_sync(self.engine.update_features(features, feature_service_id))
+        return self.last_report
+    
+    def delete_features(self, object_ids: List[Any], feature_service_id: str) -> Dict[str, Any]:
+        """Delete features by objectId (report has "deleteResults")"""
+        self.last_report = run_sync(self.engine.delete_features(object_ids, feature_service_id))
+        return self.last_report
+    
+    def find_feature_service(self, title: str) -> Optional[str]:
+        """Item ID of the user's feature service with this title"""
+        return run_sync(self.engine.find_feature_service(title))
+    
+    def query_object_ids(self, feature_service_id: str) -> Optional[Dict[str, Any]]:
+        """{gh_id: objectId} of the features in a service (None on failure)"""
+        return run_sync(self.engine.query_object_ids(feature_service_id))
+    
+    def upsert_features(self, features: List[Dict[str, Any]], feature_service_id: str,
+                        published: Dict[str, List[Any]],
+                        removed: Optional[List[Any]] = None) -> Tuple[Dict[str, Any], Dict[str, List[Any]]]:
+        """
+        Send only the adds, updates and deletes since the last publish
+        
+        Args:
+            features: All current AGOL features, or only the added/changed
+                      ones when removed is given
+            published: gh_id → [objectId, hash] of the last publish (see agol_upsert)
+            removed: gh_ids removed since the last publish (see plan_edits)
+        
+        Returns:
+            (applyEdits report, new published state)
+        """
+        plan = plan_edits(features, published, removed=removed)
+        if not (plan["adds"] or plan["updates"] or plan["deletes"]):
+            logger.info(f"No changes since the last publish ({plan['unchanged']} features)")
+        report = run_sync(self.engine.apply_edits(feature_service_id, plan["adds"],
+                                                  plan["updates"], plan["deletes"]))
+        report["unchanged"] = plan["unchanged"]
+        self.last_report = report
+        return report, apply_report(published, plan, report)
 
 
 class AGOLExporter:
     """Orchestrates export of GH data to ArcGIS Online"""
     
     def __init__(self, agol_username: str, agol_password: str,
-                 workspace_dir: Path = None):
+                 workspace_dir: Path = None, publish_state: PublishState = None):
         self.workspace_dir = workspace_dir or Path(__file__).parent.parent
         self.auth = AGOLAuthentication(agol_username, agol_password)
         self.uploader = AGOLUploader(self.auth)
         self.converter = GeoJSONConverter()
+        self.publish_state = publish_state or PublishState()
     
     def export_to_agol(self, gh_data: List[Dict[str, Any]], 
                       service_title: str,
@@ -238,6 +418,10 @@ class AGOLExporter:
         """
         Complete export pipeline: GH → GeoJSON → AGOL
         
+        With create_new_service=False the service titled service_title is
+        updated in place: only features added, changed or removed since the
+        last publish are sent (see agol_upsert).
+        
         Returns:
             Tuple[bool, str]: (success, service_id_or_error_message)
         """
@@ -254,9 +438,7 @@ class AGOLExporter:
         
         # Save GeoJSON locally for reference
         geojson_path = self.workspace_dir / "data" / "exports" / f"gh_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.geojson"
-        geojson_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(geojson_path, 'w') as f:
-            json.dump(geojson, f, indent=2)
+        geojson_path = write_json(geojson_path, geojson)
         logger.info(f"GeoJSON saved to {geojson_path}")
         
         # Step 3: Create or get feature service
@@ -269,19 +451,82 @@ class AGOLExporter:
             
             if not service_id:
                 return False, "Failed to create feature service"
+            published = {}
         else:
-            # TODO: Implement logic to find existing service
-            logger.warning("Existing service lookup not yet implemented")
-            return False, "Existing service lookup not implemented"
+            service_id, published = self._existing_service(service_title)
+            if not service_id:
+                return False, f"Feature service '{service_title}' not found"
+            if published is None:
+                return False, "Failed to read feature IDs of the existing service"
         
-        # Step 4: Upload to AGOL
-        if self.uploader.upload_geojson(geojson, service_id):
+        # Step 4: Upload the edits since the last publish to AGOL
+        return self._upsert(service_title, service_id, published, to_agol_features(geojson))
+    
+    def export_changes_to_agol(self, changes: Dict[str, Any], service_title: str,
+                               epsg_code: str = "EPSG:32633") -> Tuple[bool, str]:
+        """
+        Publish a snapshot_diff change set to the existing service titled service_title
+        
+        Only the added, changed and removed elements are converted and sent,
+        so the cost follows the size of the edit rather than of the model.
+        The change set's elements should be GH records (as exported by
+        SyncEngine) so they hash like the features of a full publish.
+        
+        Returns:
+            Tuple[bool, str]: (success, service_id_or_error_message)
+        """
+        logger.info("🚀 Publishing Revit changes to AGOL...")
+        if not self.auth.authenticate():
+            return False, "Authentication failed"
+        
+        geojson = self.converter.change_set_to_geojson(changes, epsg_code)
+        service_id, published = self._existing_service(service_title)
+        if not service_id:
+            return False, f"Feature service '{service_title}' not found"
+        if published is None:
+            return False, "Failed to read feature IDs of the existing service"
+        
+        features = to_agol_features(geojson["added"]) + to_agol_features(geojson["changed"])
+        return self._upsert(service_title, service_id, published, features, removed=geojson["removed"])
+    
+    def _upsert(self, service_title: str, service_id: str, published: Dict[str, List[Any]],
+                features: List[Dict[str, Any]], removed: Optional[List[Any]] = None) -> Tuple[bool, str]:
+        try:
+            report, state = self.uploader.upsert_features(features, service_id, published, removed=removed)
+        except Exception as e:
+            logger.error(f"Error uploading to AGOL: {e}")
+            return False, "Failed to upload to AGOL"
+        self.publish_state.set(service_title, service_id, state,
+                               service_url=self.uploader.engine.service_urls.get(service_id))
+        
+        if not report["failed_batches"]:
             success_msg = f"Export successful! Service ID: {service_id}"
-            logger.info(f"✅ {success_msg}")
+            logger.info(f"✅ {success_msg} ({report['request_bytes'] / 1024:.1f} KB of edits, "
+                        f"{report['unchanged']} features unchanged)")
             return True, service_id
         else:
             return False, "Failed to upload to AGOL"
     
+    def _existing_service(self, title: str) -> Tuple[Optional[str], Optional[Dict[str, List[Any]]]]:
+        """(service_id, published state) of the service titled title"""
+        entry = self.publish_state.get(title)
+        if entry:
+            if entry.get("service_url"):
+                self.uploader.engine.service_urls[entry["service_id"]] = entry["service_url"]
+            return entry["service_id"], entry["features"]
+        
+        service_id = self.uploader.find_feature_service(title)
+        if not service_id:
+            return None, {}
+        
+        # Published elsewhere or state lost: match features by gh_id so they
+        # are updated rather than added twice
+        logger.info(f"No publish state for '{title}', reading feature IDs from the service")
+        ids = self.uploader.query_object_ids(service_id)
+        if ids is None:
+            return service_id, None
+        return service_id, {str(gh_id): [object_id, None] for gh_id, object_id in ids.items()}
+    
     def export_to_shapefile(self, gh_data: List[Dict[str, Any]], 
                            output_path: Path) -> bool:
         """Export GH data to Shapefile format (as intermediate step)"""
@@ -295,8 +540,7 @@ class AGOLExporter:
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
             # Save GeoJSON
-            with open(output_path.with_suffix('.geojson'), 'w') as f:
-                json.dump(geojson, f, indent=2)
+            write_json(output_path.with_suffix('.geojson'), geojson)
             
             logger.info(f"✅ Shapefile/GeoJSON exported to {output_path}")
             return True
@@ -0,0 +1,161 @@
+"""
+Shared HTTP session for ArcGIS Online calls
+One requests.Session with keep-alive connection pooling, timeouts from
+TIMEOUT_CONFIG and exponential backoff on throttling (429), server errors
+(5xx) and transient connection failures
+
+AGOL often reports errors inside a 200 response ({"error": {"code": 503}});
+those codes are retried like HTTP statuses.
+
+Requests that are not idempotent (addFeatures, applyEdits, createService) may
+already have been applied when a failure is reported, so they are only
+retried when the server certainly did not process them: 429, 503 and
+connections that failed before anything was sent.
+"""
+
+import random
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+from config import AGOL_CONFIG, TIMEOUT_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Rejected before processing, safe to retry for non-idempotent requests
+UNPROCESSED_STATUS = (429, 503)
+
+
+class AGOLRequestError(Exception):
+    """An AGOL request failed (after retries)"""
+
+
+def _not_sent(error: requests.RequestException) -> bool:
+    """True if the connection failed before any of the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # MaxRetryError wraps the underlying cause
+    reason = getattr(reason, "reason", reason)
+    # Includes NewConnectionError (refused, DNS failure)
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class AGOLSession:
+    """
+    Pooled, retrying POST client
+
+    Args:
+        timeout: Read timeout in seconds (default TIMEOUT_CONFIG["agol_request_timeout"])
+        connect_timeout: Connect timeout in seconds
+        max_retries: Retries after the first attempt
+        backoff_factor: First retry delay in seconds, doubled per retry (with jitter)
+        pool_size: Keep-alive connections per host (>= concurrent uploads)
+    """
+
+    def __init__(self, timeout: float = None, connect_timeout: float = None,
+                 max_retries: int = None, backoff_factor: float = None,
+                 pool_size: int = None):
+        self.timeout = timeout or TIMEOUT_CONFIG["agol_request_timeout"]
+        self.connect_timeout = connect_timeout or TIMEOUT_CONFIG["agol_connect_timeout"]
+        self.max_retries = max_retries if max_retries is not None else AGOL_CONFIG["max_retries"]
+        self.backoff_factor = backoff_factor if backoff_factor is not None else AGOL_CONFIG["backoff_factor"]
+        self.backoff_max = AGOL_CONFIG["backoff_max"]
+
+        pool_size = pool_size or AGOL_CONFIG["pool_size"]
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass  # HTTP date: fall back to backoff
+        delay = min(self.backoff_factor * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    def post_json(self, url: str, data: Dict[str, Any], timeout: float = None,
+                  idempotent: bool = True) -> Dict[str, Any]:
+        """
+        POST form data and return the decoded JSON response
+
+        Args:
+            url: Endpoint
+            data: Form fields
+            timeout: Read timeout override
+            idempotent: Retry every transient failure. With False only
+                        429, 503 and failures before sending are retried,
+                        as the request may already have been applied
+                        (addFeatures, applyEdits, createService)
+
+        Raises:
+            AGOLRequestError: Non-retryable failure or retries exhausted
+        """
+        timeouts: Tuple[float, float] = (self.connect_timeout, timeout or self.timeout)
+        retry_status = RETRY_STATUS if idempotent else UNPROCESSED_STATUS
+        reason, retry_after = None, None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self._delay(attempt - 1, retry_after))
+                retry_after = None
+
+            try:
+                response = self.session.post(url, data=data, timeout=timeouts)
+            except (requests.ConnectionError, requests.ReadTimeout,
+                    requests.exceptions.ChunkedEncodingError) as e:
+                reason = f"{type(e).__name__}: {e}"
+                if not idempotent and not _not_sent(e):
+                    raise AGOLRequestError(f"{reason} (not retried, the request may have been applied)") from e
+                logger.warning(f"AGOL request failed ({reason}), attempt {attempt + 1}")
+                continue
+
+            if response.status_code in retry_status:
+                reason = f"HTTP {response.status_code}"
+                retry_after = response.headers.get("Retry-After")
+                logger.warning(f"AGOL returned {reason}, attempt {attempt + 1}")
+                continue
+            if response.status_code >= 400:
+                raise AGOLRequestError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+            try:
+                result = response.json()
+            except ValueError as e:
+                raise AGOLRequestError(f"Invalid JSON response from {url}") from e
+
+            error = result.get("error") if isinstance(result, dict) else None
+            if isinstance(error, dict) and error.get("code") in RETRY_STATUS:
+                reason = f"AGOL error {error.get('code')}: {error.get('message')}"
+                if error.get("code") not in retry_status:
+                    raise AGOLRequestError(f"{reason} (not retried, the request may have been applied)")
+                logger.warning(f"{reason}, attempt {attempt + 1}")
+                continue
+            return result
+
+        raise AGOLRequestError(f"Giving up after {self.max_retries + 1} attempts: {reason}")
+
+    def close(self):
+        self.session.close()
+
+
+_shared_session: Optional[AGOLSession] = None
+_shared_lock = threading.Lock()
+
+
+def get_session() -> AGOLSession:
+    """Process-wide session, so all AGOL calls share one connection pool"""
+    global _shared_session
+    with _shared_lock:
+        if _shared_session is None:
+            _shared_session = AGOLSession()
+        return _shared_session
@@ -0,0 +1,156 @@
+"""
+Diff-based publishing to an existing AGOL feature service
+Keeps, per service, the gh_id → [objectId, content hash] map of the last
+publish. A republish hashes the new features and sends only what changed
+as applyEdits adds, updates and deletes.
+
+Publish state (AGOL_CONFIG["publish_state"]):
+    {service title: {"service_id", "service_url", "published",
+                     "features": {gh_id: [objectId, hash]}}}
+
+A hash of None marks a feature whose objectId is known (e.g. recovered by
+querying the service) but whose published content isn't; it is updated on
+the next publish.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+
+from artifact_io import DEFAULT
+from config import AGOL_CONFIG
+from content_hash import compute_geometry_hash, compute_property_hash, combine_hashes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Attributes that change without the feature changing
+VOLATILE_ATTRIBUTES = ("timestamp",)
+
+
+def feature_hash(feature: Dict[str, Any]) -> str:
+    """Content hash of an AGOL {"geometry", "attributes"} feature"""
+    attributes = {key: value for key, value in (feature.get("attributes") or {}).items()
+                  if key not in VOLATILE_ATTRIBUTES}
+    return combine_hashes(str(attributes.get("type")), compute_property_hash(attributes),
+                          compute_geometry_hash(feature.get("geometry") or {}))
+
+
+def plan_edits(features: List[Dict[str, Any]], published: Dict[str, List[Any]],
+               id_field: str = "id", removed: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    Edits that bring a service from its published state to features
+
+    Args:
+        features: AGOL features, identified by attributes[id_field]
+        published: gh_id (str) → [objectId, hash] of the last publish
+        removed: gh_ids to delete when features is only the added/changed
+                 subset (e.g. a snapshot change set); by default every
+                 published feature missing from features is deleted
+
+    Returns:
+        {"adds", "updates" (features, updates carrying the objectId),
+         "deletes" (objectIds), "add_ids", "update_ids", "delete_ids" (gh_ids),
+         "hashes" (gh_id → hash of every current feature), "unchanged"}
+    """
+    object_id_field = AGOL_CONFIG["object_id_field"]
+    current, skipped = {}, 0
+    for feature in features:
+        gh_id = (feature.get("attributes") or {}).get(id_field)
+        if gh_id is None:
+            skipped += 1
+            continue
+        current[str(gh_id)] = feature  # the last of duplicate IDs wins
+    if skipped:
+        logger.warning(f"Skipped {skipped} features without '{id_field}' (can't be matched on republish)")
+
+    plan = {"adds": [], "updates": [], "deletes": [], "add_ids": [], "update_ids": [], "delete_ids": [],
+            "hashes": {}, "unchanged": 0}
+    for gh_id, feature in current.items():
+        digest = feature_hash(feature)
+        plan["hashes"][gh_id] = digest
+        entry = published.get(gh_id)
+        if entry is None:
+            plan["adds"].append(feature)
+            plan["add_ids"].append(gh_id)
+        elif entry[1] != digest:
+            plan["updates"].append({"geometry": feature.get("geometry"),
+                                    "attributes": {**feature.get("attributes", {}), object_id_field: entry[0]}})
+            plan["update_ids"].append(gh_id)
+        else:
+            plan["unchanged"] += 1
+
+    if removed is None:
+        gone = [gh_id for gh_id in published if gh_id not in current]
+    else:
+        gone = [str(gh_id) for gh_id in removed if str(gh_id) in published and str(gh_id) not in current]
+    for gh_id in gone:
+        plan["deletes"].append(published[gh_id][0])
+        plan["delete_ids"].append(gh_id)
+    return plan
+
+
+def apply_report(published: Dict[str, List[Any]], plan: Dict[str, Any],
+                 report: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """
+    Published state after an applyEdits report
+
+    Only successful edits are recorded, so failed ones are retried on the
+    next publish.
+    """
+    state = dict(published)
+    for gh_id, result in zip(plan["add_ids"], report["addResults"]):
+        if result.get("success"):
+            state[gh_id] = [result.get("objectId"), plan["hashes"][gh_id]]
+    for gh_id, result in zip(plan["update_ids"], report["updateResults"]):
+        if result.get("success"):
+            state[gh_id] = [state[gh_id][0], plan["hashes"][gh_id]]
+    for gh_id, result in zip(plan["delete_ids"], report["deleteResults"]):
+        if result.get("success"):
+            state.pop(gh_id, None)
+    return state
+
+
+class PublishState:
+    """Per-service publish state, persisted as JSON"""
+
+    def __init__(self, path: Any = DEFAULT):
+        """
+        Args:
+            path: State file (default AGOL_CONFIG["publish_state"], None keeps it in memory)
+        """
+        self.path = AGOL_CONFIG["publish_state"] if path is DEFAULT else path
+        self.services: Dict[str, Dict[str, Any]] = {}
+        if self.path and Path(self.path).exists():
+            try:
+                with open(self.path, 'r', encoding="utf-8") as f:
+                    self.services = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable publish state {self.path}: {e}")
+
+    def get(self, title: str) -> Optional[Dict[str, Any]]:
+        return self.services.get(title)
+
+    def set(self, title: str, service_id: str, features: Dict[str, List[Any]],
+            service_url: Optional[str] = None):
+        self.services[title] = {
+            "service_id": service_id,
+            "service_url": service_url,
+            "published": datetime.now().isoformat(),
+            "features": features
+        }
+        self.save()
+
+    def save(self):
+        if not self.path:
+            return
+        path = Path(self.path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'w', encoding="utf-8") as f:
+            json.dump(self.services, f, separators=(",", ":"))
+        os.replace(tmp, path)
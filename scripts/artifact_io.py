@@ -0,0 +1,164 @@
+"""
+Shared I/O for JSON artifacts in the data directory
+Writes plain, gzip or zstd compressed files (pretty-printed or compact JSON)
+and reads any of them transparently: compression is detected from the
+file's leading bytes, not its name
+
+Compressed files get a .gz / .zst suffix (report.json → report.json.gz).
+Readers given the plain name fall back to the newest compressed variant,
+so fixed-name artifacts (metadata.json, revit_snapshot.json) keep working
+when IO_CONFIG changes.
+"""
+
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from config import IO_CONFIG
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Marker for "use IO_CONFIG" (None means "uncompressed")
+DEFAULT = object()
+
+
+def compression_from_suffix(path: Union[str, Path]) -> Optional[str]:
+    suffix = Path(path).suffix
+    for compression, compressed_suffix in SUFFIXES.items():
+        if suffix == compressed_suffix:
+            return compression
+    return None
+
+
+def base_path(path: Union[str, Path]) -> Path:
+    """path without a compression suffix"""
+    path = Path(path)
+    return path.with_suffix("") if compression_from_suffix(path) else path
+
+
+def _resolve_compression(path: Path, compression: Any) -> Optional[str]:
+    if compression is DEFAULT:
+        compression = compression_from_suffix(path) or IO_CONFIG["compression"]
+    if compression not in (None, *SUFFIXES):
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        raise ImportError("zstd compression requires the zstandard package")
+    return compression
+
+
+def artifact_path(path: Union[str, Path], compression: Any = DEFAULT) -> Path:
+    """Name an artifact at `path` is written under (compression suffix added)"""
+    path = Path(path)
+    compression = _resolve_compression(path, compression)
+    base = base_path(path)
+    return base.with_name(base.name + SUFFIXES[compression]) if compression else base
+
+
+def find_artifact(path: Union[str, Path]) -> Optional[Path]:
+    """Newest existing variant (plain, .gz, .zst) of an artifact, or None"""
+    base = base_path(path)
+    variants = [base] + [base.with_name(base.name + suffix) for suffix in SUFFIXES.values()]
+    existing = [p for p in variants if p.exists()]
+    return max(existing, key=lambda p: p.stat().st_mtime) if existing else None
+
+
+def detect_compression(path: Union[str, Path]) -> Optional[str]:
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return "gzip"
+    if head == ZSTD_MAGIC:
+        return "zstd"
+    return None
+
+
+def open_artifact(path: Union[str, Path], mode: str = "r", compression: Any = DEFAULT):
+    """
+    Open an artifact as text ("r" / "w")
+
+    Reading detects the compression; writing uses `compression` (by default
+    the path's suffix, else IO_CONFIG) and opens the path as given.
+    """
+    path = Path(path)
+    if mode == "r":
+        compression = detect_compression(path)
+    elif mode == "w":
+        compression = _resolve_compression(path, compression)
+    else:
+        raise ValueError(f"Unsupported mode: {mode}")
+
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=IO_CONFIG.get("gzip_level", 6))
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("Reading zstd artifacts requires the zstandard package")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            stream = zstandard.ZstdCompressor(level=IO_CONFIG.get("zstd_level", 3)).stream_writer(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def remove_other_variants(path: Path):
+    """Drop stale variants of the same artifact written with other settings"""
+    base = base_path(path)
+    for other in [base] + [base.with_name(base.name + s) for s in SUFFIXES.values()]:
+        if other != path and other.exists():
+            other.unlink()
+
+
+def write_text(path: Union[str, Path], text: str, compression: Any = DEFAULT) -> Path:
+    """Write text to the artifact at `path`; returns the path actually written"""
+    target = artifact_path(path, compression)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    with open_artifact(target, "w", compression=compression_from_suffix(target)) as f:
+        f.write(text)
+    remove_other_variants(target)
+    return target
+
+
+def dumps(data: Any, compact: Optional[bool] = None) -> str:
+    """JSON text, compact (no whitespace) or indented per IO_CONFIG["compact_json"]"""
+    if compact is None:
+        compact = IO_CONFIG["compact_json"]
+    if compact:
+        return json.dumps(data, separators=(",", ":"))
+    return json.dumps(data, indent=2)
+
+
+def write_json(path: Union[str, Path], data: Any, compression: Any = DEFAULT,
+               compact: Optional[bool] = None) -> Path:
+    """
+    Write a JSON artifact
+
+    Args:
+        path: Target (a compression suffix is added when compressing)
+        data: JSON-serializable data
+        compression: None, "gzip" or "zstd" (default: path suffix, else IO_CONFIG)
+        compact: No indentation (default: IO_CONFIG["compact_json"])
+
+    Returns:
+        The path actually written
+    """
+    return write_text(path, dumps(data, compact), compression)
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """Read a JSON artifact in any supported form (falls back to compressed variants)"""
+    path = Path(path)
+    if not path.exists():
+        path = find_artifact(path) or path
+    with open_artifact(path, "r") as f:
+        return json.load(f)
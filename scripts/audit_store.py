@@ -0,0 +1,274 @@
+"""
+Audit trail for Grasshopper → Revit imports
+Update records are appended as compact JSON lines to segment files that
+rotate by size and age; closed segments are compressed. A SQLite index maps
+timestamps, revit_ids and object IDs to (segment, line), so looking up an
+element's history reads only the segments that mention it.
+
+Layout of the audit directory:
+    audit_<created>.ndjson          active segment
+    audit_<created>.ndjson.gz       closed segments (.zst with zstd)
+    index.db                        segments, imports and per-record index
+"""
+
+import json
+import shutil
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+import logging
+
+from artifact_io import open_artifact, artifact_path, find_artifact, DEFAULT
+from config import AUDIT_CONFIG
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class AuditStore:
+    """
+    Rotating, indexed audit store
+
+    Example:
+        audit = AuditStore(data_dir / "audit")
+        import_id = audit.record_import(revit_updates)
+        audit.history(revit_id="12345", since="2024-05-01")
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS segments (
+            name TEXT PRIMARY KEY,
+            created TEXT,
+            closed TEXT,
+            records INTEGER,
+            bytes INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS imports (
+            import_id TEXT PRIMARY KEY,
+            timestamp TEXT,
+            segment TEXT,
+            counts TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_imports_timestamp ON imports(timestamp);
+        CREATE TABLE IF NOT EXISTS records (
+            timestamp TEXT,
+            import_id TEXT,
+            revit_id TEXT,
+            object_id TEXT,
+            operation TEXT,
+            segment TEXT,
+            line INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_timestamp ON records(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_records_revit_id ON records(revit_id);
+        CREATE INDEX IF NOT EXISTS idx_records_object_id ON records(object_id);
+    """
+
+    def __init__(self, audit_dir: Path, max_segment_bytes: Optional[int] = None,
+                 max_segment_age_hours: Optional[float] = None,
+                 compression: Any = DEFAULT, retention_days: Any = DEFAULT):
+        """
+        Args:
+            audit_dir: Directory for segments and the index
+            max_segment_bytes: Rotate the active segment beyond this size
+            max_segment_age_hours: Rotate the active segment after this age
+            compression: Compression of closed segments ("gzip", "zstd" or None)
+            retention_days: Delete closed segments older than this (None keeps all)
+
+        Unset arguments default to AUDIT_CONFIG.
+        """
+        self.audit_dir = Path(audit_dir)
+        self.max_segment_bytes = max_segment_bytes or AUDIT_CONFIG["max_segment_bytes"]
+        self.max_segment_age = timedelta(hours=max_segment_age_hours or AUDIT_CONFIG["max_segment_age_hours"])
+        self.compression = AUDIT_CONFIG["compression"] if compression is DEFAULT else compression
+        self.retention_days = AUDIT_CONFIG["retention_days"] if retention_days is DEFAULT else retention_days
+
+        self.audit_dir.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.audit_dir / "index.db"), check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+
+    # Segments
+
+    def _active_segment(self) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute(
+            "SELECT name, created, records, bytes FROM segments WHERE closed IS NULL "
+            "ORDER BY created DESC LIMIT 1"
+        ).fetchone()
+        return dict(zip(("name", "created", "records", "bytes"), row)) if row else None
+
+    def _open_segment(self, now: datetime) -> Dict[str, Any]:
+        segment = {"name": f"audit_{now.strftime('%Y%m%d_%H%M%S_%f')}.ndjson",
+                   "created": now.isoformat(), "records": 0, "bytes": 0}
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO segments (name, created, closed, records, bytes) VALUES (?, ?, NULL, 0, 0)",
+                (segment["name"], segment["created"])
+            )
+        return segment
+
+    def _needs_rotation(self, segment: Dict[str, Any], now: datetime) -> bool:
+        return (segment["bytes"] >= self.max_segment_bytes
+                or now - datetime.fromisoformat(segment["created"]) >= self.max_segment_age)
+
+    def _close_segment(self, name: str, now: datetime):
+        """Compress a full segment (lines keep their numbers) and mark it closed"""
+        plain = self.audit_dir / name
+        if self.compression and plain.exists():
+            target = artifact_path(plain, self.compression)
+            with open(plain, 'r', encoding="utf-8") as src, \
+                    open_artifact(target, "w", compression=self.compression) as dst:
+                shutil.copyfileobj(src, dst)
+            plain.unlink()
+        with self.conn:
+            self.conn.execute("UPDATE segments SET closed = ? WHERE name = ?", (now.isoformat(), name))
+        logger.info(f"Closed audit segment {name}")
+
+    def rotate(self):
+        """Close the active segment now and apply retention"""
+        now = datetime.now()
+        segment = self._active_segment()
+        if segment is not None and segment["records"]:
+            self._close_segment(segment["name"], now)
+        self._apply_retention(now)
+
+    def _apply_retention(self, now: datetime):
+        if self.retention_days is None:
+            return
+        cutoff = (now - timedelta(days=self.retention_days)).isoformat()
+        expired = [row[0] for row in self.conn.execute(
+            "SELECT name FROM segments WHERE closed IS NOT NULL AND closed < ?", (cutoff,)
+        )]
+        for name in expired:
+            path = find_artifact(self.audit_dir / name)
+            if path is not None:
+                path.unlink()
+        with self.conn:
+            for table in ("records", "imports"):
+                self.conn.executemany(f"DELETE FROM {table} WHERE segment = ?", [(n,) for n in expired])
+            self.conn.executemany("DELETE FROM segments WHERE name = ?", [(n,) for n in expired])
+        if expired:
+            logger.info(f"Removed {len(expired)} expired audit segments")
+
+    # Writing
+
+    def record_import(self, revit_updates: Dict[str, Any]) -> str:
+        """
+        Append the updates of one import (RevitImporter.prepare_for_revit output)
+
+        Returns:
+            Import ID (unique, also for several imports within one second)
+        """
+        now = datetime.now()
+        segment = self._active_segment()
+        if segment is not None and self._needs_rotation(segment, now):
+            self._close_segment(segment["name"], now)
+            self._apply_retention(now)
+            segment = None
+        if segment is None:
+            segment = self._open_segment(now)
+
+        timestamp = revit_updates.get("timestamp") or now.isoformat()
+        import_id = f"{now.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        lines, rows = [], []
+        for i, update in enumerate(revit_updates.get("updates", [])):
+            lines.append(json.dumps({"timestamp": timestamp, "import_id": import_id, **update},
+                                    separators=(",", ":")))
+            rows.append((timestamp, import_id, update.get("revit_id"), update.get("id"),
+                         update.get("operation"), segment["name"], segment["records"] + i))
+
+        text = "".join(line + "\n" for line in lines)
+        with open(self.audit_dir / segment["name"], 'a', encoding="utf-8") as f:
+            f.write(text)
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO imports (import_id, timestamp, segment, counts) VALUES (?, ?, ?, ?)",
+                (import_id, timestamp, segment["name"], json.dumps(revit_updates.get("counts", {})))
+            )
+            self.conn.executemany(
+                "INSERT INTO records (timestamp, import_id, revit_id, object_id, operation, segment, line) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.conn.execute(
+                "UPDATE segments SET records = records + ?, bytes = bytes + ? WHERE name = ?",
+                (len(lines), len(text.encode("utf-8")), segment["name"])
+            )
+        return import_id
+
+    # Queries
+
+    def _read_lines(self, segment: str, lines: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Decode the given line numbers of a segment (plain or compressed)"""
+        path = find_artifact(self.audit_dir / segment)
+        if path is None:
+            return {}
+        wanted = set(lines)
+        last = max(wanted)
+        result = {}
+        with open_artifact(path, "r") as f:
+            for number, line in enumerate(f):
+                if number in wanted:
+                    result[number] = json.loads(line)
+                if number >= last:
+                    break
+        return result
+
+    def history(self, revit_id: Optional[str] = None, object_id: Optional[str] = None,
+                since: Optional[str] = None, until: Optional[str] = None,
+                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Audit records (oldest first), filtered via the index
+
+        Args:
+            revit_id: Only updates of this Revit element
+            object_id: Only updates of this GH/sync object ID
+            since, until: ISO timestamp range (until exclusive)
+        """
+        clauses, params = [], []
+        for column, value, op in (("revit_id", revit_id, "="), ("object_id", object_id, "="),
+                                  ("timestamp", since, ">="), ("timestamp", until, "<")):
+            if value is not None:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+
+        query = "SELECT segment, line FROM records"
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        query += " ORDER BY timestamp, rowid"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        hits = self.conn.execute(query, params).fetchall()
+
+        by_segment: Dict[str, List[int]] = {}
+        for segment, line in hits:
+            by_segment.setdefault(segment, []).append(line)
+        decoded = {segment: self._read_lines(segment, lines) for segment, lines in by_segment.items()}
+        return [decoded[segment][line] for segment, line in hits if line in decoded[segment]]
+
+    def imports(self, since: Optional[str] = None, until: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Recorded imports with their operation counts (oldest first)"""
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        query = "SELECT import_id, timestamp, counts FROM imports"
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        query += " ORDER BY timestamp, rowid"
+        return [{"import_id": row[0], "timestamp": row[1], "counts": json.loads(row[2])}
+                for row in self.conn.execute(query, params)]
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
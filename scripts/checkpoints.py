@@ -0,0 +1,554 @@
+"""
+Full + delta checkpoints for SyncEngine state
+A full checkpoint holds every object; a delta holds only the objects that
+changed (and the IDs removed) since its parent checkpoint
+
+Files ending in .ckpt use the indexed format: a header line, one JSON
+record per object, an offset table by object ID and a fixed-size footer, so
+single objects can be read through a memory map without parsing the whole
+file. Other files are JSON, gzip/zstd compressed when named .json.gz /
+.json.zst, with the header (kind/parent/depth) copied to a small
+<name>.head sidecar so chains can be walked without loading them.
+
+Compact a chain of deltas into one full checkpoint:
+    python checkpoints.py compact data/checkpoints
+"""
+
+import json
+import mmap
+import os
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple, Iterator
+import logging
+
+from artifact_io import read_json, write_json, compression_from_suffix, SUFFIXES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+INDEXED_SUFFIX = ".ckpt"
+INDEXED_MAGIC = b"RGCKPT2\n"    # magic + header line
+INDEXED_MAGIC_V1 = b"RGCKPT1\n" # header only in the index
+FOOTER_SIZE = 21  # 20-digit index offset + newline
+HEADER_SUFFIX = ".head"
+
+
+def _magic(path: Path) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read(len(INDEXED_MAGIC))
+
+
+def is_indexed(path: Path) -> bool:
+    return _magic(path) in (INDEXED_MAGIC, INDEXED_MAGIC_V1)
+
+
+def header_path(path: Path) -> Path:
+    """Sidecar holding the header of a JSON checkpoint"""
+    return path.with_name(path.name + HEADER_SUFFIX)
+
+
+def object_state(obj: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    """(hash, version, source): what a delta checkpoint compares per object"""
+    return obj.get("hash"), obj.get("version"), obj.get("source")
+
+
+def write_indexed(path: Path, data: Dict[str, Any]):
+    """
+    Write a checkpoint dict in the indexed format
+
+    Layout: magic line, header line, one compact JSON line per object, the
+    metadata line, the index line ({"checkpoint", "removed", "metadata":
+    [offset, length], "objects": {id: [offset, length, hash, version,
+    source]}}) and a footer with the index offset.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = data.get("checkpoint", {"kind": "full", "depth": 0})
+    # Write beside and swap in, so readers still mapping the old file stay valid
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        header_line = json.dumps(header, separators=(",", ":")).encode() + b"\n"
+        f.write(INDEXED_MAGIC + header_line)
+        offset = len(INDEXED_MAGIC) + len(header_line)
+
+        refs = {}
+        for obj in data.get("objects", []):
+            line = json.dumps(obj, separators=(",", ":")).encode() + b"\n"
+            refs[obj["id"]] = [offset, len(line), *object_state(obj)]
+            f.write(line)
+            offset += len(line)
+
+        meta_line = json.dumps(data.get("metadata", {}), separators=(",", ":")).encode() + b"\n"
+        meta_ref = [offset, len(meta_line)]
+        f.write(meta_line)
+        offset += len(meta_line)
+
+        index = {
+            "checkpoint": header,
+            "removed": data.get("removed", []),
+            "metadata": meta_ref,
+            "objects": refs
+        }
+        f.write(json.dumps(index, separators=(",", ":")).encode() + b"\n")
+        f.write(b"%020d\n" % offset)
+    os.replace(tmp_path, path)
+
+
+class IndexedCheckpoint:
+    """Memory-mapped reader for one indexed checkpoint file"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(INDEXED_MAGIC)] not in (INDEXED_MAGIC, INDEXED_MAGIC_V1):
+            self.close()
+            raise ValueError(f"Not an indexed checkpoint: {path}")
+
+        index_offset = int(self._map[-FOOTER_SIZE:])
+        self.index = json.loads(self._map[index_offset:len(self._map) - FOOTER_SIZE])
+        self.header = self.index["checkpoint"]
+        self.refs: Dict[str, List[Any]] = self.index["objects"]
+
+    def record(self, offset: int, length: int) -> Any:
+        return json.loads(self._map[offset:offset + length])
+
+    def get(self, obj_id: str) -> Optional[Dict[str, Any]]:
+        """Decode a single object record"""
+        ref = self.refs.get(obj_id)
+        return self.record(ref[0], ref[1]) if ref else None
+
+    def metadata(self) -> Dict[str, Any]:
+        return self.record(*self.index["metadata"])
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Decode everything into the plain JSON checkpoint layout"""
+        return {
+            "checkpoint": self.header,
+            "objects": [self.record(ref[0], ref[1]) for ref in self.refs.values()],
+            "removed": self.index.get("removed", []),
+            "metadata": self.metadata()
+        }
+
+    def close(self):
+        if not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CheckpointObjectMap(MutableMapping):
+    """
+    Lazy obj_id → DataObject mapping over a checkpoint chain
+
+    Objects are decoded from the memory-mapped checkpoint on first access
+    and cached; assigned objects are kept in memory alongside. The files
+    stay open until close() (or the end of a with block); detach() first
+    when they are about to be rewritten or deleted.
+    """
+
+    def __init__(self, object_class: type, readers: List[IndexedCheckpoint],
+                 refs: Dict[str, Tuple[Any, Any, Tuple[Any, Any, Any]]]):
+        """
+        Args:
+            object_class: Class with from_dict (merge_engine.DataObject)
+            readers: Open indexed checkpoints the refs point into
+            refs: obj_id → (reader, [offset, length] or decoded dict,
+                  (hash, version, source))
+        """
+        self.object_class = object_class
+        self._readers = readers
+        self._refs = refs
+        self._cache: Dict[str, Any] = {}
+        self._extra: Dict[str, None] = {}  # assigned IDs not in the checkpoint
+
+    def __len__(self) -> int:
+        return len(self._refs) + len(self._extra)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._refs
+        yield from self._extra
+
+    def __contains__(self, obj_id: object) -> bool:
+        return obj_id in self._refs or obj_id in self._extra
+
+    def __getitem__(self, obj_id: str):
+        obj = self._cache.get(obj_id)
+        if obj is None:
+            reader, payload, _ = self._refs[obj_id]
+            data = reader.record(payload[0], payload[1]) if reader is not None else payload
+            obj = self.object_class.from_dict(data)
+            self._cache[obj_id] = obj
+        return obj
+
+    def __setitem__(self, obj_id: str, obj):
+        self._cache[obj_id] = obj
+        if obj_id not in self._refs:
+            self._extra[obj_id] = None
+
+    def __delitem__(self, obj_id: str):
+        if obj_id in self._refs:
+            del self._refs[obj_id]
+        elif obj_id in self._extra:
+            del self._extra[obj_id]
+        else:
+            raise KeyError(obj_id)
+        self._cache.pop(obj_id, None)
+
+    def materialized(self) -> int:
+        """Number of objects decoded or assigned so far"""
+        return len(self._cache)
+
+    def hash_index(self) -> Dict[str, str]:
+        """obj_id → content hash, from the checkpoint index where possible"""
+        return {obj_id: state[0] for obj_id, state in self.state_index().items()}
+
+    def state_index(self) -> Dict[str, Tuple[Any, Any, Any]]:
+        """obj_id → (hash, version, source), from the checkpoint index where possible"""
+        index = {}
+        for obj_id in self:
+            obj = self._cache.get(obj_id)
+            if obj is not None:
+                index[obj_id] = (obj.hash, obj.version, obj.source)
+            else:
+                index[obj_id] = self._refs[obj_id][2]
+        return index
+
+    def extend(self, path: Path):
+        """
+        Add a checkpoint just written from this map's current state
+
+        The objects it stores are read from it from now on, and decoded
+        copies of objects on disk are dropped, so memory is back to the
+        index alone.
+        """
+        reader = IndexedCheckpoint(path)
+        self._readers.append(reader)
+        for obj_id in reader.index.get("removed", []):
+            self._refs.pop(obj_id, None)
+            self._extra.pop(obj_id, None)
+        for obj_id, ref in reader.refs.items():
+            self._refs[obj_id] = (reader, ref, (ref[2], ref[3], ref[4]))
+            self._extra.pop(obj_id, None)
+        self._cache = {obj_id: self._cache[obj_id] for obj_id in self._extra if obj_id in self._cache}
+
+    def paths(self) -> List[Path]:
+        """Checkpoint files currently held open"""
+        return [reader.path for reader in self._readers]
+
+    def detach(self):
+        """Decode the objects still only in the checkpoint files, then close them"""
+        for obj_id, (reader, payload, state) in self._refs.items():
+            if reader is not None and obj_id not in self._cache:
+                self._refs[obj_id] = (None, reader.record(payload[0], payload[1]), state)
+        self.close()
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CheckpointStore:
+    """Reads, writes and compacts checkpoint chains in one directory"""
+
+    def __init__(self, checkpoint_dir: Path, full_every: int = 10):
+        """
+        Args:
+            checkpoint_dir: Directory holding the checkpoint files
+            full_every: Write a full checkpoint after this many deltas
+        """
+        self.checkpoint_dir = checkpoint_dir
+        self.full_every = full_every
+
+    @staticmethod
+    def read(path: Path) -> Dict[str, Any]:
+        if is_indexed(path):
+            with IndexedCheckpoint(path) as checkpoint:
+                return checkpoint.to_dict()
+
+        data = read_json(path)
+        # Checkpoints written before deltas existed are full snapshots
+        data.setdefault("checkpoint", {"kind": "full", "depth": 0})
+        return data
+
+    @classmethod
+    def read_header(cls, path: Path) -> Dict[str, Any]:
+        """Checkpoint kind/parent/depth, from the header line or sidecar where there is one"""
+        magic = _magic(path)
+        if magic == INDEXED_MAGIC:
+            with open(path, 'rb') as f:
+                f.readline()
+                return json.loads(f.readline())
+        if magic == INDEXED_MAGIC_V1:
+            with IndexedCheckpoint(path) as checkpoint:
+                return checkpoint.header
+
+        sidecar = header_path(path)
+        if sidecar.exists():
+            with open(sidecar, 'r', encoding="utf-8") as f:
+                return json.load(f)
+        return cls.read(path)["checkpoint"]
+
+    @staticmethod
+    def write_file(path: Path, data: Dict[str, Any]):
+        if path.suffix == INDEXED_SUFFIX:
+            write_indexed(path, data)
+            return
+        # JSON checkpoints are compressed only when named so (x.json.gz)
+        path = write_json(path, data, compression=compression_from_suffix(path))
+        with open(header_path(path), 'w', encoding="utf-8") as f:
+            json.dump(data.get("checkpoint", {"kind": "full", "depth": 0}), f)
+
+    @staticmethod
+    def remove(path: Path):
+        """Delete a checkpoint file and its header sidecar"""
+        path.unlink()
+        sidecar = header_path(path)
+        if sidecar.exists():
+            sidecar.unlink()
+
+    def checkpoint_files(self) -> List[Path]:
+        if not self.checkpoint_dir.exists():
+            return []
+        suffixes = (".json", INDEXED_SUFFIX, *SUFFIXES.values())
+        return [p for p in self.checkpoint_dir.iterdir() if p.suffix in suffixes]
+
+    def latest(self) -> Optional[Path]:
+        """Most recently written checkpoint in the directory"""
+        files = self.checkpoint_files()
+        return max(files, key=lambda p: p.stat().st_mtime) if files else None
+
+    def chain(self, path: Path) -> List[Path]:
+        """Checkpoint files needed to rebuild `path`, full base first"""
+        chain = [path]
+        info = self.read_header(path)
+        while info["kind"] == "delta":
+            parent = path.parent / info["parent"]
+            if not parent.exists():
+                raise FileNotFoundError(f"Missing parent checkpoint {parent} for {chain[-1]}")
+            chain.append(parent)
+            info = self.read_header(parent)
+        return list(reversed(chain))
+
+    def open_lazy(self, path: Path, object_class: type) -> CheckpointObjectMap:
+        """
+        Lazy object map over the chain ending at `path`
+
+        Indexed chain members are memory-mapped and decoded per object;
+        plain JSON members have to be parsed up front.
+        """
+        readers = []
+        refs: Dict[str, Tuple[Any, Any, Tuple[Any, Any, Any]]] = {}
+
+        for checkpoint_path in self.chain(path):
+            if is_indexed(checkpoint_path):
+                reader = IndexedCheckpoint(checkpoint_path)
+                readers.append(reader)
+                if reader.header["kind"] == "full":
+                    refs = {}
+                for obj_id in reader.index.get("removed", []):
+                    refs.pop(obj_id, None)
+                for obj_id, ref in reader.refs.items():
+                    # v1 files index only the hash
+                    refs[obj_id] = (reader, ref, (ref[2], *ref[3:5]) if len(ref) > 3 else (ref[2], None, None))
+            else:
+                data = self.read(checkpoint_path)
+                if data["checkpoint"]["kind"] == "full":
+                    refs = {}
+                for obj_id in data.get("removed", []):
+                    refs.pop(obj_id, None)
+                for obj in data.get("objects", []):
+                    refs[obj["id"]] = (None, obj, object_state(obj))
+
+        return CheckpointObjectMap(object_class, readers, refs)
+
+    def replay(self, path: Path) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+        """
+        Rebuild state by applying the chain ending at `path`
+
+        Returns:
+            (obj_id → object dict, metadata dict)
+        """
+        objects: Dict[str, Dict[str, Any]] = {}
+        metadata: Dict[str, Any] = {}
+
+        for checkpoint_path in self.chain(path):
+            data = self.read(checkpoint_path)
+            removed = data.get("removed", [])
+
+            if data["checkpoint"]["kind"] == "full":
+                objects = {}
+                metadata = data.get("metadata", {})
+            else:
+                delta_meta = data.get("metadata", {})
+                meta_objects = metadata.setdefault("objects", {})
+                meta_objects.update(delta_meta.get("objects", {}))
+                for obj_id in delta_meta.get("removed", []):
+                    meta_objects.pop(obj_id, None)
+                metadata.update({k: v for k, v in delta_meta.items() if k not in ("objects", "removed")})
+
+            for obj_id in removed:
+                objects.pop(obj_id, None)
+            for obj in data.get("objects", []):
+                objects[obj["id"]] = obj
+
+        return objects, metadata
+
+    def replay_states(self, path: Path) -> Dict[str, Tuple[Any, Any, Any]]:
+        """obj_id → (hash, version, source) at `path`, read from the indexes where possible"""
+        with self.open_lazy(path, dict) as lazy:
+            return lazy.state_index()
+
+    def replay_hashes(self, path: Path) -> Dict[str, str]:
+        return {obj_id: state[0] for obj_id, state in self.replay_states(path).items()}
+
+    def next_depth(self, parent: Path) -> int:
+        """Depth (deltas since the last full) of a checkpoint written after parent"""
+        return self.read_header(parent).get("depth", 0) + 1
+
+    def needs_full(self, parent: Optional[Path]) -> bool:
+        return parent is None or self.next_depth(parent) > self.full_every
+
+    def write(self, path: Path, objects: Dict[str, Dict[str, Any]], metadata: Dict[str, Any],
+              parent: Optional[Path] = None, parent_states: Optional[Dict[str, Tuple]] = None,
+              current_states: Optional[Dict[str, Tuple]] = None,
+              removed: Optional[List[str]] = None) -> str:
+        """
+        Write a full or delta checkpoint
+
+        Use needs_full() to decide which objects to pass.
+
+        Args:
+            path: Checkpoint file to write
+            objects: Object dicts to store (all objects for a full checkpoint,
+                     at least the changed ones for a delta)
+            metadata: SyncMetadata.data
+            parent: Previous checkpoint; None forces a full checkpoint
+            parent_states: obj_id → (hash, version, source) at the parent checkpoint
+            current_states: obj_id → (hash, version, source) now (defaults to
+                            the object dicts)
+            removed: IDs deleted since the parent (defaults to parent - current)
+
+        Returns:
+            "full" or "delta"
+        """
+        timestamp = datetime.now().isoformat()
+        if parent is None or parent_states is None:
+            self.write_file(path, {
+                "checkpoint": {"kind": "full", "depth": 0, "timestamp": timestamp},
+                "objects": list(objects.values()),
+                "metadata": metadata
+            })
+            return "full"
+
+        if current_states is None:
+            current_states = {obj_id: object_state(obj) for obj_id, obj in objects.items()}
+        changed = [obj_id for obj_id, state in current_states.items()
+                   if parent_states.get(obj_id) != state]
+        if removed is None:
+            removed = [obj_id for obj_id in parent_states if obj_id not in current_states]
+
+        meta_objects = metadata.get("objects", {})
+        self.write_file(path, {
+            "checkpoint": {
+                "kind": "delta",
+                "parent": parent.name if parent.parent == path.parent else str(parent),
+                "depth": self.next_depth(parent),
+                "timestamp": timestamp
+            },
+            "objects": [objects[obj_id] for obj_id in changed],
+            "removed": removed,
+            "metadata": {
+                **{k: v for k, v in metadata.items() if k not in ("objects", "sync_history")},
+                "objects": {obj_id: meta_objects[obj_id] for obj_id in changed if obj_id in meta_objects},
+                "removed": [obj_id for obj_id in removed if obj_id not in meta_objects]
+            }
+        })
+        return "delta"
+
+    def compact(self, path: Optional[Path] = None, remove_old: bool = True) -> List[Path]:
+        """
+        Merge delta chains into full checkpoints written in place
+
+        Args:
+            path: Collapse only the chain ending here. By default every chain
+                  in the directory is collapsed, so only the newest checkpoint
+                  of each chain is kept (as a full snapshot)
+            remove_old: Delete the checkpoints that were merged
+
+        Returns:
+            The checkpoints that were rewritten
+        """
+        if path is not None:
+            targets = [path]
+        else:
+            files = self.checkpoint_files()
+            parents = set()
+            for checkpoint_path in files:
+                info = self.read_header(checkpoint_path)
+                if info["kind"] == "delta":
+                    parents.add((checkpoint_path.parent / info["parent"]).resolve())
+            targets = [p for p in files if p.resolve() not in parents]
+
+        merged = set()
+        compacted = []
+        for target in targets:
+            chain = self.chain(target)
+            if len(chain) == 1:
+                continue
+            objects, metadata = self.replay(target)
+            self.write_file(target, {
+                "checkpoint": {"kind": "full", "depth": 0, "timestamp": datetime.now().isoformat()},
+                "objects": list(objects.values()),
+                "metadata": metadata
+            })
+            merged.update(chain[:-1])
+            compacted.append(target)
+            logger.info(f"Compacted {len(chain)} checkpoints into {target}")
+
+        if remove_old and path is None:
+            for old in merged:
+                if old.exists():
+                    self.remove(old)
+        elif remove_old:
+            # Single chain: only delete files no other delta still builds on
+            referenced = set()
+            for other in self.checkpoint_files():
+                info = self.read_header(other)
+                if info["kind"] == "delta" and other not in merged:
+                    referenced.add((other.parent / info["parent"]).resolve())
+            for old in merged:
+                if old.resolve() not in referenced:
+                    self.remove(old)
+
+        if not compacted:
+            logger.info(f"No delta chains to compact in {self.checkpoint_dir}")
+        return compacted
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "compact":
+        print("Usage: python checkpoints.py compact <checkpoint_dir_or_file> [--keep]")
+        sys.exit(1)
+
+    target = Path(sys.argv[2])
+    if target.is_dir():
+        CheckpointStore(target).compact(remove_old="--keep" not in sys.argv)
+    else:
+        CheckpointStore(target.parent).compact(target, remove_old="--keep" not in sys.argv)
@@ -40,7 +40,20 @@ DEFAULT_EPSG = CoordinateSystem.UTM_33N.value
 AGOL_CONFIG = {
     "portal_url": "https://www.arcgisonline.com/sharing/rest",
     "max_batch_size": 1000,  # Max features per request
-    "timeout": 30,  # Request timeout in seconds
+    "max_batch_bytes": 2 * 1024 * 1024,  # Max JSON payload per request
+    "upload_workers": 4,  # Max AGOL requests in flight per uploader (see agol_async)
+    "requests_per_second": None,  # Token-bucket rate limit (None: unlimited)
+    "rate_burst": None,  # Requests allowed at once before the rate applies (None: one second's worth)
+    "pool_size": 16,  # Keep-alive connections per host (see agol_session)
+    "max_retries": 4,  # Retries on 429/5xx and transient connection errors (see agol_session)
+    "backoff_factor": 0.5,  # First retry delay in seconds, doubled per retry
+    "backoff_max": 30,  # Longest delay between retries
+    "token_expiration": 60,  # Requested token lifetime in minutes
+    "token_refresh_margin": 300,  # Refresh tokens this many seconds before they expire
+    "token_cache": SYNC_DIR / "agol_token.json",  # Reuse tokens across runs (None: memory only)
+    "object_id_field": "OBJECTID",  # Object ID field of hosted feature layers
+    "layer_index": 0,  # Layer of the feature service that applyEdits/query address
+    "publish_state": SYNC_DIR / "agol_publish.json",  # gh_id → objectId/hash per service (see agol_upsert)
 }
 
 # Sync configuration
@@ -51,10 +64,49 @@ SYNC_CONFIG = {
     "checkpoint_interval": 100,  # Save checkpoint every N objects
 }
 
+# Export-time geometry generalization (see geometry_tools.Generalizer)
+EXPORT_GENERALIZATION = {
+    "enabled": False,
+    "method": "douglas_peucker",  # Options: douglas_peucker, visvalingam
+    "tolerance": 0.01,  # Max deviation in model units
+    "precision": 4,  # Decimals kept per coordinate (None: full precision)
+    "dedupe_tolerance": 0.0,  # Merge consecutive vertices closer than this
+}
+
+# Artifact I/O (see artifact_io); readers accept every form regardless
+IO_CONFIG = {
+    "compression": None,  # Options: None, "gzip", "zstd" (needs the zstandard package)
+    "compact_json": False,  # Write JSON without indentation
+    "gzip_level": 6,
+    "zstd_level": 3,
+}
+
+# Grasshopper exchange files (see geo_exchange)
+GH_EXCHANGE_CONFIG = {
+    "binary_coordinates": False,  # Coordinates in a .coords sidecar instead of JSON (GH side must read it)
+    "coordinate_dtype": "float64",  # float64 (lossless) or float32
+    "ndjson": False,  # One object per line (.ndjson, see ndjson_exchange); overrides binary_coordinates
+    "ndjson_chunk_size": 10000,  # Objects between chunk boundaries (None: no boundaries)
+}
+
+# GH → Revit updates (see revit_gh_bridge.RevitImporter)
+REVIT_IMPORT_CONFIG = {
+    "chunk_size": 500,  # Max updates per chunk (one category and operation each)
+}
+
+# Audit trail of GH → Revit imports (see audit_store)
+AUDIT_CONFIG = {
+    "max_segment_bytes": 16 * 1024 * 1024,  # Rotate segments beyond this size
+    "max_segment_age_hours": 24,  # ... or after this age
+    "compression": "gzip",  # Closed segments: None, "gzip" or "zstd"
+    "retention_days": None,  # Delete closed segments older than this (None keeps all)
+}
+
 # Timeout settings
 TIMEOUT_CONFIG = {
     "gh_wait_timeout": 300,  # Max 5 minutes wait for GH output
-    "agol_request_timeout": 30,
+    "agol_request_timeout": 30,  # Read timeout of AGOL requests (see agol_session)
+    "agol_connect_timeout": 10,
     "revit_export_timeout": 60,
 }
 
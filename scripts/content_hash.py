@@ -0,0 +1,126 @@
+"""
+Content hashing shared by the sync engine, snapshot diffs and AGOL publishing
+Canonical encodings of properties and geometry and their 128-bit digests
+"""
+
+import hashlib
+import json
+import sys
+from array import array
+from typing import Dict, List, Any
+
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+
+# Canonical encoder for content hashing: sorted keys, compact separators.
+# Reusing one encoder avoids building a new JSONEncoder per json.dumps call.
+_CANONICAL_ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"), check_circular=False)
+
+HASH_ALGORITHMS = ("blake2b", "xxhash", "md5")
+HASH_ALGORITHM = "blake2b"
+
+
+def set_hash_algorithm(name: str):
+    """
+    Select the digest of the content hash: "blake2b" (default), "xxhash"
+    (needs the xxhash package) or "md5"
+
+    All of them hash the sub-hash scheme of combine_hashes, so none of them
+    reproduces hashes stored by older versions (see compute_legacy_hash).
+    """
+    global HASH_ALGORITHM
+    if name not in HASH_ALGORITHMS:
+        raise ValueError(f"Unknown hash algorithm: {name}")
+    if name == "xxhash" and xxhash is None:
+        raise ImportError("xxhash is not installed (pip install xxhash)")
+    HASH_ALGORITHM = name
+
+
+def _digest(data: bytes) -> str:
+    """128-bit hex digest of data with the configured algorithm"""
+    if HASH_ALGORITHM == "blake2b":
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+    if HASH_ALGORITHM == "xxhash":
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.md5(data).hexdigest()
+
+
+def canonical_bytes(value: Any) -> bytes:
+    """Deterministic serialization of a JSON-compatible value"""
+    return _CANONICAL_ENCODER.encode(value).encode("ascii")
+
+
+def _pack_coordinates(coords: list, flat: array, shape: List[str]):
+    """Flatten nested numeric coordinates into flat, recording the nesting in shape"""
+    if coords and isinstance(coords[0], list):
+        shape.append("(")
+        for child in coords:
+            _pack_coordinates(child, flat, shape)
+        shape.append(")")
+    else:
+        flat.extend(coords)  # TypeError for non-numeric values
+        shape.append(str(len(coords)))
+
+
+def geometry_bytes(geometry: Dict[str, Any]) -> bytes:
+    """
+    Canonical encoding of a geometry for hashing
+
+    Plain {"type", "coordinates"} geometries are encoded as the type, the
+    nesting shape and the coordinates packed as little-endian float64,
+    which avoids formatting every float as text. Anything else falls back
+    to canonical JSON.
+    """
+    if isinstance(geometry, dict) and geometry.keys() == {"type", "coordinates"}:
+        coords = geometry["coordinates"]
+        if isinstance(coords, list) and isinstance(geometry["type"], str):
+            flat = array("d")
+            shape = []
+            try:
+                _pack_coordinates(coords, flat, shape)
+            except TypeError:
+                return canonical_bytes(geometry)
+            if sys.byteorder != "little":
+                flat.byteswap()
+            return b"".join([b"G", geometry["type"].encode(), b"|",
+                             ",".join(shape).encode(), b"|", flat.tobytes()])
+    return canonical_bytes(geometry)
+
+
+def compute_geometry_hash(geometry: Dict[str, Any]) -> str:
+    return _digest(geometry_bytes(geometry))
+
+
+def compute_property_hash(properties: Dict[str, Any]) -> str:
+    return _digest(canonical_bytes(properties))
+
+
+def combine_hashes(obj_type: str, property_hash: str, geometry_hash: str) -> str:
+    """Content hash from the type and the property/geometry sub-hashes"""
+    return _digest(f"{obj_type}|{property_hash}|{geometry_hash}".encode())
+
+
+def compute_content_hash(obj_type: str, properties: Dict[str, Any],
+                         geometry: Dict[str, Any]) -> str:
+    """Hash the content of an element without building a DataObject"""
+    return combine_hashes(obj_type, compute_property_hash(properties), compute_geometry_hash(geometry))
+
+
+def compute_legacy_hash(obj_type: str, properties: Dict[str, Any],
+                        geometry: Dict[str, Any]) -> str:
+    """
+    Content hash stored by versions before the sub-hash scheme: md5 of the
+    sorted-key JSON of type, properties and geometry. Only used to recognize
+    unchanged elements in metadata written by those versions.
+    """
+    data = json.dumps({"type": obj_type, "properties": properties, "geometry": geometry}, sort_keys=True)
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def compute_attribute_hash(obj_type: str, properties: Dict[str, Any], revit_id: Any = None) -> str:
+    """Hash of the non-geometry content of an element: type, properties and Revit ID"""
+    return _digest(canonical_bytes([obj_type, properties, revit_id]))
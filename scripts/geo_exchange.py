@@ -0,0 +1,259 @@
+"""
+Binary coordinate exchange format
+Attributes stay in JSON, coordinates live in a sidecar buffer of
+little-endian float64 (or float32) values that can be memory-mapped
+
+Layout of <name>.json:
+    {"format": "revit-gis-coords", "version": 1, "sidecar": "<name>.coords",
+     "dtype": "float64", "features": [...]}
+where each feature's geometry has "coordinates_ref": {"offset", "dims", "shape"}
+instead of "coordinates". offset counts values (not bytes) into the sidecar;
+shape is 0 for a single position, n for a list of n positions and a list
+of shapes for deeper nesting. Geometries that don't fit (mixed dimensions,
+non-numeric values, empty lists) keep inline "coordinates".
+
+Sidecar: 16-byte header (b"RGCOORD1", dtype code, padding) then the values.
+
+load_features() reads both this format and plain JSON feature lists.
+"""
+
+import gc
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from artifact_io import read_json, write_json, base_path
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+FORMAT_NAME = "revit-gis-coords"
+SIDECAR_SUFFIX = ".coords"
+SIDECAR_MAGIC = b"RGCOORD1"
+HEADER_SIZE = 16
+DTYPES = {"float64": "d", "float32": "f"}
+
+
+def _encode(coords: Any, flat: array) -> Tuple[Optional[Any], int]:
+    """
+    Append coords to flat, returning (shape, dims)
+
+    shape is None (and flat is left partially filled) if the coordinates
+    can't be encoded; callers truncate flat in that case.
+    """
+    if not isinstance(coords, list) or not coords:
+        return None, 0
+
+    first = coords[0]
+    if isinstance(first, (int, float)) and not isinstance(first, bool):
+        # A single position
+        if not all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in coords):
+            return None, 0
+        flat.extend(coords)
+        return 0, len(coords)
+
+    if isinstance(first, list) and first and isinstance(first[0], (int, float)):
+        # A list of positions
+        dims = len(first)
+        for position in coords:
+            shape, position_dims = _encode(position, flat)
+            if shape != 0 or position_dims != dims:
+                return None, 0
+        return len(coords), dims
+
+    shapes = []
+    dims = None
+    for child in coords:
+        shape, child_dims = _encode(child, flat)
+        if shape is None or (dims is not None and child_dims != dims):
+            return None, 0
+        shapes.append(shape)
+        dims = child_dims
+    return shapes, dims
+
+
+def _count(shape: Any) -> int:
+    """Number of positions described by shape"""
+    if isinstance(shape, list):
+        return sum(_count(child) for child in shape)
+    return shape or 1
+
+
+def _decode(shape: Any, dims: int, values: List[float], pos: int) -> Tuple[list, int]:
+    if shape == 0:
+        return values[pos:pos + dims], pos + dims
+    if isinstance(shape, int):
+        positions = [values[i:i + dims] for i in range(pos, pos + shape * dims, dims)]
+        return positions, pos + shape * dims
+    result = []
+    for child in shape:
+        value, pos = _decode(child, dims, values, pos)
+        result.append(value)
+    return result, pos
+
+
+def save_features(path: Path, features: List[Dict[str, Any]], dtype: str = "float64",
+                  compact: Optional[bool] = True) -> Path:
+    """
+    Write features with coordinates in a binary sidecar next to `path`
+
+    float64 is lossless; float32 halves the sidecar but rounds coordinates
+    (and therefore changes content hashes). The JSON part is written via
+    artifact_io (compressed per IO_CONFIG); the sidecar stays uncompressed
+    so it can be memory-mapped.
+
+    Returns:
+        The JSON path actually written (the sidecar is <name>.coords)
+    """
+    typecode = DTYPES[dtype]
+    path = Path(path)
+    sidecar = base_path(path).with_suffix(SIDECAR_SUFFIX)
+    flat = array(typecode)
+
+    out_features = []
+    for feature in features:
+        geometry = feature.get("geometry")
+        if isinstance(geometry, dict) and "coordinates" in geometry:
+            start = len(flat)
+            shape, dims = _encode(geometry["coordinates"], flat)
+            if shape is None:
+                del flat[start:]
+            else:
+                geometry = {k: v for k, v in geometry.items() if k != "coordinates"}
+                geometry["coordinates_ref"] = {"offset": start, "dims": dims, "shape": shape}
+                feature = {**feature, "geometry": geometry}
+        out_features.append(feature)
+
+    if sys.byteorder != "little":
+        flat.byteswap()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(sidecar, 'wb') as f:
+        f.write(SIDECAR_MAGIC + typecode.encode() + bytes(HEADER_SIZE - len(SIDECAR_MAGIC) - 1))
+        flat.tofile(f)
+
+    return write_json(path, {
+        "format": FORMAT_NAME,
+        "version": 1,
+        "sidecar": sidecar.name,
+        "dtype": dtype,
+        "features": out_features
+    }, compact=compact)
+
+
+class CoordinateSidecar:
+    """Memory-mapped sidecar buffer, read without parsing any JSON"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+        header = self._map[:HEADER_SIZE] if self._map is not None else b""
+        if header[:len(SIDECAR_MAGIC)] != SIDECAR_MAGIC:
+            self.close()
+            raise ValueError(f"Not a coordinate sidecar: {self.path}")
+        self.typecode = chr(header[len(SIDECAR_MAGIC)])
+        self.itemsize = array(self.typecode).itemsize
+        self.count = (size - HEADER_SIZE) // self.itemsize
+
+    def values(self, offset: int = 0, count: Optional[int] = None) -> array:
+        """Copy of `count` values starting at `offset` (all by default)"""
+        if count is None:
+            count = self.count - offset
+        start = HEADER_SIZE + offset * self.itemsize
+        values = array(self.typecode)
+        values.frombytes(self._map[start:start + count * self.itemsize])
+        if sys.byteorder != "little":
+            values.byteswap()
+        return values
+
+    def view(self):
+        """Zero-copy numpy view of the whole buffer (requires numpy)"""
+        if np is None:
+            raise ImportError("numpy is required for CoordinateSidecar.view()")
+        dtype = np.dtype("<f8" if self.typecode == "d" else "<f4")
+        return np.frombuffer(self._map, dtype=dtype, count=self.count, offset=HEADER_SIZE)
+
+    def coordinates(self, ref: Dict[str, Any]) -> list:
+        """Nested coordinate lists for one geometry's coordinates_ref"""
+        dims = ref["dims"]
+        values = self.values(ref["offset"], _count(ref["shape"]) * dims).tolist()
+        return _decode(ref["shape"], dims, values, 0)[0]
+
+    def close(self):
+        if self._map is not None and not self._map.closed:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_binary_document(data: Any) -> bool:
+    return isinstance(data, dict) and data.get("format") == FORMAT_NAME
+
+
+def resolve_feature(feature: Dict[str, Any], sidecar: CoordinateSidecar) -> Dict[str, Any]:
+    """One feature with its coordinates read from an open sidecar"""
+    geometry = feature.get("geometry")
+    if not isinstance(geometry, dict) or "coordinates_ref" not in geometry:
+        return feature
+    geometry = {k: v for k, v in geometry.items() if k != "coordinates_ref"}
+    geometry["coordinates"] = sidecar.coordinates(feature["geometry"]["coordinates_ref"])
+    return {**feature, "geometry": geometry}
+
+
+def resolve_coordinates(document: Dict[str, Any], base_dir: Path) -> List[Dict[str, Any]]:
+    """Features of a parsed binary document with coordinates read back in"""
+    features = document["features"]
+    with open(Path(base_dir) / document["sidecar"], 'rb') as f:
+        f.seek(HEADER_SIZE)
+        flat = array(DTYPES[document["dtype"]])
+        flat.frombytes(f.read())
+    if sys.byteorder != "little":
+        flat.byteswap()
+    values = flat.tolist()
+
+    # Millions of small position lists trigger repeated full GC passes;
+    # nothing built here can form a reference cycle
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        result = []
+        for feature in features:
+            geometry = feature.get("geometry")
+            if isinstance(geometry, dict) and "coordinates_ref" in geometry:
+                ref = geometry["coordinates_ref"]
+                geometry = {k: v for k, v in geometry.items() if k != "coordinates_ref"}
+                geometry["coordinates"] = _decode(ref["shape"], ref["dims"], values, ref["offset"])[0]
+                feature = {**feature, "geometry": geometry}
+            result.append(feature)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return result
+
+
+def load_features(path: Path, resolve: bool = True) -> Any:
+    """
+    Load a feature file, detecting the format
+
+    Plain JSON is returned as parsed. Binary documents return their feature
+    list with coordinates filled in from the sidecar, or (resolve=False)
+    the raw document so coordinates can be read lazily via CoordinateSidecar.
+    """
+    path = Path(path)
+    data = read_json(path)
+    if not is_binary_document(data):
+        return data
+    return resolve_coordinates(data, path.parent) if resolve else data
@@ -0,0 +1,260 @@
+"""
+Geometry generalization for exports
+Douglas-Peucker / Visvalingam-Whyatt simplification, duplicate-vertex
+removal and fixed-precision quantization of coordinate lists
+
+Uses numpy for whole-array operations when installed, plain Python otherwise.
+Distances are measured in XY; Z (and any further ordinates) are carried along.
+"""
+
+import heapq
+import math
+from typing import Dict, List, Any, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# Below this many vertices the per-call numpy overhead outweighs the gain
+NUMPY_MIN_POINTS = 32
+
+
+def _as_array(points: List[List[float]]):
+    """points as an (n, dims) float array, or None if numpy can't be used"""
+    if np is None or len(points) < NUMPY_MIN_POINTS:
+        return None
+    try:
+        arr = np.asarray(points, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None  # ragged 2D/3D mix
+    return arr if arr.ndim == 2 and arr.shape[1] >= 2 else None
+
+
+def remove_duplicate_vertices(points: List[List[float]], tolerance: float = 0.0) -> List[List[float]]:
+    """Drop vertices within `tolerance` (XY) of the previously kept vertex"""
+    if len(points) < 2:
+        return points
+
+    arr = _as_array(points)
+    if arr is not None and tolerance == 0.0:
+        keep = np.ones(len(arr), dtype=bool)
+        keep[1:] = np.any(arr[1:] != arr[:-1], axis=1)
+        return [points[i] for i in np.flatnonzero(keep)]
+
+    result = [points[0]]
+    tol2 = tolerance * tolerance
+    for p in points[1:]:
+        last = result[-1]
+        dx, dy = p[0] - last[0], p[1] - last[1]
+        if (dx * dx + dy * dy > tol2) if tolerance > 0 else (p != last):
+            result.append(p)
+    return result
+
+
+def quantize(points: List[List[float]], precision: int) -> List[List[float]]:
+    """Round every ordinate to `precision` decimals"""
+    arr = _as_array(points)
+    if arr is not None:
+        return np.round(arr, precision).tolist()
+    return [[round(c, precision) for c in p] for p in points]
+
+
+def _segment_distances(xs: List[float], ys: List[float], i: int, j: int) -> List[float]:
+    """Distances of vertices i+1..j-1 to the segment line through i and j"""
+    x0, y0 = xs[i], ys[i]
+    dx, dy = xs[j] - x0, ys[j] - y0
+    length = math.hypot(dx, dy)
+    if length == 0.0:
+        return [math.hypot(xs[k] - x0, ys[k] - y0) for k in range(i + 1, j)]
+    return [abs(dx * (ys[k] - y0) - dy * (xs[k] - x0)) / length for k in range(i + 1, j)]
+
+
+def douglas_peucker(points: List[List[float]], tolerance: float) -> List[List[float]]:
+    """Ramer-Douglas-Peucker: keep vertices deviating more than `tolerance`"""
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+
+    arr = _as_array(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    if arr is not None:
+        xy = arr[:, :2]
+        while stack:
+            i, j = stack.pop()
+            if j <= i + 1:
+                continue
+            seg = xy[j] - xy[i]
+            rel = xy[i + 1:j] - xy[i]
+            length = math.hypot(seg[0], seg[1])
+            if length == 0.0:
+                dist = np.hypot(rel[:, 0], rel[:, 1])
+            else:
+                dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / length
+            k = int(np.argmax(dist))
+            if dist[k] > tolerance:
+                k += i + 1
+                keep[k] = True
+                stack.append((i, k))
+                stack.append((k, j))
+    else:
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        while stack:
+            i, j = stack.pop()
+            if j <= i + 1:
+                continue
+            dist = _segment_distances(xs, ys, i, j)
+            k = max(range(len(dist)), key=dist.__getitem__)
+            if dist[k] > tolerance:
+                k += i + 1
+                keep[k] = True
+                stack.append((i, k))
+                stack.append((k, j))
+
+    return [p for p, kept in zip(points, keep) if kept]
+
+
+def _triangle_area(a: List[float], b: List[float], c: List[float]) -> float:
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+
+def visvalingam(points: List[List[float]], tolerance: float) -> List[List[float]]:
+    """
+    Visvalingam-Whyatt: repeatedly drop the vertex with the smallest
+    effective area while that area is below tolerance² (so `tolerance` is a
+    length, comparable with douglas_peucker)
+    """
+    n = len(points)
+    if n < 3 or tolerance <= 0:
+        return points
+    threshold = tolerance * tolerance
+
+    arr = _as_array(points)
+    if arr is not None:
+        a, b, c = arr[:-2, :2], arr[1:-1, :2], arr[2:, :2]
+        areas = (np.abs((b[:, 0] - a[:, 0]) * (c[:, 1] - a[:, 1])
+                        - (c[:, 0] - a[:, 0]) * (b[:, 1] - a[:, 1])) / 2.0).tolist()
+    else:
+        areas = [_triangle_area(points[k - 1], points[k], points[k + 1]) for k in range(1, n - 1)]
+
+    prev = list(range(-1, n - 1))
+    nxt = list(range(1, n + 1))
+    area = [math.inf] + areas + [math.inf]
+    heap = [(area[k], k) for k in range(1, n - 1)]
+    heapq.heapify(heap)
+    removed = [False] * n
+
+    while heap:
+        value, k = heapq.heappop(heap)
+        if removed[k] or value != area[k]:
+            continue  # stale entry
+        if value >= threshold:
+            break
+        removed[k] = True
+        p, q = prev[k], nxt[k]
+        nxt[p], prev[q] = q, p
+        for m in (p, q):
+            if 0 < m < n - 1:
+                # A neighbour's area never drops below the removed one's
+                area[m] = max(_triangle_area(points[prev[m]], points[m], points[nxt[m]]), value)
+                heapq.heappush(heap, (area[m], m))
+
+    return [p for p, gone in zip(points, removed) if not gone]
+
+
+SIMPLIFIERS = {
+    "douglas_peucker": douglas_peucker,
+    "visvalingam": visvalingam,
+}
+
+
+def generalize_points(points: List[List[float]], tolerance: float = 0.0,
+                      method: str = "douglas_peucker", precision: Optional[int] = None,
+                      dedupe_tolerance: float = 0.0) -> List[List[float]]:
+    """
+    Generalize one vertex list (line or ring)
+
+    Duplicates are removed first, then the line is simplified and
+    quantized (with a final pass for duplicates created by rounding).
+    Closed rings stay closed and keep at least 4 vertices; lines keep
+    their end points.
+    """
+    if len(points) < 2:
+        return quantize(points, precision) if precision is not None else points
+
+    closed = len(points) >= 4 and points[0] == points[-1]
+    min_points = 4 if closed else 2
+
+    result = remove_duplicate_vertices(points, dedupe_tolerance)
+    if tolerance > 0:
+        result = SIMPLIFIERS[method](result, tolerance)
+    if precision is not None:
+        result = remove_duplicate_vertices(quantize(result, precision))
+    if closed and result[0] != result[-1]:
+        result.append(list(result[0]))
+
+    if len(result) < min_points:
+        # Collapsed below a valid line/ring: fall back to the input, only rounded
+        return quantize(points, precision) if precision is not None else points
+    return result
+
+
+def _is_position(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and isinstance(value[0], (int, float))
+
+
+def generalize_coordinates(coords: Any, **options) -> Any:
+    """Apply generalize_points to every vertex list in a nested coordinate array"""
+    if not isinstance(coords, list) or not coords:
+        return coords
+    if _is_position(coords):
+        precision = options.get("precision")
+        return quantize([coords], precision)[0] if precision is not None else coords
+    if _is_position(coords[0]):
+        return generalize_points(coords, **options)
+    return [generalize_coordinates(child, **options) for child in coords]
+
+
+class Generalizer:
+    """
+    Export-time geometry generalization with fixed settings
+
+    Args:
+        tolerance: Simplification tolerance in model units (0 disables)
+        method: "douglas_peucker" or "visvalingam"
+        precision: Decimals to round coordinates to (None keeps full precision)
+        dedupe_tolerance: Distance under which consecutive vertices are merged
+    """
+
+    def __init__(self, tolerance: float = 0.0, method: str = "douglas_peucker",
+                 precision: Optional[int] = None, dedupe_tolerance: float = 0.0):
+        if method not in SIMPLIFIERS:
+            raise ValueError(f"Unknown simplification method: {method}")
+        self.options = {
+            "tolerance": tolerance,
+            "method": method,
+            "precision": precision,
+            "dedupe_tolerance": dedupe_tolerance,
+        }
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["Generalizer"]:
+        """Generalizer for a config dict like config.EXPORT_GENERALIZATION (None if disabled)"""
+        if not config.get("enabled", False):
+            return None
+        return cls(
+            tolerance=config.get("tolerance", 0.0),
+            method=config.get("method", "douglas_peucker"),
+            precision=config.get("precision"),
+            dedupe_tolerance=config.get("dedupe_tolerance", 0.0),
+        )
+
+    def __call__(self, geometry: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(geometry, dict) or "coordinates" not in geometry:
+            return geometry
+        return {**geometry, "coordinates": generalize_coordinates(geometry["coordinates"], **self.options)}
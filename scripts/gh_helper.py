@@ -11,13 +11,17 @@ Usage in Grasshopper:
     5. Save data: helper.save_output_data(modified_data)
 """
 
-import json
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 import logging
 import os
 
+from geo_exchange import save_features
+from json_stream import read_items
+from ndjson_exchange import is_ndjson, load_objects, write_objects, append_objects
+from artifact_io import write_json
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -77,8 +81,10 @@ class GrassholperDataHelper:
             else:
                 # Find latest input file
                 import glob
-                pattern = os.path.join(self.gh_input_dir, "gh_input_*.json")
-                input_files = glob.glob(pattern)
+                # Plain or compressed (gh_input_*.json.gz / .json.zst) or NDJSON
+                input_files = []
+                for pattern in ("gh_input_*.json*", "gh_input_*.ndjson"):
+                    input_files += glob.glob(os.path.join(self.gh_input_dir, pattern))
                 if not input_files:
                     logger.warning("No input files found in gh_inputs/")
                     return []
@@ -89,8 +95,12 @@ class GrassholperDataHelper:
                 logger.error("Input file not found: {}".format(filepath))
                 return []
             
-            with open(filepath, 'r') as f:
-                self.current_data = json.load(f)
+            # NDJSON in parallel (large files), plain JSON or JSON + binary
+            # coordinate sidecar parsed incrementally
+            if is_ndjson(filepath):
+                self.current_data = load_objects(filepath)
+            else:
+                self.current_data = list(read_items(filepath))
             
             self.current_input_file = filepath
             logger.info("Loaded {} objects from {}".format(len(self.current_data), os.path.basename(filepath)))
@@ -102,13 +112,17 @@ class GrassholperDataHelper:
             return []
     
     def save_output_data(self, modified_data: List[Dict[str, Any]], 
-                        filename: Optional[str] = None) -> str:
+                        filename: Optional[str] = None,
+                        binary_coordinates: bool = False,
+                        ndjson: bool = False) -> str:
         """
         Save modified data for AGOL export
         
         Args:
             modified_data: List of modified geometry objects
             filename: Custom filename. If None, auto-generates.
+            binary_coordinates: Write coordinates to a binary .coords sidecar
+            ndjson: Write one object per line (.ndjson), see append_output_data
         
         Returns:
             Path to saved file (as string)
@@ -120,8 +134,12 @@ class GrassholperDataHelper:
             
             filepath = os.path.join(self.gh_output_dir, filename)
             
-            with open(filepath, 'w') as f:
-                json.dump(modified_data, f, indent=2)
+            if ndjson:
+                filepath = str(write_objects(os.path.splitext(filepath)[0] + ".ndjson", modified_data))
+            elif binary_coordinates:
+                filepath = str(save_features(filepath, modified_data))
+            else:
+                filepath = str(write_json(filepath, modified_data))
             
             logger.info("Saved {} modified objects to {}".format(len(modified_data), os.path.basename(filepath)))
             return filepath
@@ -130,6 +148,29 @@ class GrassholperDataHelper:
             logger.error("Error saving output data: {}".format(e))
             return None
     
+    def append_output_data(self, modified_data: List[Dict[str, Any]], filename: str) -> int:
+        """
+        Append modified objects to an NDJSON output file without rewriting it
+        
+        Later lines supersede earlier ones with the same ID when loaded.
+        
+        Args:
+            modified_data: Objects to append
+            filename: NDJSON file in gh_outputs/ (created if missing)
+        
+        Returns:
+            Number of objects appended
+        """
+        
+        try:
+            count = append_objects(os.path.join(self.gh_output_dir, filename), modified_data)
+            logger.info("Appended {} objects to {}".format(count, filename))
+            return count
+        
+        except Exception as e:
+            logger.error("Error appending output data: {}".format(e))
+            return 0
+    
     def get_object_by_id(self, obj_id: str) -> Optional[Dict[str, Any]]:
         """Get specific object by ID"""
         for obj in self.current_data:
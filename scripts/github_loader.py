@@ -9,6 +9,7 @@ Usage:
     SyncEngine = load_class('merge_engine', 'SyncEngine')
 """
 
+import re
 import sys
 import urllib.request
 import importlib.util
@@ -19,11 +20,62 @@ GITHUB_RAW_URL = f"https://raw.githubusercontent.com/{GITHUB_REPO}/main"
 
 SCRIPTS_URL = f"{GITHUB_RAW_URL}/scripts"
 
+# Modules in scripts/, dependencies first
+MODULE_NAMES = [
+    'config',
+    'artifact_io',
+    'geo_exchange',
+    'ndjson_exchange',
+    'json_stream',
+    'gh_helper',
+    'content_hash',
+    'metadata_store',
+    'object_store',
+    'checkpoints',
+    'geometry_tools',
+    'merge_engine',
+    'snapshot_diff',
+    'audit_store',
+    'revit_gh_bridge',
+    'agol_session',
+    'agol_async',
+    'agol_upsert',
+    'agol_exporter',
+    'integration_pipeline'
+]
+
+IMPORT_LINE = re.compile(r"^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))", re.MULTILINE)
+
+
+def repo_imports(code):
+    """Modules of this repository imported by code (in order of appearance)"""
+    names = []
+    for match in IMPORT_LINE.finditer(code):
+        name = match.group(1) or match.group(2)
+        if name in MODULE_NAMES and name not in names:
+            names.append(name)
+    return names
+
+
+def load_dependencies(code, loaded, loader):
+    """
+    Load the repository modules code imports before executing it
+    
+    A module executed from a download can't find its sibling modules on
+    sys.path, so each one is downloaded once per top-level load (loaded
+    holds the names done so far).
+    """
+    for name in repo_imports(code):
+        if name not in loaded:
+            loader(name, _loaded=loaded)
 
-def load_module_from_github(module_name):
+
+def load_module_from_github(module_name, _loaded=None):
     """
     Load a module directly from GitHub
     
+    Repository modules it imports are downloaded first (see load_dependencies).
+    
     Args:
         module_name: Name of module file (without .py)
         
@@ -48,6 +100,10 @@ def load_module_from_github(module_name):
         response = urllib.request.urlopen(url)
         code = response.read().decode('utf-8')
         
+        loaded = _loaded if _loaded is not None else set()
+        loaded.add(module_name)
+        load_dependencies(code, loaded, load_module_from_github)
+        
         # Create and execute module
         module = importlib.util.module_from_spec(
             importlib.util.spec_from_loader(module_name, loader=None)
@@ -103,18 +159,14 @@ def load_all_from_github():
     """
     
     modules = {}
-    module_names = [
-        'gh_helper',
-        'merge_engine',
-        'revit_gh_bridge',
-        'agol_exporter',
-        'integration_pipeline',
-        'config'
-    ]
-    
-    for name in module_names:
+    loaded = set()
+    
+    for name in MODULE_NAMES:
         try:
-            modules[name] = load_module_from_github(name)
+            if name in loaded:
+                modules[name] = sys.modules[name]  # already loaded as a dependency
+            else:
+                modules[name] = load_module_from_github(name, _loaded=loaded)
             print(f"✅ {name}")
         except Exception as e:
             print(f"⚠️  {name}: {e}")
@@ -123,10 +175,13 @@ def load_all_from_github():
 
 
 # Simpler version using direct exec - FORCE FRESH DOWNLOAD
-def load_github_module_simple(module_name):
+def load_github_module_simple(module_name, _loaded=None):
     """
     Simplified loader using exec - ALWAYS downloads fresh from GitHub
     
+    Repository modules it imports (e.g. artifact_io and json_stream for
+    gh_helper) are downloaded fresh as well.
+    
     Usage:
         gh_helper = load_github_module_simple('gh_helper')
         helper = gh_helper.GrassholperDataHelper(data_dir=r"C:\path\to\data")
@@ -148,6 +203,10 @@ def load_github_module_simple(module_name):
         
         print(f"   Downloaded {len(code)} bytes")
         
+        loaded = _loaded if _loaded is not None else set()
+        loaded.add(module_name)
+        load_dependencies(code, loaded, load_github_module_simple)
+        
         # Create a module
         module = type(sys)('module')
         module.__name__ = module_name
@@ -3,10 +3,9 @@ Revit ↔ Grasshopper ↔ ArcGIS Online Integration Orchestrator
 Main entry point for complete sync pipeline
 """
 
-import json
 import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterable, Tuple
 from datetime import datetime
 import logging
 
@@ -14,6 +13,11 @@ import logging
 from merge_engine import SyncEngine, DataObject
 from revit_gh_bridge import RevitGHBridge
 from agol_exporter import AGOLExporter, GeoJSONConverter
+from geo_exchange import save_features
+from json_stream import read_items
+from ndjson_exchange import write_objects
+from artifact_io import write_json, find_artifact
+from config import GH_EXCHANGE_CONFIG
 
 logging.basicConfig(
     level=logging.INFO,
@@ -47,6 +51,9 @@ class RevitGISIntegrationPipeline:
             logger.warning("⚠️  AGOL credentials not provided. AGOL export disabled.")
         
         self.pipeline_log = []
+        
+        # Revit changes of the last step 2 (elements as GH records), None after a full sync
+        self.change_set: Optional[Dict[str, Any]] = None
     
     def step_1_revit_export(self, revit_document: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -66,7 +73,9 @@ class RevitGISIntegrationPipeline:
                 "timestamp": datetime.now().isoformat(),
                 "step": "revit_export",
                 "status": "success",
-                "elements_count": sum(len(v) for v in exported["elements"].values())
+                "elements_count": sum(len(v) for v in exported["elements"].values()),
+                "element_errors": len(self.revit_bridge.exporter.errors),
+                "changes": self.revit_bridge.last_changes["counts"]
             })
             
             return exported
@@ -93,18 +102,33 @@ class RevitGISIntegrationPipeline:
         logger.info("="*60)
         
         try:
-            # Flatten Revit elements
-            all_elements = []
-            
-            for elem_type, elements in revit_export["elements"].items():
-                all_elements.extend(elements)
-            
-            # Process through sync engine
-            gh_data = self.sync_engine.sync_revit_to_gh(all_elements)
+            changes = self.revit_bridge.last_changes
+            if (changes and changes.get("baseline") and self.sync_engine.metadata.data["objects"]
+                    and self.sync_engine.load_base_objects()):
+                # Only the elements changed since the previous export (on top of the last checkpoint)
+                applied = self.sync_engine.sync_snapshot_changes(
+                    changes, revit_timestamp=revit_export.get("timestamp"))
+                gh_data = self.sync_engine.export_to_grasshopper()
+                changed = changes.get("elements", {})
+                self.change_set = {**changes, "elements": {record["id"]: record for record in gh_data
+                                                           if record["id"] in changed}}
+                versioned = sum(len(ids) for ids in applied.values())
+            else:
+                # Flatten Revit elements
+                all_elements = []
+                
+                for elem_type, elements in revit_export["elements"].items():
+                    all_elements.extend(elements)
+                
+                # Process through sync engine
+                gh_data = self.sync_engine.sync_revit_to_gh(all_elements, incremental=True,
+                                                            revit_timestamp=revit_export.get("timestamp"))
+                self.change_set = None
+                versioned = len(gh_data)
             
             # Save checkpoint
-            checkpoint_path = self.data_dir / "checkpoints" / f"sync_checkpoint_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-            self.sync_engine.save_state(checkpoint_path)
+            checkpoint_path = self.data_dir / "checkpoints" / f"sync_checkpoint_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.ckpt"
+            self.sync_engine.save_state(checkpoint_path, delta=True)
             
             logger.info(f"✅ Synced {len(gh_data)} objects")
             
@@ -112,7 +136,8 @@ class RevitGISIntegrationPipeline:
                 "timestamp": datetime.now().isoformat(),
                 "step": "sync_versioning",
                 "status": "success",
-                "objects_versioned": len(gh_data)
+                "mode": "full" if self.change_set is None else "changes",
+                "objects_versioned": versioned
             })
             
             return gh_data
@@ -143,8 +168,13 @@ class RevitGISIntegrationPipeline:
             
             gh_file = gh_export_dir / f"gh_input_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
-            with open(gh_file, 'w') as f:
-                json.dump(gh_data, f, indent=2)
+            if GH_EXCHANGE_CONFIG["ndjson"]:
+                gh_file = write_objects(gh_file.with_suffix(".ndjson"), gh_data,
+                                        chunk_size=GH_EXCHANGE_CONFIG["ndjson_chunk_size"])
+            elif GH_EXCHANGE_CONFIG["binary_coordinates"]:
+                gh_file = save_features(gh_file, gh_data, dtype=GH_EXCHANGE_CONFIG["coordinate_dtype"])
+            else:
+                gh_file = write_json(gh_file, gh_data)
             
             logger.info(f"✅ GH input file created: {gh_file}")
             logger.info(f"   → Load this file in Grasshopper for processing")
@@ -169,40 +199,42 @@ class RevitGISIntegrationPipeline:
             })
             return None
     
-    def step_4_import_grasshopper_modifications(self, gh_output_file: Path) -> List[Dict[str, Any]]:
+    def step_4_import_grasshopper_modifications(self, gh_output_file: Path) -> Optional[int]:
         """
         STEP 4: Import GH Modifications
         - Load modified data from Grasshopper
         - Update sync engine with changes
         - Prepare for next stage
+        
+        The file is streamed into the sync engine and only counted; step 5
+        reads it again instead of keeping every object in memory.
+        
+        Returns:
+            Number of objects imported (None if the file is missing or failed)
         """
         logger.info("\n" + "="*60)
         logger.info("STEP 4: IMPORT GRASSHOPPER MODIFICATIONS")
         logger.info("="*60)
         
         try:
-            if not gh_output_file.exists():
+            if find_artifact(gh_output_file) is None:
                 logger.warning(f"⚠️  GH output file not found: {gh_output_file}")
                 logger.info("   → Waiting for Grasshopper to complete modifications...")
                 return None
             
-            # Load GH modifications
-            with open(gh_output_file, 'r') as f:
-                gh_modified = json.load(f)
-            
-            # Update sync engine
-            self.sync_engine.import_from_grasshopper(gh_modified)
+            # Stream GH modifications into the sync engine while parsing
+            count = self.sync_engine.import_from_file(gh_output_file, source="grasshopper")
             
-            logger.info(f"✅ Imported {len(gh_modified)} modified objects from GH")
+            logger.info(f"✅ Imported {count} modified objects from GH")
             
             self.pipeline_log.append({
                 "timestamp": datetime.now().isoformat(),
                 "step": "import_grasshopper",
                 "status": "success",
-                "objects_modified": len(gh_modified)
+                "objects_modified": count
             })
             
-            return gh_modified
+            return count
         
         except Exception as e:
             logger.error(f"❌ GH import failed: {e}")
@@ -214,14 +246,19 @@ class RevitGISIntegrationPipeline:
             })
             return None
     
-    def step_5_export_arcgis_online(self, gh_modified_data: List[Dict[str, Any]], 
+    def step_5_export_arcgis_online(self, gh_modified_data: Iterable[Dict[str, Any]], 
                                     service_title: str = "Revit-GH Export",
-                                    use_agol: bool = True) -> Tuple[bool, str]:
+                                    use_agol: bool = True,
+                                    create_new_service: bool = True,
+                                    changes: Optional[Dict[str, Any]] = None) -> Tuple[bool, str]:
         """
         STEP 5: Export to ArcGIS Online
         - Convert to GeoJSON
-        - Upload to AGOL Feature Service
+        - Upload to AGOL Feature Service (or only the changes to an existing one)
         - Generate public link
+        
+        With changes (the change set of step 2) and create_new_service=False
+        only the changed elements are converted and published.
         """
         logger.info("\n" + "="*60)
         logger.info("STEP 5: EXPORT TO ARCGIS ONLINE")
@@ -234,11 +271,15 @@ class RevitGISIntegrationPipeline:
             
             if use_agol and self.agol_exporter:
                 # Export directly to AGOL
-                success, result = self.agol_exporter.export_to_agol(
-                    gh_modified_data,
-                    service_title=service_title,
-                    service_description="Auto-exported from Revit via Grasshopper"
-                )
+                if changes is not None and not create_new_service:
+                    success, result = self.agol_exporter.export_changes_to_agol(changes, service_title)
+                else:
+                    success, result = self.agol_exporter.export_to_agol(
+                        gh_modified_data,
+                        service_title=service_title,
+                        service_description="Auto-exported from Revit via Grasshopper",
+                        create_new_service=create_new_service
+                    )
                 
                 if success:
                     logger.info(f"✅ Feature service created in AGOL: {result}")
@@ -271,10 +312,9 @@ class RevitGISIntegrationPipeline:
                     geojson = converter.gh_to_geojson(gh_modified_data)
                     export_path.parent.mkdir(parents=True, exist_ok=True)
                     
-                    with open(export_path.with_suffix('.geojson'), 'w') as f:
-                        json.dump(geojson, f, indent=2)
+                    geojson_path = write_json(export_path.with_suffix('.geojson'), geojson)
                     
-                    logger.info(f"✅ Exported to GeoJSON: {export_path.with_suffix('.geojson')}")
+                    logger.info(f"✅ Exported to GeoJSON: {geojson_path}")
                     success = True
                 
                 self.pipeline_log.append({
@@ -298,7 +338,8 @@ class RevitGISIntegrationPipeline:
     
     def run_full_pipeline(self, revit_document: Dict[str, Any], 
                          agol_service_title: str = "Revit-GIS Export",
-                         wait_for_gh_input: Optional[Path] = None) -> Dict[str, Any]:
+                         wait_for_gh_input: Optional[Path] = None,
+                         agol_upsert: bool = False) -> Dict[str, Any]:
         """
         Execute complete pipeline: Revit → GH → AGOL
         
@@ -306,6 +347,8 @@ class RevitGISIntegrationPipeline:
             revit_document: Exported Revit data
             agol_service_title: Title for AGOL feature service
             wait_for_gh_input: Optional path to GH output file
+            agol_upsert: Update the existing service with the changes since
+                         the last publish instead of creating a new one
         
         Returns:
             Pipeline execution report
@@ -348,16 +391,21 @@ class RevitGISIntegrationPipeline:
                 logger.warning(f"⚠️  Timeout waiting for GH output. Continuing with unmodified data...")
                 gh_modified = gh_data
             else:
-                gh_modified = self.step_4_import_grasshopper_modifications(wait_for_gh_input)
-                if gh_modified is None:
+                if self.step_4_import_grasshopper_modifications(wait_for_gh_input) is None:
                     gh_modified = gh_data
+                else:
+                    # Streamed again from the file rather than kept from step 4
+                    gh_modified = read_items(wait_for_gh_input)
         else:
             gh_modified = gh_data
         
         # STEP 5: Export to ArcGIS Online
+        # Without GH edits only the Revit change set needs publishing
         success, result = self.step_5_export_arcgis_online(
             gh_modified, 
-            service_title=agol_service_title
+            service_title=agol_service_title,
+            create_new_service=not agol_upsert,
+            changes=self.change_set if gh_modified is gh_data else None
         )
         
         # Generate report
@@ -393,10 +441,7 @@ class RevitGISIntegrationPipeline:
         
         # Save report
         report_path = self.data_dir / "reports" / f"pipeline_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        report_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(report_path, 'w') as f:
-            json.dump(report, f, indent=2)
+        report_path = write_json(report_path, report)
         
         logger.info(f"\n📋 Report saved: {report_path}")
         
@@ -415,10 +460,17 @@ class RevitGISIntegrationPipeline:
             logger.warning(f"⚠️  Failed steps: {report['summary']['failed_steps']}")
         
         logger.info("="*60 + "\n")
-
-
-# Type hints
-from typing import Tuple
+    
+    def close(self):
+        """Release the sync engine's checkpoint files and the bridge's audit store"""
+        self.sync_engine.close()
+        self.revit_bridge.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
 
 if __name__ == "__main__":
@@ -435,13 +487,12 @@ if __name__ == "__main__":
     }
     
     # Initialize pipeline (without AGOL credentials for demo)
-    pipeline = RevitGISIntegrationPipeline()
-    
-    # Run pipeline
-    report = pipeline.run_full_pipeline(
-        sample_revit_doc,
-        agol_service_title="Demo Building Export"
-    )
-    
-    # Print summary
-    pipeline.print_summary(report)
+    with RevitGISIntegrationPipeline() as pipeline:
+        # Run pipeline
+        report = pipeline.run_full_pipeline(
+            sample_revit_doc,
+            agol_service_title="Demo Building Export"
+        )
+        
+        # Print summary
+        pipeline.print_summary(report)
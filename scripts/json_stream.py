@@ -0,0 +1,202 @@
+"""
+Incremental JSON reading for large exports and GH exchange files
+Yields one element at a time instead of json.load()ing the whole file, so
+memory stays flat and consumers (e.g. SyncEngine imports) overlap with
+parsing
+
+Supported layouts:
+    [item, ...]                                    GH input/output lists
+    {..., "elements": {"walls": [item, ...], ...}}  Revit exports / snapshots
+    {..., "features": [item, ...]}                  geo_exchange documents, GeoJSON
+    one item per line (.ndjson / .jsonl)           NDJSON (see ndjson_exchange)
+
+Other top-level fields are collected in JSONStreamReader.header as they are
+passed. Compressed files (see artifact_io) are decompressed on the fly.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Any, Iterable, Iterator, Optional, Tuple, Union
+
+from artifact_io import open_artifact, find_artifact
+from geo_exchange import CoordinateSidecar, is_binary_document, resolve_feature
+from ndjson_exchange import is_ndjson, iter_records, iter_latest
+
+
+# Characters read per refill; values larger than this are read in growing steps
+CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _Scanner:
+    """Cursor over a text stream, decoding one JSON value at a time"""
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self, size: Optional[int] = None) -> bool:
+        """Append the next chunk to the buffer, dropping consumed text"""
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end), not consumed"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        """Consume the next character, which must be one of chars"""
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expected one of {chars!r}, found {ch or 'end of file'!r}")
+        self.pos += 1
+        return ch
+
+    def value(self) -> Any:
+        """Decode the next complete value"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely cut off at the buffer end: read on (in growing steps)
+                if not self._more(size):
+                    raise
+                size *= 2
+                continue
+            if end == len(self.buf) and self._more():
+                continue  # a number or literal may continue in the next chunk
+            self.pos = end
+            return value
+
+
+def _iter_array(scanner: _Scanner) -> Iterator[Any]:
+    scanner.expect("[")
+    if scanner.peek() == "]":
+        scanner.pos += 1
+        return
+    while True:
+        yield scanner.value()
+        if scanner.expect(",]") == "]":
+            return
+
+
+def _iter_keys(scanner: _Scanner) -> Iterator[str]:
+    """Keys of the object at the cursor; the caller consumes each value"""
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        scanner.pos += 1
+        return
+    while True:
+        key = scanner.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Expected an object key, found {key!r}")
+        scanner.expect(":")
+        yield key
+        if scanner.expect(",}") == "}":
+            return
+
+
+class JSONStreamReader:
+    """
+    Iterate (category, item) pairs of a JSON file without loading it
+
+    category is the "elements" key for Revit exports and None otherwise.
+
+    Example:
+        reader = JSONStreamReader(export_path)
+        for category, element in reader:
+            ...
+        print(reader.header["timestamp"])
+    """
+
+    def __init__(self, path: Union[str, Path], chunk_size: int = CHUNK_SIZE):
+        path = Path(path)
+        self.path = path if path.exists() else (find_artifact(path) or path)
+        self.chunk_size = chunk_size
+        self.header: Dict[str, Any] = {}
+
+    def __iter__(self) -> Iterator[Tuple[Optional[str], Any]]:
+        with open_artifact(self.path, "r") as f:
+            if is_ndjson(self.path):
+                for item in iter_records(f, self.header):
+                    yield None, item
+                return
+
+            scanner = _Scanner(f, self.chunk_size)
+            first = scanner.peek()
+            if first == "[":
+                for item in _iter_array(scanner):
+                    yield None, item
+            elif first == "{":
+                for key in _iter_keys(scanner):
+                    following = scanner.peek()
+                    if key == "elements" and following == "{":
+                        for category in _iter_keys(scanner):
+                            if scanner.peek() == "[":
+                                for item in _iter_array(scanner):
+                                    yield category, item
+                            else:
+                                self.header.setdefault("elements", {})[category] = scanner.value()
+                    elif key == "features" and following == "[":
+                        for item in _iter_array(scanner):
+                            yield None, item
+                    else:
+                        self.header[key] = scanner.value()
+            else:
+                raise ValueError(f"Not a JSON array or object: {self.path}")
+
+
+def iter_items(path: Union[str, Path], resolve: bool = True,
+               chunk_size: int = CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Items of a file in any supported layout, one at a time
+
+    Args:
+        path: JSON / NDJSON file (or its plain name if stored compressed)
+        resolve: Fill in coordinates of geo_exchange documents from the
+                 sidecar (memory-mapped, read per item)
+    """
+    reader = JSONStreamReader(path, chunk_size)
+    sidecar = None
+    try:
+        for _, item in reader:
+            if resolve and is_binary_document(reader.header):
+                if sidecar is None:
+                    sidecar = CoordinateSidecar(reader.path.parent / reader.header["sidecar"])
+                item = resolve_feature(item, sidecar)
+            yield item
+    finally:
+        if sidecar is not None:
+            sidecar.close()
+
+
+def read_items(path: Union[str, Path]) -> Iterable[Dict[str, Any]]:
+    """
+    Items of a GH exchange file for import
+
+    Every layout is streamed; for NDJSON only the latest version of
+    appended objects is yielded (see ndjson_exchange.iter_latest).
+    """
+    if is_ndjson(path):
+        return iter_latest(path)
+    return iter_items(path)
@@ -4,13 +4,21 @@ Handles version tracking, conflict resolution, and data synchronization
 """
 
 import json
-import hashlib
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Iterable, Iterator
 import logging
 
+from metadata_store import MetadataBackend, JSONMetadataBackend, create_metadata_backend
+from object_store import ObjectStore
+from checkpoints import CheckpointStore, CheckpointObjectMap, object_state
+from config import SYNC_CONFIG
+from artifact_io import write_json
+from json_stream import read_items
+from content_hash import (compute_geometry_hash, compute_property_hash, combine_hashes,
+                          compute_content_hash, compute_legacy_hash, set_hash_algorithm)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,6 +27,9 @@ logger = logging.getLogger(__name__)
 class DataObject:
     """Represents a single geometric object with versioning"""
     
+    __slots__ = ("id", "type", "properties", "geometry", "source", "version", "timestamp",
+                 "_hash", "_geometry_hash", "_property_hash")
+    
     def __init__(self, obj_id: str, obj_type: str, properties: Dict[str, Any], 
                  geometry: Dict[str, Any], source: str = "unknown"):
         self.id = obj_id
@@ -28,16 +39,40 @@ class DataObject:
         self.source = source
         self.version = 1
         self.timestamp = datetime.now().isoformat()
-        self.hash = self._compute_hash()
+        self.invalidate_hash()
+    
+    @property
+    def hash(self) -> str:
+        """Content hash, computed on first access and cached"""
+        if self._hash is None:
+            self._hash = self._compute_hash()
+        return self._hash
+    
+    @hash.setter
+    def hash(self, value: str):
+        self._hash = value
+    
+    @property
+    def geometry_hash(self) -> str:
+        if self._geometry_hash is None:
+            self._geometry_hash = compute_geometry_hash(self.geometry)
+        return self._geometry_hash
+    
+    @property
+    def property_hash(self) -> str:
+        if self._property_hash is None:
+            self._property_hash = compute_property_hash(self.properties)
+        return self._property_hash
+    
+    def invalidate_hash(self):
+        """Drop cached hashes (call after mutating properties/geometry in place)"""
+        self._hash = None
+        self._geometry_hash = None
+        self._property_hash = None
     
     def _compute_hash(self) -> str:
         """Compute unique hash of object state"""
-        data = json.dumps({
-            "type": self.type,
-            "properties": self.properties,
-            "geometry": self.geometry
-        }, sort_keys=True)
-        return hashlib.md5(data.encode()).hexdigest()
+        return combine_hashes(self.type, self.property_hash, self.geometry_hash)
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -62,38 +97,52 @@ class DataObject:
         )
         obj.version = data.get("version", 1)
         obj.timestamp = data.get("timestamp", datetime.now().isoformat())
-        obj.hash = data.get("hash", obj._compute_hash())
+        obj.hash = data.get("hash")
         return obj
 
 
 class SyncMetadata:
     """Tracks synchronization state and history"""
     
-    def __init__(self, metadata_file: Path):
+    def __init__(self, metadata_file: Path, backend: Optional[MetadataBackend] = None,
+                 event_log_level: int = logging.DEBUG, event_log_every: int = 1):
+        """
+        Args:
+            metadata_file: metadata.json path (used by the default JSON backend)
+            backend: Storage backend (see metadata_store)
+            event_log_level: Log level for per-object sync events
+            event_log_every: Log only every Nth sync event (0 disables logging)
+        """
         self.metadata_file = metadata_file
+        self.backend = backend or JSONMetadataBackend(metadata_file)
         self.data = self._load()
+        
+        self.event_log_level = event_log_level
+        self.event_log_every = event_log_every
+        self._event_count = 0
+        
+        # Changes since the last save (written incrementally by indexed backends)
+        self._dirty_ids = set()
+        self._deleted_ids = set()
     
     def _load(self) -> Dict[str, Any]:
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r') as f:
-                    return json.load(f)
-            except:
-                logger.warning(f"Failed to load metadata from {self.metadata_file}")
-        
-        return {
-            "version": 1,
-            "created": datetime.now().isoformat(),
-            "objects": {},
-            "sync_history": []
-        }
+        return self.backend.load()
     
     def save(self):
         """Persist metadata to disk"""
-        self.metadata_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.data, f, indent=2)
-        logger.info(f"Metadata saved to {self.metadata_file}")
+        self.backend.save(self.data, self._dirty_ids, self._deleted_ids)
+        logger.info(f"Metadata saved to {self.backend.path} "
+                    f"({len(self._dirty_ids)} objects changed, {self._event_count} sync events)")
+        self._dirty_ids = set()
+        self._deleted_ids = set()
+        self._event_count = 0
+    
+    def export_json(self, filepath: Path):
+        """Write the full metadata (objects + history) as a metadata.json-style file"""
+        data = dict(self.data)
+        data["sync_history"] = self.get_sync_history()
+        filepath = write_json(filepath, data)
+        logger.info(f"Metadata exported to {filepath}")
     
     def register_object(self, obj: DataObject, revit_id: Optional[str] = None):
         """Register object with mapping info"""
@@ -106,10 +155,37 @@ class SyncMetadata:
             "hash": obj.hash,
             "source": obj.source
         }
+        self._dirty_ids.add(obj.id)
+        self._deleted_ids.discard(obj.id)
     
     def get_object_meta(self, obj_id: str) -> Optional[Dict[str, Any]]:
         return self.data["objects"].get(obj_id)
     
+    def rehash_object(self, obj_id: str, obj_hash: str):
+        """Replace the stored content hash of unchanged content (no new version)"""
+        self.data["objects"][obj_id]["hash"] = obj_hash
+        self._dirty_ids.add(obj_id)
+    
+    def unregister_object(self, obj_id: str):
+        """Remove object mapping (element no longer present in source)"""
+        if self.data["objects"].pop(obj_id, None) is not None:
+            self._deleted_ids.add(obj_id)
+            self._dirty_ids.discard(obj_id)
+    
+    def find_objects(self, revit_id: Optional[str] = None,
+                     obj_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Look up object metadata by Revit ID and/or type"""
+        return self.backend.find_objects(self.data, self._dirty_ids, revit_id, obj_type)
+    
+    def flush(self):
+        """Write buffered sync events without saving object metadata"""
+        self.backend.flush_events()
+    
+    def get_sync_history(self, object_id: Optional[str] = None, since: Optional[str] = None,
+                         limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Sync events, optionally for one object and/or since an ISO timestamp"""
+        return self.backend.query_events(object_id, since, limit)
+    
     def add_sync_event(self, event_type: str, obj_id: str, source: str, 
                        target: str, status: str, details: str = ""):
         """Log synchronization event"""
@@ -122,8 +198,12 @@ class SyncMetadata:
             "status": status,
             "details": details
         }
-        self.data["sync_history"].append(event)
-        logger.info(f"Sync event: {event_type} - {source}→{target} [{status}]")
+        self.backend.log_event(event)
+        
+        self._event_count += 1
+        if self.event_log_every and self._event_count % self.event_log_every == 0:
+            logger.log(self.event_log_level,
+                       f"Sync event: {event_type} {obj_id} - {source}→{target} [{status}]")
 
 
 class ConflictResolver:
@@ -167,20 +247,50 @@ class ConflictResolver:
         resolver = self.strategies.get(strategy, self._last_write_wins)
         return resolver(original, revit_version, gh_version)
     
+    def resolve_batch(self, triples: List[Tuple[DataObject, DataObject, DataObject]],
+                      strategy: str = "last_write_wins") -> List[Optional[DataObject]]:
+        """
+        Resolve many (original, revit, gh) triples
+        
+        Resolution is a few hash and timestamp comparisons per triple, so it
+        runs serially: a thread pool only adds overhead under the GIL.
+        
+        Returns the winners in input order (None where manual resolution is needed)
+        """
+        return [self.resolve(*triple, strategy=strategy) for triple in triples]
+    
+    @staticmethod
+    def _has_offset(stamp: str) -> bool:
+        # Time part ("T..." or " ...") carrying Z, +hh:mm or -hh:mm
+        time_part = stamp[10:]
+        return time_part.endswith("Z") or "+" in time_part or "-" in time_part
+    
+    @staticmethod
+    def _parse_timestamp(stamp: str) -> datetime:
+        """ISO timestamp as an aware datetime (naive ones are taken as UTC)"""
+        if stamp.endswith("Z"):
+            stamp = stamp[:-1] + "+00:00"  # fromisoformat only accepts "Z" from Python 3.11
+        parsed = datetime.fromisoformat(stamp)
+        return parsed if parsed.tzinfo is not None else parsed.replace(tzinfo=timezone.utc)
+    
+    @classmethod
+    def _is_newer(cls, a: str, b: str) -> bool:
+        """Compare ISO timestamps, skipping parsing when both are naive and share a format"""
+        if len(a) == len(b) and not cls._has_offset(a) and not cls._has_offset(b):
+            return a > b
+        return cls._parse_timestamp(a) > cls._parse_timestamp(b)
+    
     def _last_write_wins(self, original: DataObject, revit: DataObject, 
                          gh: DataObject) -> DataObject:
         """Most recent modification wins"""
-        revit_time = datetime.fromisoformat(revit.timestamp)
-        gh_time = datetime.fromisoformat(gh.timestamp)
-        
-        winner = revit if revit_time > gh_time else gh
-        logger.warning(f"Conflict resolved using last_write_wins: {winner.source} wins")
+        winner = revit if self._is_newer(revit.timestamp, gh.timestamp) else gh
+        logger.debug(f"Conflict in {original.id} resolved using last_write_wins: {winner.source} wins")
         return winner
     
     def _revit_priority(self, original: DataObject, revit: DataObject, 
                         gh: DataObject) -> DataObject:
         """Revit changes always win"""
-        logger.warning(f"Conflict resolved using revit_priority")
+        logger.debug(f"Conflict in {original.id} resolved using revit_priority")
         return revit
     
     def _manual_resolution(self, original: DataObject, revit: DataObject, 
@@ -190,19 +300,145 @@ class ConflictResolver:
         return None
 
 
+class StreamCheckpointer:
+    """
+    Periodic checkpoints for the SyncEngine streaming API
+    
+    The first checkpoint of a stream is a regular delta (SyncEngine.save_state);
+    later ones only contain the objects changed since the previous one, so
+    each write is proportional to the batch, and finish() chains the
+    remainder as one more delta. After each checkpoint the engine's objects
+    are served from the chain (a lazy CheckpointObjectMap), so a stream only
+    holds the current batch in memory. Compact the chain with
+    SyncEngine.compact_checkpoints.
+    """
+    
+    def __init__(self, engine: "SyncEngine", checkpoint_dir: Optional[Path], interval: int):
+        self.engine = engine
+        self.store = CheckpointStore(checkpoint_dir) if checkpoint_dir is not None else None
+        self.interval = max(1, interval)
+        self.prefix = f"stream_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        self.count = 0
+        self.written: List[Path] = []
+        self._changed: List[str] = []
+        self._removed: List[str] = []
+    
+    def changed(self, obj_id: str):
+        self._changed.append(obj_id)
+    
+    def removed(self, obj_id: str):
+        self._removed.append(obj_id)
+    
+    def tick(self) -> bool:
+        """Count one processed object; True when a checkpoint is due"""
+        self.count += 1
+        return self.count % self.interval == 0
+    
+    def checkpoint(self):
+        if self.store is None or not (self._changed or self._removed):
+            return
+        engine = self.engine
+        path = self.store.checkpoint_dir / f"{self.prefix}_{len(self.written):05d}.ckpt"
+        
+        if not self.written:
+            engine.save_state(path, delta=True)
+        else:
+            objects = {obj_id: engine.objects[obj_id].to_dict()
+                       for obj_id in dict.fromkeys(self._changed) if obj_id in engine.objects}
+            states = {obj_id: object_state(obj) for obj_id, obj in objects.items()}
+            removed = [obj_id for obj_id in self._removed if obj_id not in engine.objects]
+            self.store.write(path, objects, engine.metadata.data, parent=engine.last_checkpoint,
+                             parent_states={}, current_states=states, removed=removed)
+            engine.base_states.update(states)
+            engine.base_hashes.update((obj_id, state[0]) for obj_id, state in states.items())
+            for obj_id in removed:
+                engine.base_states.pop(obj_id, None)
+                engine.base_hashes.pop(obj_id, None)
+            engine.last_checkpoint = path
+        
+        if isinstance(engine.objects, CheckpointObjectMap):
+            engine.objects.extend(path)
+        else:
+            engine.objects = self.store.open_lazy(path, DataObject)
+        
+        engine.metadata.flush()
+        self.written.append(path)
+        self._changed = []
+        self._removed = []
+    
+    def finish(self):
+        """Chain the remaining changes as a last delta"""
+        if self.store is None:
+            return
+        self.checkpoint()
+        if self.written:
+            logger.info(f"Stream checkpointed {self.count} objects in {len(self.written)} "
+                        f"checkpoints ending at {self.written[-1]}")
+
+
 class SyncEngine:
     """Main synchronization engine"""
     
-    def __init__(self, workspace_dir: Path = None):
+    def __init__(self, workspace_dir: Path = None, metadata_backend: str = "json",
+                 compact_storage: bool = False):
+        """
+        Args:
+            workspace_dir: Data directory (defaults to <repo>/data)
+            metadata_backend: "json" (metadata.json) or "sqlite" (indexed metadata.db)
+            compact_storage: Keep objects in a columnar ObjectStore instead of a
+                             dict (much smaller for large models; objects read
+                             back are snapshots)
+        """
         self.workspace_dir = workspace_dir or Path(__file__).parent.parent / "data"
         self.workspace_dir.mkdir(parents=True, exist_ok=True)
         
-        self.metadata = SyncMetadata(self.workspace_dir / ".sync" / "metadata.json")
+        sync_dir = self.workspace_dir / ".sync"
+        self.metadata = SyncMetadata(
+            sync_dir / "metadata.json",
+            backend=create_metadata_backend(metadata_backend, sync_dir)
+        )
         self.conflict_resolver = ConflictResolver()
-        self.objects: Dict[str, DataObject] = {}
+        self.objects: Dict[str, DataObject] = ObjectStore(DataObject) if compact_storage else {}
+        
+        # Content hashes at the last checkpoint: the common base for conflict checks
+        self.base_hashes: Dict[str, str] = {}
+        # (hash, version, source) at the last checkpoint, compared for delta checkpoints
+        self.base_states: Dict[str, Tuple[str, int, str]] = {}
+        self.last_checkpoint: Optional[Path] = None
+        self.last_classification: Dict[str, List[str]] = {}
+        self._load_base_hashes(self.workspace_dir / "checkpoints")
     
-    def import_from_revit(self, revit_data: List[Dict[str, Any]]) -> List[DataObject]:
-        """Import geometry/data from Revit"""
+    def _load_base_hashes(self, checkpoint_dir: Path):
+        """Pick up the base hashes of the latest checkpoint, so a fresh process still detects conflicts"""
+        store = CheckpointStore(checkpoint_dir)
+        latest = store.latest()
+        if latest is None:
+            return
+        try:
+            self._set_base(store.replay_states(latest))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read base hashes from {latest}: {e}")
+            return
+        self.last_checkpoint = latest
+        logger.info(f"Loaded {len(self.base_hashes)} base hashes from {latest}")
+    
+    def import_from_revit(self, revit_data: List[Dict[str, Any]],
+                          incremental: bool = False) -> List[DataObject]:
+        """
+        Import geometry/data from Revit
+        
+        Args:
+            revit_data: Flattened Revit elements
+            incremental: Only re-register elements whose content hash differs
+                         from the stored metadata (see import_changes)
+        
+        Returns:
+            Imported objects (only added/modified ones when incremental)
+        """
+        if incremental:
+            changes = self.import_changes(revit_data)
+            return [self.objects[obj_id] for obj_id in changes["added"] + changes["modified"]]
+        
         imported = []
         
         for item in revit_data:
@@ -225,27 +461,387 @@ class SyncEngine:
         self.metadata.save()
         return imported
     
+    def detect_changes(self, revit_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Classify incoming Revit elements against stored metadata hashes
+        
+        Returns:
+            Dict with "added", "modified", "unchanged" and "removed" ID lists,
+            plus "hashes" (obj_id → content hash) for the incoming elements
+            and "rehashed" (unchanged elements whose legacy hash was replaced).
+            Elements without an "id" are assigned one in place.
+        """
+        known = self.metadata.data["objects"]
+        changes = {"added": [], "modified": [], "unchanged": [], "removed": [], "hashes": {},
+                   "rehashed": []}
+        seen = set()
+        
+        for item in revit_data:
+            obj_id = item.get("id") or str(uuid.uuid4())
+            item["id"] = obj_id
+            seen.add(obj_id)
+            
+            obj_hash = compute_content_hash(
+                item.get("type", "Unknown"),
+                item.get("properties", {}),
+                item.get("geometry", {})
+            )
+            changes["hashes"][obj_id] = obj_hash
+            
+            meta = known.get(obj_id)
+            if meta is None:
+                changes["added"].append(obj_id)
+            elif meta.get("hash") == obj_hash:
+                changes["unchanged"].append(obj_id)
+            elif self._upgrade_legacy_hash(obj_id, meta, obj_hash, item):
+                changes["unchanged"].append(obj_id)
+                changes["rehashed"].append(obj_id)
+            else:
+                changes["modified"].append(obj_id)
+        
+        changes["removed"] = [
+            obj_id for obj_id, meta in known.items()
+            if obj_id not in seen and meta.get("source") == "revit"
+        ]
+        return changes
+    
+    def import_changes(self, revit_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Incremental import from Revit: only touch added/modified/removed elements
+        
+        Unchanged elements keep their version and are not re-registered or
+        logged; they are only materialized if missing from memory.
+        """
+        changes = self.detect_changes(revit_data)
+        added = set(changes["added"])
+        modified = set(changes["modified"])
+        known = self.metadata.data["objects"]
+        
+        for item in revit_data:
+            obj_id = item["id"]
+            if obj_id not in added and obj_id not in modified:
+                if obj_id not in self.objects:
+                    self.objects[obj_id] = self._restore_unchanged(item, known[obj_id])
+                continue
+            
+            obj = DataObject(
+                obj_id=obj_id,
+                obj_type=item.get("type", "Unknown"),
+                properties=item.get("properties", {}),
+                geometry=item.get("geometry", {}),
+                source="revit"
+            )
+            if obj_id in modified:
+                obj.version = known[obj_id].get("version", 1) + 1
+            
+            self.objects[obj_id] = obj
+            self.metadata.register_object(obj, revit_id=item.get("revit_id"))
+            self.metadata.add_sync_event(
+                "update" if obj_id in modified else "import",
+                obj_id, "revit", "local", "success"
+            )
+        
+        for obj_id in changes["removed"]:
+            self.objects.pop(obj_id, None)
+            self.metadata.unregister_object(obj_id)
+            self.metadata.add_sync_event(
+                "delete", obj_id, "revit", "local", "success"
+            )
+        
+        logger.info(f"Incremental import: {len(changes['added'])} added, "
+                    f"{len(changes['modified'])} modified, "
+                    f"{len(changes['unchanged'])} unchanged, "
+                    f"{len(changes['removed'])} removed")
+        
+        if added or modified or changes["removed"] or changes["rehashed"]:
+            self.metadata.save()
+        return changes
+    
+    def apply_snapshot_changes(self, changes: Dict[str, Any]) -> Dict[str, List[str]]:
+        """
+        Apply a snapshot_diff change set (RevitGHBridge.last_changes)
+    
+        Only added/changed elements are hashed and registered, so a small
+        edit to a large model costs time proportional to the edit.
+    
+        Returns:
+            {"imported", "updated", "removed"} object ID lists
+        """
+        result = {"imported": [], "updated": [], "removed": []}
+        for element in changes.get("elements", {}).values():
+            obj, action = self._import_revit_item(element, incremental=True)
+            if action == "import":
+                result["imported"].append(obj.id)
+            elif action == "update":
+                result["updated"].append(obj.id)
+    
+        for obj_id in changes.get("removed", []):
+            if self.metadata.get_object_meta(obj_id) is not None:
+                self._remove_object(obj_id)
+                result["removed"].append(obj_id)
+    
+        logger.info(f"Applied snapshot changes: {len(result['imported'])} imported, "
+                    f"{len(result['updated'])} updated, {len(result['removed'])} removed")
+    
+        if any(result.values()):
+            self.metadata.save()
+        return result
+    
+    def sync_snapshot_changes(self, changes: Dict[str, Any], strategy: str = "last_write_wins",
+                              revit_timestamp: Optional[str] = None) -> Dict[str, List[str]]:
+        """
+        sync_revit_to_gh for a snapshot_diff change set
+        
+        Only the added/changed elements are checked against local edits and
+        imported, and only the removed ones deleted (see apply_snapshot_changes),
+        so unchanged elements are never rehashed. The unchanged objects come
+        from the last checkpoint (see load_base_objects).
+        
+        Returns:
+            {"imported", "updated", "removed"} object ID lists
+        """
+        logger.info("Starting Revit→GH sync from snapshot changes...")
+        self.load_base_objects()
+        revit_timestamp = self._revit_timestamp(revit_timestamp)
+        revit_data = list(changes.get("elements", {}).values())
+        
+        conflicts = self._check_conflicts(revit_data)
+        for obj_id in changes.get("removed", []):
+            local = self.objects.get(obj_id)
+            base = self.base_hashes.get(obj_id)
+            if local is not None and base is not None and local.hash != base:
+                conflicts.append((obj_id, "delete_modify"))
+        local_versions = {obj_id: self.objects[obj_id] for obj_id, _ in conflicts}
+        
+        self._record_sync(revit_timestamp)
+        result = self.apply_snapshot_changes(changes)
+        
+        if conflicts:
+            logger.warning(f"Found {len(conflicts)} conflicts, resolving...")
+            self._resolve_conflicts(conflicts, strategy, revit_data=revit_data,
+                                    local_versions=local_versions, revit_timestamp=revit_timestamp)
+        return result
+    
+    def load_base_objects(self) -> bool:
+        """
+        Make sure self.objects holds the model of the last sync
+        
+        A fresh process only knows the base hashes; it opens the last
+        checkpoint lazily, so exports and delta checkpoints after a change
+        set sync cover the whole model and not just the changed objects.
+        
+        Returns:
+            False if there are no objects and no checkpoint to load them from
+        """
+        if self.objects:
+            return True
+        if self.last_checkpoint is None or not self.last_checkpoint.exists():
+            return False
+        self.load_state(self.last_checkpoint, lazy=True)
+        return True
+    
+    @staticmethod
+    def _restore_unchanged(item: Dict[str, Any], meta: Dict[str, Any]) -> DataObject:
+        """Rebuild an unchanged object from its element + stored metadata"""
+        return DataObject.from_dict({
+            "id": item["id"],
+            "type": item.get("type", "Unknown"),
+            "properties": item.get("properties", {}),
+            "geometry": item.get("geometry", {}),
+            "source": meta.get("source", "revit"),
+            "version": meta.get("version", 1),
+            "timestamp": meta.get("timestamp", datetime.now().isoformat()),
+            "hash": meta.get("hash")
+        })
+    
     def export_to_grasshopper(self) -> List[Dict[str, Any]]:
         """Export objects for Grasshopper consumption"""
-        gh_format = []
-        
-        for obj_id, obj in self.objects.items():
-            meta = self.metadata.get_object_meta(obj_id)
-            gh_format.append({
-                "id": obj.id,
-                "gh_guid": meta.get("gh_guid") if meta else obj.id,
-                "type": obj.type,
-                "properties": obj.properties,
-                "geometry": obj.geometry,
-                "version": obj.version,
-                "timestamp": obj.timestamp
-            })
-        
-        return gh_format
+        return [self._gh_record(obj) for obj in self.objects.values()]
+    
+    def _gh_record(self, obj: DataObject) -> Dict[str, Any]:
+        meta = self.metadata.get_object_meta(obj.id)
+        return {
+            "id": obj.id,
+            "gh_guid": meta.get("gh_guid") if meta else obj.id,
+            "type": obj.type,
+            "properties": obj.properties,
+            "geometry": obj.geometry,
+            "version": obj.version,
+            "timestamp": obj.timestamp
+        }
     
     def import_from_grasshopper(self, gh_data: List[Dict[str, Any]]):
         """Receive modified data from Grasshopper"""
-        for item in gh_data:
+        for _ in self.iter_import_from_grasshopper(gh_data):
+            pass
+    
+    def import_from_file(self, path: Path, source: str = "revit", incremental: bool = False,
+                         checkpoint_dir: Optional[Path] = None) -> int:
+        """
+        Stream a Revit export or GH exchange file into the engine
+        
+        Elements are imported while the file is parsed (see json_stream),
+        so the file is never held in memory as a whole.
+        
+        Args:
+            path: Export, snapshot or GH file in any json_stream layout
+                  (NDJSON yields only the latest version of appended objects)
+            source: "revit" or "grasshopper"
+        
+        Returns:
+            Number of objects imported or updated
+        """
+        items = read_items(path)
+        if source == "revit":
+            imported = self.iter_import_from_revit(items, incremental=incremental,
+                                                   checkpoint_dir=checkpoint_dir)
+        elif source == "grasshopper":
+            imported = self.iter_import_from_grasshopper(items, checkpoint_dir=checkpoint_dir)
+        else:
+            raise ValueError(f"Unknown source: {source}")
+        return sum(1 for _ in imported)
+    
+    def sync_revit_to_gh(self, revit_data: List[Dict[str, Any]], incremental: bool = False,
+                         strategy: str = "last_write_wins",
+                         revit_timestamp: Optional[str] = None):
+        """
+        Full sync: Revit → Local → Grasshopper
+        
+        revit_timestamp (the export header's "timestamp") dates Revit
+        elements that carry none for last-write-wins conflict resolution.
+        """
+        logger.info("Starting Revit→GH sync...")
+        revit_timestamp = self._revit_timestamp(revit_timestamp)
+        
+        # Step 1: Check incoming Revit data against local (GH-edited) state
+        conflicts = self._check_conflicts(revit_data, include_deletions=incremental)
+        local_versions = {obj_id: self.objects[obj_id] for obj_id, _ in conflicts}
+        
+        # Step 2: Import from Revit (saves the metadata, including the sync time)
+        self._record_sync(revit_timestamp)
+        self.import_from_revit(revit_data, incremental=incremental)
+        
+        # Step 3: Resolve conflicts (restores the GH version where it wins)
+        if conflicts:
+            logger.warning(f"Found {len(conflicts)} conflicts, resolving...")
+            self._resolve_conflicts(conflicts, strategy, revit_data=revit_data,
+                                    local_versions=local_versions,
+                                    revit_timestamp=revit_timestamp)
+        
+        # Step 4: Export to GH
+        gh_data = self.export_to_grasshopper()
+        
+        logger.info(f"Sync complete. Exported {len(gh_data)} objects to GH")
+        return gh_data
+    
+    # Streaming API: consume element iterators, yield results as they are
+    # processed and checkpoint every SYNC_CONFIG["checkpoint_interval"] objects
+    
+    def _import_revit_item(self, item: Dict[str, Any], incremental: bool) -> Tuple[DataObject, str]:
+        """
+        Import one Revit element
+        
+        Returns:
+            (object, action) with action "import", "update" or "unchanged"
+            (only when incremental and the content hash matches the metadata)
+        """
+        obj_id = item.get("id") or str(uuid.uuid4())
+        item["id"] = obj_id
+        obj = DataObject(
+            obj_id=obj_id,
+            obj_type=item.get("type", "Unknown"),
+            properties=item.get("properties", {}),
+            geometry=item.get("geometry", {}),
+            source="revit"
+        )
+        
+        action = "import"
+        meta = self.metadata.get_object_meta(obj_id) if incremental else None
+        if meta is not None:
+            if meta.get("hash") == obj.hash or self._upgrade_legacy_hash(obj_id, meta, obj.hash, item):
+                if obj_id not in self.objects:
+                    self.objects[obj_id] = self._restore_unchanged(item, meta)
+                return self.objects[obj_id], "unchanged"
+            obj.version = meta.get("version", 1) + 1
+            action = "update"
+        
+        self.objects[obj_id] = obj
+        self.metadata.register_object(obj, revit_id=item.get("revit_id"))
+        self.metadata.add_sync_event(action, obj_id, "revit", "local", "success")
+        return obj, action
+    
+    def _upgrade_legacy_hash(self, obj_id: str, meta: Dict[str, Any], obj_hash: str,
+                             item: Dict[str, Any]) -> bool:
+        """
+        True if the stored hash is the legacy hash of the element's content
+        (metadata written by older versions); it is replaced by obj_hash, so
+        upgrading doesn't re-version every object
+        """
+        legacy = compute_legacy_hash(item.get("type", "Unknown"), item.get("properties", {}),
+                                     item.get("geometry", {}))
+        if meta.get("hash") != legacy:
+            return False
+        self.metadata.rehash_object(obj_id, obj_hash)
+        return True
+    
+    def _revit_ids(self) -> set:
+        """IDs of the objects last imported from Revit (the ones a complete export can remove)"""
+        return {obj_id for obj_id, meta in self.metadata.data["objects"].items()
+                if meta.get("source") == "revit"}
+    
+    def _remove_object(self, obj_id: str):
+        self.objects.pop(obj_id, None)
+        self.metadata.unregister_object(obj_id)
+        self.metadata.add_sync_event("delete", obj_id, "revit", "local", "success")
+    
+    def _stream_checkpointer(self, checkpoint_dir: Optional[Path],
+                             checkpoint_interval: Optional[int]) -> "StreamCheckpointer":
+        enabled = checkpoint_dir is not None and SYNC_CONFIG["enable_checkpoints"]
+        return StreamCheckpointer(self, checkpoint_dir if enabled else None,
+                                  checkpoint_interval or SYNC_CONFIG["checkpoint_interval"])
+    
+    def iter_import_from_revit(self, revit_elements: Iterable[Dict[str, Any]],
+                               incremental: bool = False,
+                               checkpoint_dir: Optional[Path] = None,
+                               checkpoint_interval: Optional[int] = None) -> Iterator[DataObject]:
+        """
+        Streaming import_from_revit
+        
+        Elements are consumed one at a time, so the input can be a generator.
+        With checkpoint_dir, a delta checkpoint is written every
+        checkpoint_interval objects and self.objects becomes a lazy map over
+        the chain (see StreamCheckpointer); without it every object stays in
+        memory (combine with compact_storage for large models).
+        
+        Yields:
+            Imported objects (only added/modified ones when incremental)
+        """
+        checkpointer = self._stream_checkpointer(checkpoint_dir, checkpoint_interval)
+        unseen = self._revit_ids() if incremental else set()
+        
+        for item in revit_elements:
+            obj, action = self._import_revit_item(item, incremental)
+            unseen.discard(obj.id)
+            if action != "unchanged":
+                checkpointer.changed(obj.id)
+                yield obj
+            if checkpointer.tick():
+                checkpointer.checkpoint()
+        
+        for obj_id in sorted(unseen):
+            self._remove_object(obj_id)
+            checkpointer.removed(obj_id)
+        
+        checkpointer.finish()
+        self.metadata.save()
+    
+    def iter_import_from_grasshopper(self, gh_items: Iterable[Dict[str, Any]],
+                                     checkpoint_dir: Optional[Path] = None,
+                                     checkpoint_interval: Optional[int] = None) -> Iterator[DataObject]:
+        """Streaming import_from_grasshopper, yielding each created/updated object"""
+        checkpointer = self._stream_checkpointer(checkpoint_dir, checkpoint_interval)
+        
+        for item in gh_items:
             obj_id = item.get("id")
             
             if obj_id not in self.objects:
@@ -264,47 +860,253 @@ class SyncEngine:
             else:
                 # Update existing object
                 old_obj = self.objects[obj_id]
-                new_obj = DataObject.from_dict(item)
-                new_obj.source = "grasshopper"
-                new_obj.version = old_obj.version + 1
+                obj = DataObject.from_dict(item)
+                obj.source = "grasshopper"
+                obj.version = old_obj.version + 1
                 
-                self.objects[obj_id] = new_obj
+                self.objects[obj_id] = obj
                 self.metadata.add_sync_event(
                     "update", obj_id, "grasshopper", "local", "success"
                 )
+            
+            checkpointer.changed(obj_id)
+            yield obj
+            if checkpointer.tick():
+                checkpointer.checkpoint()
         
+        checkpointer.finish()
         self.metadata.save()
     
-    def sync_revit_to_gh(self, revit_data: List[Dict[str, Any]]):
-        """Full sync: Revit → Local → Grasshopper"""
-        logger.info("Starting Revit→GH sync...")
+    def iter_sync_revit_to_gh(self, revit_elements: Iterable[Dict[str, Any]],
+                              incremental: bool = False,
+                              strategy: str = "last_write_wins",
+                              checkpoint_dir: Optional[Path] = None,
+                              checkpoint_interval: Optional[int] = None,
+                              revit_timestamp: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming sync_revit_to_gh yielding change records
         
-        # Step 1: Import from Revit
-        self.import_from_revit(revit_data)
+        Each record is the Grasshopper export of a changed object plus an
+        "action" ("import", "update" or "conflict"); removed objects yield
+        {"id", "action": "delete"}. Each object yields at most one record: a
+        locally edited object deleted in Revit yields "conflict" when the
+        local version is kept, otherwise "delete". Conflicts are detected per
+        element against the last checkpoint and resolved in batches before
+        each checkpoint, so only one batch of Revit elements is held at a time.
+        """
+        logger.info("Starting streaming Revit→GH sync...")
+        revit_timestamp = self._revit_timestamp(revit_timestamp)
+        checkpointer = self._stream_checkpointer(checkpoint_dir, checkpoint_interval)
+        unseen = self._revit_ids() if incremental else set()
+        conflicts: List[Tuple[str, str]] = []
+        conflict_items: List[Dict[str, Any]] = []
+        local_versions: Dict[str, DataObject] = {}
         
-        # Step 2: Check for conflicts
-        conflicts = self._check_conflicts()
-        if conflicts:
-            logger.warning(f"Found {len(conflicts)} conflicts, resolving...")
-            self._resolve_conflicts(conflicts)
+        def resolve_pending():
+            if not conflicts:
+                return []
+            self._resolve_conflicts(conflicts, strategy, revit_data=conflict_items,
+                                    local_versions=local_versions, revit_timestamp=revit_timestamp)
+            records = []
+            for obj_id, conflict_type in conflicts:
+                if obj_id in self.objects:
+                    checkpointer.changed(obj_id)  # restored local versions must reach the checkpoint
+                    records.append({**self._gh_record(self.objects[obj_id]), "action": "conflict"})
+                elif conflict_type == "delete_modify":
+                    records.append({"id": obj_id, "action": "delete"})
+            conflicts.clear()
+            conflict_items.clear()
+            local_versions.clear()
+            return records
         
-        # Step 3: Export to GH
-        gh_data = self.export_to_grasshopper()
+        for item in revit_elements:
+            base = self.base_hashes.get(item.get("id"))
+            local = self.objects.get(item["id"]) if base is not None else None
+            
+            obj, action = self._import_revit_item(item, incremental)
+            unseen.discard(obj.id)
+            if action != "unchanged":
+                checkpointer.changed(obj.id)
+                if (local is not None and obj.hash != base
+                        and local.hash != base and obj.hash != local.hash):
+                    conflicts.append((obj.id, "both_changed"))
+                    conflict_items.append(item)
+                    local_versions[obj.id] = local
+                else:
+                    yield {**self._gh_record(obj), "action": action}
+            
+            if checkpointer.tick():
+                yield from resolve_pending()
+                checkpointer.checkpoint()
         
-        logger.info(f"Sync complete. Exported {len(gh_data)} objects to GH")
-        return gh_data
+        yield from resolve_pending()
+        
+        for obj_id in sorted(unseen):
+            local = self.objects.get(obj_id)
+            base = self.base_hashes.get(obj_id)
+            self._remove_object(obj_id)
+            checkpointer.removed(obj_id)
+            if local is not None and base is not None and local.hash != base:
+                # Reported once the conflict is resolved
+                conflicts.append((obj_id, "delete_modify"))
+                local_versions[obj_id] = local
+            else:
+                yield {"id": obj_id, "action": "delete"}
+        yield from resolve_pending()
+        
+        self._record_sync(revit_timestamp)
+        checkpointer.finish()
+        self.metadata.save()
+        logger.info(f"Streaming sync complete: {checkpointer.count} elements processed")
+    
+    def _revit_timestamp(self, revit_timestamp: Optional[str]) -> str:
+        """Export time of the incoming Revit data, else the last sync (Revit changed after it)"""
+        return revit_timestamp or self.metadata.data.get("last_sync") or datetime.now().isoformat()
+    
+    def _record_sync(self, revit_timestamp: str):
+        data = self.metadata.data
+        if not data.get("last_sync") or ConflictResolver._is_newer(revit_timestamp, data["last_sync"]):
+            data["last_sync"] = revit_timestamp
+    
+    def _local_hashes(self) -> Dict[str, str]:
+        if isinstance(self.objects, (ObjectStore, CheckpointObjectMap)):
+            return self.objects.hash_index()
+        return {obj_id: obj.hash for obj_id, obj in self.objects.items()}
+    
+    def _local_states(self) -> Dict[str, Tuple[str, int, str]]:
+        if isinstance(self.objects, (ObjectStore, CheckpointObjectMap)):
+            return self.objects.state_index()
+        return {obj_id: (obj.hash, obj.version, obj.source) for obj_id, obj in self.objects.items()}
     
-    def _check_conflicts(self) -> List[Tuple[str, str]]:
-        """Check for concurrent modifications"""
-        conflicts = []
-        # Placeholder - implement based on actual conflict detection logic
+    def _set_base(self, states: Dict[str, Tuple[str, int, str]]):
+        self.base_states = states
+        self.base_hashes = {obj_id: state[0] for obj_id, state in states.items()}
+    
+    @staticmethod
+    def classify_three_way(base: Dict[str, str], revit: Dict[str, str],
+                           local: Dict[str, str]) -> Dict[str, List[str]]:
+        """
+        Classify objects from three hash indexes (obj_id → content hash)
+        
+        Args:
+            base: Hashes at the last checkpoint (common ancestor)
+            revit: Hashes of the incoming Revit elements
+            local: Hashes of the local objects (including GH edits)
+        
+        Returns:
+            Lists of IDs per class: "only_revit_changed", "only_gh_changed",
+            "both_changed_same", "conflict" (both changed differently or
+            added on both sides with different content) and "delete_modify"
+            (gone from Revit but edited locally)
+        """
+        base_ids = base.keys()
+        revit_changed = {i for i in revit.keys() & base_ids if revit[i] != base[i]}
+        gh_changed = {i for i in local.keys() & base_ids if local[i] != base[i]}
+        both = revit_changed & gh_changed
+        added_both = (revit.keys() & local.keys()) - base_ids
+        
+        conflict = {i for i in both | added_both if revit[i] != local[i]}
+        return {
+            "only_revit_changed": sorted(revit_changed - gh_changed),
+            "only_gh_changed": sorted((gh_changed & revit.keys()) - revit_changed),
+            "both_changed_same": sorted(both - conflict),
+            "conflict": sorted(conflict),
+            "delete_modify": sorted(gh_changed - revit.keys()),
+        }
+    
+    def _check_conflicts(self, revit_data: List[Dict[str, Any]] = None,
+                         include_deletions: bool = False) -> List[Tuple[str, str]]:
+        """
+        Check for concurrent modifications (Revit vs. local GH edits)
+        
+        Builds hash indexes for the checkpoint base, the incoming Revit
+        elements and the local objects and classifies all objects in one
+        pass. The full classification is kept in self.last_classification.
+        include_deletions reports delete/modify conflicts, which only makes
+        sense when revit_data is the complete model (incremental import).
+        """
+        if not revit_data or not self.base_hashes:
+            self.last_classification = {}
+            return []
+        
+        revit_hashes = {}
+        for item in revit_data:
+            obj_id = item.get("id")
+            if obj_id is not None:
+                revit_hashes[obj_id] = compute_content_hash(
+                    item.get("type", "Unknown"),
+                    item.get("properties", {}),
+                    item.get("geometry", {})
+                )
+        
+        self.last_classification = self.classify_three_way(
+            self.base_hashes, revit_hashes, self._local_hashes()
+        )
+        conflicts = [(obj_id, "both_changed") for obj_id in self.last_classification["conflict"]]
+        if include_deletions:
+            conflicts += [(obj_id, "delete_modify") for obj_id in self.last_classification["delete_modify"]]
         return conflicts
     
     def _resolve_conflicts(self, conflicts: List[Tuple[str, str]], 
-                          strategy: str = "last_write_wins"):
-        """Resolve detected conflicts"""
+                          strategy: str = "last_write_wins",
+                          revit_data: List[Dict[str, Any]] = None,
+                          local_versions: Dict[str, DataObject] = None,
+                          revit_timestamp: Optional[str] = None):
+        """
+        Resolve detected conflicts
+        
+        Both-changed conflicts go through ConflictResolver with the given
+        strategy; where the local (GH) version wins, or manual resolution
+        is required, the local version is kept. Revit deletions of locally
+        edited objects only apply unless the strategy is "manual".
+        Revit elements without a "timestamp" are dated revit_timestamp.
+        """
+        local_versions = local_versions or {}
+        revit_items = {item.get("id"): item for item in (revit_data or [])}
+        
+        triples = []
+        for obj_id, conflict_type in conflicts:
+            local = local_versions.get(obj_id)
+            if conflict_type != "both_changed" or local is None or obj_id not in revit_items:
+                continue
+            
+            item = revit_items[obj_id]
+            revit = DataObject(obj_id, item.get("type", "Unknown"), item.get("properties", {}),
+                               item.get("geometry", {}), source="revit")
+            revit.timestamp = item.get("timestamp") or revit_timestamp or revit.timestamp
+            
+            # Only the base hash is known: enough for ConflictResolver.detect_conflict
+            original = DataObject(obj_id, local.type, {}, {}, source="checkpoint")
+            original.hash = self.base_hashes.get(obj_id, "")
+            triples.append((original, revit, local))
+        
+        winners = self.conflict_resolver.resolve_batch(triples, strategy)
+        
+        for (original, revit, local), winner in zip(triples, winners):
+            if winner is None or winner is local:
+                current = self.objects.get(original.id)
+                if current is not None:
+                    local.version = max(local.version, current.version)
+                self.objects[original.id] = local
+            
+            resolution = "manual" if winner is None else f"{winner.source} wins"
+            self.metadata.add_sync_event(
+                "conflict", original.id, "revit", "local",
+                "manual" if winner is None else "resolved", f"{strategy}: {resolution}"
+            )
+        
         for obj_id, conflict_type in conflicts:
-            logger.warning(f"Resolving conflict in {obj_id}: {conflict_type}")
+            if conflict_type != "delete_modify":
+                continue
+            if strategy == "manual" and obj_id in local_versions:
+                self.objects[obj_id] = local_versions[obj_id]
+            self.metadata.add_sync_event(
+                "conflict", obj_id, "revit", "local",
+                "manual" if strategy == "manual" else "resolved", f"{strategy}: delete_modify"
+            )
+        
+        self.metadata.flush()
+        logger.warning(f"Resolved {len(conflicts)} conflicts using {strategy}")
     
     def get_object(self, obj_id: str) -> Optional[DataObject]:
         return self.objects.get(obj_id)
@@ -312,32 +1114,110 @@ class SyncEngine:
     def list_objects(self) -> List[DataObject]:
         return list(self.objects.values())
     
-    def save_state(self, filepath: Path):
-        """Save all objects to file"""
-        data = {
-            "objects": [obj.to_dict() for obj in self.objects.values()],
-            "metadata": self.metadata.data
-        }
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"State saved to {filepath}")
+    def save_state(self, filepath: Path, delta: bool = False, full_every: int = 10):
+        """
+        Save objects to a checkpoint file
+        
+        Args:
+            filepath: Checkpoint file to write
+            delta: Only write objects changed since the previous checkpoint in
+                   the same directory (a full snapshot every `full_every` deltas)
+            full_every: Deltas between full snapshots
+        """
+        if not delta:
+            data = {
+                "objects": [obj.to_dict() for obj in self.objects.values()],
+                "metadata": self.metadata.data
+            }
+            self._set_base({obj["id"]: object_state(obj) for obj in data["objects"]})
+            self._release_checkpoint_files([filepath])
+            CheckpointStore.write_file(filepath, data)
+            self.last_checkpoint = filepath
+            logger.info(f"State saved to {filepath}")
+            return
+        
+        self._release_checkpoint_files([filepath])
+        store = CheckpointStore(filepath.parent, full_every=full_every)
+        parent = self.last_checkpoint
+        if parent is None or parent.parent != filepath.parent or not parent.exists():
+            parent = store.latest()
+        if parent == filepath:
+            parent = None
+        
+        current_states = self._local_states()
+        parent_states = None
+        if store.needs_full(parent):
+            parent = None
+            objects = {obj_id: obj.to_dict() for obj_id, obj in self.objects.items()}
+        else:
+            parent_states = self.base_states if parent == self.last_checkpoint else store.replay_states(parent)
+            objects = {obj_id: self.objects[obj_id].to_dict() for obj_id, state in current_states.items()
+                       if parent_states.get(obj_id) != state}
+        
+        kind = store.write(filepath, objects, self.metadata.data, parent=parent,
+                           parent_states=parent_states, current_states=current_states)
+        self._set_base(current_states)
+        self.last_checkpoint = filepath
+        logger.info(f"State saved to {filepath} ({kind}, {len(objects)} objects written)")
     
-    def load_state(self, filepath: Path):
-        """Load objects from file"""
+    def load_state(self, filepath: Path, lazy: bool = False):
+        """
+        Load objects from a checkpoint file (replaying delta chains)
+        
+        Args:
+            filepath: Checkpoint to load
+            lazy: Replace self.objects with a map that decodes objects on first
+                  access. Cheap for indexed (.ckpt) checkpoints, which are
+                  memory-mapped and only read per object
+        """
         if not filepath.exists():
             logger.warning(f"State file not found: {filepath}")
             return
         
-        with open(filepath, 'r') as f:
-            data = json.load(f)
-        
-        for obj_data in data.get("objects", []):
-            obj = DataObject.from_dict(obj_data)
-            self.objects[obj.id] = obj
+        store = CheckpointStore(filepath.parent)
+        if lazy:
+            if isinstance(self.objects, CheckpointObjectMap):
+                self.objects.close()
+            self.objects = store.open_lazy(filepath, DataObject)
+        else:
+            objects, _ = store.replay(filepath)
+            for obj_data in objects.values():
+                obj = DataObject.from_dict(obj_data)
+                self.objects[obj.id] = obj
+        self._set_base(self._local_states())
+        self.last_checkpoint = filepath
         
-        logger.info(f"State loaded from {filepath}")
-
+        logger.info(f"State loaded from {filepath}" + (" (lazy)" if lazy else ""))
+    
+    def compact_checkpoints(self, checkpoint_dir: Path, remove_old: bool = True) -> List[Path]:
+        """Merge every delta chain in checkpoint_dir into full checkpoints"""
+        store = CheckpointStore(checkpoint_dir)
+        self._release_checkpoint_files(store.checkpoint_files())
+        return store.compact(remove_old=remove_old)
+    
+    def _release_checkpoint_files(self, paths: Iterable[Path]):
+        """
+        Detach a lazily loaded object map from checkpoint files about to be
+        replaced or deleted (Windows can't replace or delete mapped files)
+        """
+        if not isinstance(self.objects, CheckpointObjectMap):
+            return
+        targets = {Path(path).resolve() for path in paths}
+        if any(path.resolve() in targets for path in self.objects.paths()):
+            self.objects.detach()
+            logger.info("Detached lazy objects from checkpoint files being rewritten")
+    
+    def close(self):
+        """Close the lazily loaded checkpoint files and flush buffered sync events"""
+        if isinstance(self.objects, CheckpointObjectMap):
+            self.objects.close()
+        self.metadata.backend.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,399 @@
+"""
+Metadata storage backends for SyncMetadata
+JSON file (default, human-readable) or SQLite (indexed, incremental writes)
+"""
+
+import atexit
+import json
+import sqlite3
+import time
+import weakref
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Callable, Optional, Iterable
+import logging
+
+from artifact_io import read_json, write_json, find_artifact
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+OBJECT_FIELDS = ["gh_guid", "revit_id", "type", "version", "timestamp", "hash", "source"]
+
+# Flush methods of live event buffers, called once more at interpreter exit
+_exit_flushes: List[weakref.WeakMethod] = []
+
+
+def _flush_on_exit(method: Callable[[], None]):
+    _exit_flushes.append(weakref.WeakMethod(method))
+
+
+@atexit.register
+def _flush_all():
+    for ref in _exit_flushes:
+        method = ref()
+        if method is None:
+            continue
+        try:
+            method()
+        except Exception as e:
+            logger.warning(f"Failed to flush sync events at exit: {e}")
+
+
+def _matches(meta: Dict[str, Any], revit_id: Optional[str], obj_type: Optional[str]) -> bool:
+    return ((revit_id is None or meta.get("revit_id") == revit_id)
+            and (obj_type is None or meta.get("type") == obj_type))
+
+
+def empty_metadata() -> Dict[str, Any]:
+    return {
+        "version": 1,
+        "created": datetime.now().isoformat(),
+        "objects": {},
+        "sync_history": []
+    }
+
+
+def _event_matches(event: Dict[str, Any], object_id: Optional[str], since: Optional[str]) -> bool:
+    return ((object_id is None or event.get("object_id") == object_id)
+            and (since is None or event.get("timestamp", "") >= since))
+
+
+class SyncJournal:
+    """
+    Append-only NDJSON sync event log (one compact JSON event per line)
+
+    Events are buffered in memory and appended in batches, so logging an
+    event never rewrites existing history. The buffer is flushed when it
+    holds buffer_size events, when the oldest buffered event is older than
+    flush_interval seconds, and at interpreter exit.
+    """
+
+    def __init__(self, path: Path, buffer_size: int = 1000, flush_interval: float = 5.0):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer: List[str] = []
+        self._buffered_since = 0.0
+        _flush_on_exit(self.flush)
+
+    def append(self, event: Dict[str, Any]):
+        if not self._buffer:
+            self._buffered_since = time.monotonic()
+        self._buffer.append(json.dumps(event, separators=(",", ":")))
+        if (len(self._buffer) >= self.buffer_size
+                or time.monotonic() - self._buffered_since >= self.flush_interval):
+            self.flush()
+
+    def extend(self, events: Iterable[Dict[str, Any]]):
+        for event in events:
+            self.append(event)
+
+    def flush(self):
+        """Write buffered events to disk"""
+        if not self._buffer:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write("\n".join(self._buffer) + "\n")
+        self._buffer = []
+
+    def read(self, object_id: Optional[str] = None, since: Optional[str] = None,
+             limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Scan the journal (oldest first), optionally filtered"""
+        self.flush()
+        events = []
+        if not self.path.exists():
+            return events
+
+        with open(self.path, 'r') as f:
+            for line in f:
+                # Cheap substring check before decoding the line
+                if object_id is not None and object_id not in line:
+                    continue
+                event = json.loads(line)
+                if _event_matches(event, object_id, since):
+                    events.append(event)
+                    if limit is not None and len(events) >= limit:
+                        break
+        return events
+
+
+class MetadataBackend:
+    """Storage interface used by SyncMetadata"""
+
+    def load(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def save(self, data: Dict[str, Any], dirty_ids: Iterable[str],
+             deleted_ids: Iterable[str]):
+        """Persist object changes since the last save and flush buffered events"""
+        raise NotImplementedError
+
+    def log_event(self, event: Dict[str, Any]):
+        """Buffer a sync event (flushed in batches)"""
+        raise NotImplementedError
+
+    def flush_events(self):
+        raise NotImplementedError
+
+    def find_objects(self, data: Dict[str, Any], dirty_ids: Iterable[str],
+                     revit_id: Optional[str] = None,
+                     obj_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Object metadata filtered by revit_id and/or type"""
+        return [
+            meta for meta in data["objects"].values()
+            if _matches(meta, revit_id, obj_type)
+        ]
+
+    def query_events(self, object_id: Optional[str] = None, since: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Sync events filtered by object and/or ISO timestamp (oldest first)"""
+        raise NotImplementedError
+
+    def close(self):
+        self.flush_events()
+
+
+class JSONMetadataBackend(MetadataBackend):
+    """
+    Object metadata in one JSON file (rewritten on every save), sync
+    events in an append-only NDJSON journal next to it
+    """
+
+    def __init__(self, metadata_file: Path, journal: Optional[SyncJournal] = None):
+        self.path = metadata_file
+        self.journal = journal or SyncJournal(metadata_file.with_name("sync_journal.ndjson"))
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """metadata.json as stored (None if missing or unreadable), without migrating it"""
+        if find_artifact(self.path) is None:
+            return None
+        try:
+            return read_json(self.path)
+        except:
+            logger.warning(f"Failed to load metadata from {self.path}")
+            return None
+
+    def load(self) -> Dict[str, Any]:
+        data = self.read()
+        if data is None:
+            return empty_metadata()
+
+        # Older metadata.json files embed the full history: move it to the journal
+        history = data.get("sync_history") or []
+        data["sync_history"] = []
+        if history:
+            self.journal.extend(history)
+            self.save(data, [], [])
+            logger.info(f"Moved {len(history)} sync events to {self.journal.path}")
+        return data
+
+    def save(self, data: Dict[str, Any], dirty_ids: Iterable[str],
+             deleted_ids: Iterable[str]):
+        self.journal.flush()
+        write_json(self.path, data)
+
+    def log_event(self, event: Dict[str, Any]):
+        self.journal.append(event)
+
+    def flush_events(self):
+        self.journal.flush()
+
+    def query_events(self, object_id: Optional[str] = None, since: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self.journal.read(object_id, since, limit)
+
+
+class SQLiteMetadataBackend(MetadataBackend):
+    """
+    SQLite metadata store
+
+    Objects are indexed by gh_guid, revit_id and type; sync events by
+    timestamp and object_id. Saves only write changed objects and new
+    events, in a single transaction. Sync history stays on disk.
+    """
+
+    EVENT_COLUMNS = "timestamp, type, object_id, source, target, status, details"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS info (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS objects (
+            gh_guid TEXT PRIMARY KEY,
+            revit_id TEXT,
+            type TEXT,
+            version INTEGER,
+            timestamp TEXT,
+            hash TEXT,
+            source TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_objects_revit_id ON objects(revit_id);
+        CREATE INDEX IF NOT EXISTS idx_objects_type ON objects(type);
+        CREATE TABLE IF NOT EXISTS sync_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            type TEXT,
+            object_id TEXT,
+            source TEXT,
+            target TEXT,
+            status TEXT,
+            details TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_events_timestamp ON sync_events(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_events_object_id ON sync_events(object_id);
+    """
+
+    def __init__(self, db_file: Path, import_json: Optional[Path] = None,
+                 buffer_size: int = 1000, flush_interval: float = 5.0):
+        """
+        Args:
+            db_file: SQLite database path
+            import_json: Existing metadata.json to migrate when the database is new
+                         (read only; the file is left as it is)
+            buffer_size: Sync events buffered before a batch insert
+            flush_interval: Max seconds an event stays buffered (also flushed at exit)
+        """
+        self.path = db_file
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._event_buffer: List[Dict[str, Any]] = []
+        self._buffered_since = 0.0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.path.exists()
+
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.executescript(self.SCHEMA)
+
+        if is_new and import_json is not None and find_artifact(import_json) is not None:
+            self._import_json(import_json)
+        _flush_on_exit(self.flush_events)
+
+    def _import_json(self, json_file: Path):
+        source = JSONMetadataBackend(json_file)
+        data = source.read() or empty_metadata()
+        # History embedded in older files precedes the journal
+        self._event_buffer = list(data.get("sync_history") or []) + source.query_events()
+        data = {**data, "sync_history": []}
+        self.save(data, data["objects"].keys(), [])
+        logger.info(f"Migrated metadata from {json_file} to {self.path}")
+
+    def load(self) -> Dict[str, Any]:
+        info = dict(self.conn.execute("SELECT key, value FROM info"))
+        data = empty_metadata()
+        data["version"] = int(info.get("version", data["version"]))
+        data["created"] = info.get("created", data["created"])
+        if "last_sync" in info:
+            data["last_sync"] = info["last_sync"]
+
+        cursor = self.conn.execute(f"SELECT {', '.join(OBJECT_FIELDS)} FROM objects")
+        data["objects"] = {row[0]: dict(zip(OBJECT_FIELDS, row)) for row in cursor}
+        return data
+
+    def save(self, data: Dict[str, Any], dirty_ids: Iterable[str],
+             deleted_ids: Iterable[str]):
+        objects = data["objects"]
+        rows = [
+            tuple(objects[obj_id].get(field) for field in OBJECT_FIELDS)
+            for obj_id in dirty_ids if obj_id in objects
+        ]
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO info (key, value) VALUES (?, ?)",
+                [("version", str(data["version"])), ("created", data["created"])]
+                + ([("last_sync", data["last_sync"])] if data.get("last_sync") else [])
+            )
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO objects ({', '.join(OBJECT_FIELDS)}) "
+                f"VALUES ({', '.join('?' * len(OBJECT_FIELDS))})",
+                rows
+            )
+            self.conn.executemany(
+                "DELETE FROM objects WHERE gh_guid = ?",
+                [(obj_id,) for obj_id in deleted_ids]
+            )
+            self._insert_events()
+
+    def _insert_events(self):
+        """Insert buffered events (caller owns the transaction)"""
+        self.conn.executemany(
+            f"INSERT INTO sync_events ({self.EVENT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(e["timestamp"], e["type"], e["object_id"], e["from"], e["to"],
+              e["status"], e.get("details", "")) for e in self._event_buffer]
+        )
+        self._event_buffer = []
+
+    def log_event(self, event: Dict[str, Any]):
+        if not self._event_buffer:
+            self._buffered_since = time.monotonic()
+        self._event_buffer.append(event)
+        if (len(self._event_buffer) >= self.buffer_size
+                or time.monotonic() - self._buffered_since >= self.flush_interval):
+            self.flush_events()
+
+    def flush_events(self):
+        if self._event_buffer:
+            with self.conn:
+                self._insert_events()
+
+    def find_objects(self, data: Dict[str, Any], dirty_ids: Iterable[str],
+                     revit_id: Optional[str] = None,
+                     obj_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if revit_id is not None:
+            clauses.append("revit_id = ?")
+            params.append(revit_id)
+        if obj_type is not None:
+            clauses.append("type = ?")
+            params.append(obj_type)
+
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.conn.execute(f"SELECT gh_guid FROM objects{where}", params)
+
+        # Unsaved (dirty) objects are matched in memory, stored rows via the index
+        objects = data["objects"]
+        dirty = set(dirty_ids)
+        results = [objects[row[0]] for row in cursor if row[0] not in dirty and row[0] in objects]
+        results.extend(
+            objects[obj_id] for obj_id in dirty
+            if obj_id in objects and _matches(objects[obj_id], revit_id, obj_type)
+        )
+        return results
+
+    def query_events(self, object_id: Optional[str] = None, since: Optional[str] = None,
+                     limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        self.flush_events()
+        clauses, params = [], []
+        if object_id is not None:
+            clauses.append("object_id = ?")
+            params.append(object_id)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+
+        query = f"SELECT {self.EVENT_COLUMNS} FROM sync_events"
+        if clauses:
+            query += f" WHERE {' AND '.join(clauses)}"
+        query += " ORDER BY id"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+
+        keys = ["timestamp", "type", "object_id", "from", "to", "status", "details"]
+        return [dict(zip(keys, row)) for row in self.conn.execute(query, params)]
+
+    def close(self):
+        self.flush_events()
+        self.conn.close()
+
+
+def create_metadata_backend(kind: str, sync_dir: Path) -> MetadataBackend:
+    """Backend factory: "json" (metadata.json) or "sqlite" (metadata.db)"""
+    if kind == "json":
+        return JSONMetadataBackend(sync_dir / "metadata.json")
+    if kind == "sqlite":
+        return SQLiteMetadataBackend(sync_dir / "metadata.db", import_json=sync_dir / "metadata.json")
+    raise ValueError(f"Unknown metadata backend: {kind}")
@@ -0,0 +1,312 @@
+"""
+NDJSON exchange format for gh_inputs / gh_outputs
+One object per line, so files can be appended to, split and parsed in
+parallel
+
+Layout of <name>.ndjson:
+    {"format": "revit-gis-ndjson", "version": 1, "timestamp": ..., "chunk_size": ...}
+    {"$chunk": 3}        optional boundary: the next 3 objects form a chunk
+    {"id": ..., ...}
+    ...
+
+Appending writes new lines (and a boundary for the appended batch) without
+touching existing ones. An object appended again supersedes earlier lines
+with the same "id"; iter_latest() and load_objects() keep the latest
+version of each.
+
+Files are written uncompressed so they can be appended to and split into
+byte ranges; compressed files are still read (sequentially).
+"""
+
+import gc
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple, Union
+import logging
+
+from artifact_io import open_artifact, find_artifact, base_path, compression_from_suffix, detect_compression
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+FORMAT_NAME = "revit-gis-ndjson"
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+CHUNK_KEY = "$chunk"
+
+# Below this size a process pool costs more than it saves
+PARALLEL_MIN_BYTES = 8 << 20
+
+
+def is_ndjson(path: Union[str, Path]) -> bool:
+    return base_path(path).suffix in NDJSON_SUFFIXES
+
+
+@contextmanager
+def _gc_paused():
+    """Parsed objects can't form cycles; skip the GC passes triggered by allocating them"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, separators=(",", ":"))
+
+
+def _is_header(obj: Any) -> bool:
+    return isinstance(obj, dict) and obj.get("format") == FORMAT_NAME
+
+
+def _is_boundary(obj: Any) -> bool:
+    return isinstance(obj, dict) and len(obj) == 1 and CHUNK_KEY in obj
+
+
+def _write_lines(f, objects: Iterable[Dict[str, Any]], chunk_size: Optional[int]) -> int:
+    """Write objects (with a boundary before every chunk_size objects), returning the count"""
+    count = 0
+    if not chunk_size:
+        for obj in objects:
+            f.write(_dumps(obj) + "\n")
+            count += 1
+        return count
+
+    batch = []
+    for obj in objects:
+        batch.append(_dumps(obj))
+        if len(batch) == chunk_size:
+            f.write(_dumps({CHUNK_KEY: len(batch)}) + "\n" + "\n".join(batch) + "\n")
+            count += len(batch)
+            batch = []
+    if batch:
+        f.write(_dumps({CHUNK_KEY: len(batch)}) + "\n" + "\n".join(batch) + "\n")
+        count += len(batch)
+    return count
+
+
+def write_objects(path: Union[str, Path], objects: Iterable[Dict[str, Any]],
+                  chunk_size: Optional[int] = None) -> Path:
+    """
+    Write objects as NDJSON (replacing an existing file)
+
+    Args:
+        path: Target file (.ndjson)
+        objects: Objects to write (any iterable, consumed once)
+        chunk_size: Write a chunk boundary before every chunk_size objects
+
+    Returns:
+        The path written
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, 'w', encoding="utf-8") as f:
+        f.write(_dumps({
+            "format": FORMAT_NAME,
+            "version": 1,
+            "timestamp": datetime.now().isoformat(),
+            "chunk_size": chunk_size
+        }) + "\n")
+        _write_lines(f, objects, chunk_size)
+    os.replace(tmp, path)
+    return path
+
+
+def append_objects(path: Union[str, Path], objects: Iterable[Dict[str, Any]]) -> int:
+    """
+    Append objects to an NDJSON file (created if missing) as one new chunk
+
+    Returns:
+        Number of objects appended
+    """
+    path = Path(path)
+    if not path.exists():
+        write_objects(path, [])
+    elif compression_from_suffix(path) or detect_compression(path):
+        raise ValueError(f"Cannot append to a compressed file: {path}")
+
+    objects = list(objects)
+    if not objects:
+        return 0
+    with open(path, 'a', encoding="utf-8") as f:
+        return _write_lines(f, objects, len(objects) if read_header(path).get("chunk_size") else None)
+
+
+def read_header(path: Union[str, Path]) -> Dict[str, Any]:
+    """Header of an NDJSON file ({} for plain NDJSON without one)"""
+    with open_artifact(find_artifact(path) or path, "r") as f:
+        first = f.readline()
+    try:
+        header = json.loads(first) if first.strip() else None
+    except json.JSONDecodeError:
+        return {}
+    return header if _is_header(header) else {}
+
+
+def iter_records(lines: Iterable[str], header: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Objects of NDJSON lines in file order, skipping the header and boundaries
+
+    Args:
+        header: Dict that receives the header fields, if present
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if _is_boundary(obj):
+            continue
+        if _is_header(obj):
+            if header is not None:
+                header.update(obj)
+            continue
+        yield obj
+
+
+def _numbered_records(f) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """(line number, object) of an open NDJSON file, skipping the header and boundaries"""
+    for line_no, line in enumerate(f):
+        if not line.strip():
+            continue
+        obj = json.loads(line)
+        if not _is_boundary(obj) and not _is_header(obj):
+            yield line_no, obj
+
+
+def iter_latest(path: Union[str, Path]) -> Iterator[Dict[str, Any]]:
+    """
+    Stream the objects of an NDJSON file, skipping superseded versions
+
+    A first pass notes the last line of every ID (only the IDs are kept),
+    the second yields each object from that line. Unlike latest_by_id,
+    an appended object comes at the position of its latest version.
+    """
+    path = Path(path)
+    if not path.exists():
+        path = find_artifact(path) or path
+    last = {}
+    with _gc_paused(), open_artifact(path, "r") as f:
+        for line_no, obj in _numbered_records(f):
+            last[obj.get("id", line_no)] = line_no
+    with open_artifact(path, "r") as f:
+        for line_no, obj in _numbered_records(f):
+            if last[obj.get("id", line_no)] == line_no:
+                yield obj
+
+
+def iter_chunks(path: Union[str, Path]) -> Iterator[List[Dict[str, Any]]]:
+    """Objects grouped by the file's chunk boundaries (one chunk if there are none)"""
+    chunk = []
+    with open_artifact(find_artifact(path) or path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            obj = json.loads(line)
+            if _is_header(obj):
+                continue
+            if _is_boundary(obj):
+                if chunk:
+                    yield chunk
+                chunk = []
+                continue
+            chunk.append(obj)
+    if chunk:
+        yield chunk
+
+
+def _parse_range(path: str, start: int, end: int) -> List[Dict[str, Any]]:
+    """Objects on lines starting within [start, end) (runs in a worker process)"""
+    result = []
+    with _gc_paused(), open(path, 'rb') as f:
+        if start > 0:
+            # Skip the line that began in the previous range
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell()
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            if line.strip():
+                obj = json.loads(line)
+                if not _is_boundary(obj) and not _is_header(obj):
+                    result.append(obj)
+    return result
+
+
+def _byte_ranges(size: int, parts: int) -> List[Tuple[int, int]]:
+    step = -(-size // parts)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def latest_by_id(objects: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep the last version of each ID, at the position the ID first appeared"""
+    latest = {}
+    for i, obj in enumerate(objects):
+        latest[obj.get("id", i)] = obj
+    return list(latest.values())
+
+
+def _pool_usable() -> bool:
+    """
+    Whether worker processes can run _parse_range: they start sys.executable
+    and import this module by name, which fails when the host isn't a Python
+    interpreter (e.g. Rhino) or the module was exec'd from a download
+    (github_loader)
+    """
+    executable = os.path.basename(sys.executable or "").lower()
+    return executable.startswith("python") and os.path.isfile(globals().get("__file__") or "")
+
+
+def load_objects(path: Union[str, Path], workers: Optional[int] = None,
+                 latest: bool = True) -> List[Dict[str, Any]]:
+    """
+    Load all objects of an NDJSON file into a list
+
+    Uncompressed files of PARALLEL_MIN_BYTES or more are split into
+    newline-aligned byte ranges parsed by a process pool; results keep file
+    order. Smaller files, compressed ones and hosts where worker processes
+    can't import this module (see _pool_usable) are parsed in-process, as
+    is the whole file if the pool fails.
+
+    Args:
+        path: NDJSON file
+        workers: Worker processes (None uses every CPU, 1 parses in-process)
+        latest: Drop superseded versions of appended objects
+    """
+    path = Path(path)
+    if not path.exists():
+        path = find_artifact(path) or path
+    workers = workers or os.cpu_count() or 1
+    size = path.stat().st_size
+
+    objects = None
+    if (workers > 1 and size >= PARALLEL_MIN_BYTES and not detect_compression(path)
+            and _pool_usable()):
+        ranges = _byte_ranges(size, workers * 4)
+        try:
+            with _gc_paused(), ProcessPoolExecutor(max_workers=workers) as pool:
+                objects = []
+                for part in pool.map(_parse_range, [str(path)] * len(ranges),
+                                     [start for start, _ in ranges], [end for _, end in ranges]):
+                    objects.extend(part)
+        except Exception as e:
+            logger.warning(f"Parallel parsing of {path} failed ({type(e).__name__}: {e}), "
+                           f"parsing in-process")
+            objects = None
+
+    if objects is None:
+        with _gc_paused(), open_artifact(path, "r") as f:
+            objects = list(iter_records(f))
+
+    return latest_by_id(objects) if latest else objects
@@ -0,0 +1,456 @@
+"""
+Columnar in-memory storage for DataObjects
+Keeps large models compact: scalar fields in typed arrays, coordinates in
+one contiguous float buffer and repeated property values interned
+"""
+
+from array import array
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+# Sentinel for columns whose value lives in the per-row fallback dict
+RAW = -1
+
+# Property cell kinds (one byte per property value)
+KIND_STR, KIND_FLOAT, KIND_INT, KIND_BOOL, KIND_NONE, KIND_OBJECT = range(6)
+
+# Unsigned code columns widen to the next typecode when a code doesn't fit
+WIDER = {"B": "H", "H": "I", "I": "Q"}
+
+# Compact automatically once dead rows outnumber live ones (and this many)
+AUTO_COMPACT_MIN_DEAD = 4096
+
+
+class _Interner:
+    """Maps repeated values to small integer codes (and back)"""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.codes: Dict[Any, int] = {}
+
+    def code(self, value: Any) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.values.append(value)
+            self.codes[value] = code
+        return code
+
+
+class _IdIndex:
+    """
+    Open-addressing hash table obj_id → row, kept in an int64 array
+
+    Avoids a dict entry plus a boxed int per object; keys are compared
+    against the store's id column.
+    """
+
+    EMPTY = -1
+    DELETED = -2
+
+    def __init__(self, ids: List[Optional[str]], capacity: int = 8):
+        self._ids = ids
+        self._slots = array("q", [self.EMPTY]) * capacity
+        self._filled = 0   # live + deleted slots
+        self.count = 0
+
+    def _find(self, obj_id: str) -> int:
+        """Slot holding obj_id, or the first free slot for it"""
+        mask = len(self._slots) - 1
+        i = hash(obj_id) & mask
+        free = None
+        while True:
+            row = self._slots[i]
+            if row == self.EMPTY:
+                return i if free is None else free
+            if row == self.DELETED:
+                if free is None:
+                    free = i
+            elif self._ids[row] == obj_id:
+                return i
+            i = (i + 1) & mask
+
+    def get(self, obj_id: str) -> Optional[int]:
+        row = self._slots[self._find(obj_id)]
+        return row if row >= 0 else None
+
+    def set(self, obj_id: str, row: int):
+        if (self._filled + 1) * 3 >= len(self._slots) * 2:
+            self._resize()
+        i = self._find(obj_id)
+        old = self._slots[i]
+        if old < 0:
+            self.count += 1
+            if old == self.EMPTY:
+                self._filled += 1
+        self._slots[i] = row
+
+    def pop(self, obj_id: str) -> Optional[int]:
+        i = self._find(obj_id)
+        row = self._slots[i]
+        if row < 0:
+            return None
+        self._slots[i] = self.DELETED
+        self.count -= 1
+        return row
+
+    def _resize(self):
+        live = [row for row in self._slots if row >= 0]
+        capacity = 8
+        while capacity * 2 <= len(live) * 3 + 3:
+            capacity *= 2
+        self._slots = array("q", [self.EMPTY]) * capacity
+        self._filled = self.count = 0
+        for row in live:
+            self.set(self._ids[row], row)
+
+
+def _encode_coordinates(coords: Any, flat: array) -> Optional[Any]:
+    """
+    Flatten nested coordinate lists into `flat`, returning a hashable shape
+
+    A leaf list of numbers becomes a string of type codes ("f" float,
+    "i" int), e.g. "ff" for [0.5, 1.0]; nested lists become tuples of
+    their children's shapes. Returns None if the value is not a pure
+    numeric nesting (caller then stores the geometry as-is).
+    """
+    if not isinstance(coords, list):
+        return None
+    if coords and all(isinstance(c, list) for c in coords):
+        shapes = []
+        for child in coords:
+            shape = _encode_coordinates(child, flat)
+            if shape is None:
+                return None
+            shapes.append(shape)
+        return tuple(shapes)
+
+    kinds = []
+    for c in coords:
+        if type(c) is float:
+            kinds.append("f")
+        elif type(c) is int and abs(c) <= 2 ** 53:
+            kinds.append("i")
+        else:
+            return None
+    flat.extend(coords)
+    return "".join(kinds)
+
+
+def _decode_coordinates(shape: Any, flat: array, pos: int) -> Tuple[list, int]:
+    if isinstance(shape, str):
+        values = []
+        for kind in shape:
+            value = flat[pos]
+            values.append(int(value) if kind == "i" else value)
+            pos += 1
+        return values, pos
+
+    result = []
+    for child in shape:
+        value, pos = _decode_coordinates(child, flat, pos)
+        result.append(value)
+    return result, pos
+
+
+class ObjectStore(MutableMapping):
+    """
+    Dict-compatible columnar container for DataObjects (obj_id → DataObject)
+
+    Objects are decomposed on insert and rebuilt on access, so values read
+    from the store are copies. In-place changes are NOT persisted:
+
+        obj = store[obj_id]
+        obj.version += 1
+        store[obj_id] = obj     # write back
+
+    Exact ints/floats and key order are preserved, and values that don't
+    fit the columns (geometry that isn't plain numeric coordinates,
+    non-int versions) are stored as-is. Iteration follows insertion order;
+    replacing an object moves it last. Replaced and removed objects leave
+    dead rows, which are compacted away once they outnumber live ones.
+
+    The saving depends on how repetitive the data is, since only repeated
+    strings are shared. Measured with tracemalloc on 50k walls (7
+    properties, 2-point LineString): about 1330 -> 380 bytes/object (3.5x
+    smaller than a dict of DataObjects) when names repeat, and 1390 -> 510
+    (2.7x) with a unique name and Revit ID per wall.
+    """
+
+    def __init__(self, object_class: type, hash_width: int = 16):
+        """
+        Args:
+            object_class: Class used to rebuild rows (merge_engine.DataObject)
+            hash_width: Digest size in bytes of the content hashes (16 for every
+                        merge_engine hash algorithm)
+        """
+        self.object_class = object_class
+        self.hash_width = hash_width
+
+        # One entry per row (rows of removed/replaced objects become None)
+        self._ids: List[Optional[str]] = []
+        self._index = _IdIndex(self._ids)
+
+        self._types = array("H")           # widened when codes don't fit (see WIDER)
+        self._sources = array("B")
+        self._versions = array("I")
+        self._timestamps = array("q")      # microseconds since EPOCH (naive)
+        self._hashes = bytearray()         # fixed-width binary digests
+        self._geom_types = array("h")
+        self._shapes = array("i")
+        self._coord_offsets = array("Q")
+        self._coords = array("d")
+
+        # Properties: interned key tuple per row, one (kind, value) cell per value
+        self._prop_keys = array("i")
+        self._prop_offsets = array("Q")
+        self._prop_kinds = bytearray()
+        self._prop_cells = array("d")
+        self._prop_objects: List[Any] = []
+
+        # Rare cases that don't fit the columns: row → {field: raw value}
+        self._raw: Dict[int, Dict[str, Any]] = {}
+
+        self._type_table = _Interner()
+        self._source_table = _Interner()
+        self._geom_type_table = _Interner()
+        self._shape_table = _Interner()
+        self._key_table = _Interner()
+        self._string_table = _Interner()
+
+    def __len__(self) -> int:
+        return self._index.count
+
+    def __iter__(self) -> Iterator[str]:
+        return (obj_id for obj_id in self._ids if obj_id is not None)
+
+    def __contains__(self, obj_id: object) -> bool:
+        return isinstance(obj_id, str) and self._index.get(obj_id) is not None
+
+    def __getitem__(self, obj_id: str):
+        row = self._index.get(obj_id)
+        if row is None:
+            raise KeyError(obj_id)
+        return self._materialize(row)
+
+    def __setitem__(self, obj_id: str, obj):
+        old_row = self._index.pop(obj_id)
+        if old_row is not None:
+            self._kill(old_row)
+        self._index.set(obj_id, self._append(obj_id, obj))
+        if old_row is not None:
+            self._maybe_compact()
+
+    def __delitem__(self, obj_id: str):
+        row = self._index.pop(obj_id)
+        if row is None:
+            raise KeyError(obj_id)
+        self._kill(row)
+        self._maybe_compact()
+
+    def _kill(self, row: int):
+        self._ids[row] = None
+        self._raw.pop(row, None)
+
+    def _maybe_compact(self):
+        dead = self.dead_rows()
+        if dead >= AUTO_COMPACT_MIN_DEAD and dead > len(self):
+            self.compact()
+
+    def _append_code(self, name: str, code: int):
+        """Append to an unsigned code column, widening its typecode if needed"""
+        column = getattr(self, name)
+        try:
+            column.append(code)
+        except OverflowError:
+            typecode = column.typecode
+            while True:
+                typecode = WIDER[typecode]
+                if code < 1 << (8 * array(typecode).itemsize):
+                    break
+            column = array(typecode, column)
+            column.append(code)
+            setattr(self, name, column)
+
+    def _append_property(self, value: Any):
+        kind = type(value)
+        if kind is str:
+            self._prop_kinds.append(KIND_STR)
+            self._prop_cells.append(self._string_table.code(value))
+        elif kind is float:
+            self._prop_kinds.append(KIND_FLOAT)
+            self._prop_cells.append(value)
+        elif kind is int and abs(value) <= 2 ** 53:
+            self._prop_kinds.append(KIND_INT)
+            self._prop_cells.append(value)
+        elif kind is bool:
+            self._prop_kinds.append(KIND_BOOL)
+            self._prop_cells.append(value)
+        elif value is None:
+            self._prop_kinds.append(KIND_NONE)
+            self._prop_cells.append(0)
+        else:
+            self._prop_kinds.append(KIND_OBJECT)
+            self._prop_cells.append(len(self._prop_objects))
+            self._prop_objects.append(value)
+
+    def _property_value(self, cell: int) -> Any:
+        kind = self._prop_kinds[cell]
+        value = self._prop_cells[cell]
+        if kind == KIND_STR:
+            return self._string_table.values[int(value)]
+        if kind == KIND_FLOAT:
+            return value
+        if kind == KIND_INT:
+            return int(value)
+        if kind == KIND_BOOL:
+            return bool(value)
+        if kind == KIND_NONE:
+            return None
+        return self._prop_objects[int(value)]
+
+    def _append(self, obj_id: str, obj) -> int:
+        row = len(self._ids)
+        raw = {}
+
+        self._ids.append(obj_id)
+        self._append_code("_types", self._type_table.code(obj.type))
+        self._append_code("_sources", self._source_table.code(obj.source))
+        if type(obj.version) is int and 0 <= obj.version < 1 << 32:
+            self._versions.append(obj.version)
+        else:
+            self._versions.append(0)
+            raw["version"] = obj.version
+
+        try:
+            stamp = datetime.fromisoformat(obj.timestamp)
+            self._timestamps.append((stamp - EPOCH) // MICROSECOND)
+            if stamp.isoformat() != obj.timestamp:
+                raw["timestamp"] = obj.timestamp  # non-canonical or tz-aware string
+        except (TypeError, ValueError):
+            self._timestamps.append(0)
+            raw["timestamp"] = obj.timestamp
+
+        try:
+            digest = bytes.fromhex(obj.hash)
+        except (TypeError, ValueError):
+            digest = None
+        if digest is None or len(digest) != self.hash_width:
+            raw["hash"] = obj.hash
+            digest = bytes(self.hash_width)
+        self._hashes.extend(digest)
+
+        # Geometry: {"type": ..., "coordinates": [...]} goes into the float buffer
+        geometry = obj.geometry
+        self._coord_offsets.append(len(self._coords))
+        shape = None
+        if isinstance(geometry, dict) and list(geometry) == ["type", "coordinates"]:
+            start = len(self._coords)
+            shape = _encode_coordinates(geometry["coordinates"], self._coords)
+            if shape is None:
+                del self._coords[start:]
+
+        if shape is None:
+            self._geom_types.append(RAW)
+            self._shapes.append(RAW)
+            raw["geometry"] = geometry
+        else:
+            self._geom_types.append(self._geom_type_table.code(geometry["type"]))
+            self._shapes.append(self._shape_table.code(shape))
+
+        # Properties: shared key tuple + typed value cells
+        self._prop_offsets.append(len(self._prop_cells))
+        if isinstance(obj.properties, dict):
+            self._prop_keys.append(self._key_table.code(tuple(obj.properties)))
+            for value in obj.properties.values():
+                self._append_property(value)
+        else:
+            self._prop_keys.append(RAW)
+            raw["properties"] = obj.properties
+
+        if raw:
+            self._raw[row] = raw
+        return row
+
+    def _materialize(self, row: int):
+        raw = self._raw.get(row, {})
+
+        if "geometry" in raw:
+            geometry = raw["geometry"]
+        else:
+            coords, _ = _decode_coordinates(
+                self._shape_table.values[self._shapes[row]], self._coords, self._coord_offsets[row]
+            )
+            geometry = {"type": self._geom_type_table.values[self._geom_types[row]], "coordinates": coords}
+
+        if "properties" in raw:
+            properties = raw["properties"]
+        else:
+            keys = self._key_table.values[self._prop_keys[row]]
+            start = self._prop_offsets[row]
+            properties = {key: self._property_value(start + i) for i, key in enumerate(keys)}
+
+        obj = self.object_class(
+            self._ids[row],
+            self._type_table.values[self._types[row]],
+            properties,
+            geometry,
+            self._source_table.values[self._sources[row]]
+        )
+        obj.version = raw["version"] if "version" in raw else self._versions[row]
+
+        if "timestamp" in raw:
+            obj.timestamp = raw["timestamp"]
+        else:
+            obj.timestamp = (EPOCH + self._timestamps[row] * MICROSECOND).isoformat()
+
+        if "hash" in raw:
+            obj.hash = raw["hash"]
+        else:
+            width = self.hash_width
+            obj.hash = self._hashes[row * width:(row + 1) * width].hex()
+
+        return obj
+
+    def hash_index(self) -> Dict[str, str]:
+        """obj_id → content hash, without rebuilding objects"""
+        width = self.hash_width
+        index = {}
+        for row, obj_id in enumerate(self._ids):
+            if obj_id is None:
+                continue
+            raw = self._raw.get(row)
+            if raw is not None and "hash" in raw:
+                index[obj_id] = raw["hash"]
+            else:
+                index[obj_id] = self._hashes[row * width:(row + 1) * width].hex()
+        return index
+
+    def state_index(self) -> Dict[str, Tuple[str, Any, str]]:
+        """obj_id → (content hash, version, source), without rebuilding objects"""
+        hashes = self.hash_index()
+        sources = self._source_table.values
+        index = {}
+        for row, obj_id in enumerate(self._ids):
+            if obj_id is None:
+                continue
+            raw = self._raw.get(row, {})
+            version = raw["version"] if "version" in raw else self._versions[row]
+            index[obj_id] = (hashes[obj_id], version, sources[self._sources[row]])
+        return index
+
+    def dead_rows(self) -> int:
+        """Rows left behind by removed or replaced objects"""
+        return len(self._ids) - len(self)
+
+    def compact(self):
+        """Rebuild the columns without dead rows"""
+        live = [self._materialize(row) for row, obj_id in enumerate(self._ids) if obj_id is not None]
+        self.__init__(self.object_class, self.hash_width)
+        for obj in live:
+            self[obj.id] = obj
@@ -5,130 +5,409 @@ Can be run as IronPython in Revit or standalone Python with RevitAPI
 """
 
 import json
+import os
+import threading
 import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Tuple, Callable
 from datetime import datetime
+import logging
+
+from config import SUPPORTED_ELEMENTS, EXPORT_GENERALIZATION, REVIT_IMPORT_CONFIG
+from geometry_tools import Generalizer
+from json_stream import read_items
+from artifact_io import (read_json, write_json, write_text, dumps, find_artifact, artifact_path,
+                         open_artifact, compression_from_suffix, remove_other_variants)
+from audit_store import AuditStore
+from snapshot_diff import SnapshotDiffer, load_index, save_index, summarize, element_hashes
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CategoryExporter:
+    """
+    Declarative converter for one Revit element category
+    
+    Args:
+        collection: Key of the element list in the Revit document and export
+        id_prefix: Prefix of the stable element IDs (see RevitExporter.element_id)
+        element_type: Exported "type" (overridable per element via type_key)
+        geometry_type: GeoJSON geometry type
+        geometry_key: Element field holding the coordinates
+        properties: (property, default) pairs copied from the element
+        covers: SUPPORTED_ELEMENTS handled by this category
+        type_key: Element field holding the element type, if it varies
+        geometry_default: Coordinates used when geometry_key is missing
+    """
+    
+    def __init__(self, collection: str, id_prefix: str, element_type: str,
+                 geometry_type: str, geometry_key: str,
+                 properties: List[Tuple[str, Any]], covers: List[str] = None,
+                 type_key: str = None, geometry_default: Any = None):
+        self.collection = collection
+        self.id_prefix = id_prefix
+        self.element_type = element_type
+        self.geometry_type = geometry_type
+        self.geometry_key = geometry_key
+        self.properties = properties
+        self.covers = covers or [element_type]
+        self.type_key = type_key
+        self.geometry_default = geometry_default if geometry_default is not None else []
+    
+    def convert(self, exporter: "RevitExporter", elem: Dict[str, Any]) -> Dict[str, Any]:
+        revit_id = elem.get("id")
+        geometry = {
+            "type": self.geometry_type,
+            "coordinates": elem.get(self.geometry_key, self.geometry_default)
+        }
+        if exporter.generalizer is not None:
+            geometry = exporter.generalizer(geometry)
+        return {
+            "id": exporter.element_id(self.id_prefix, revit_id),
+            "revit_id": revit_id,
+            "type": elem.get(self.type_key, self.element_type) if self.type_key else self.element_type,
+            "properties": {name: elem.get(name, default) for name, default in self.properties},
+            "geometry": geometry
+        }
+
+
+# collection → exporter, in export order
+CATEGORY_EXPORTERS: Dict[str, CategoryExporter] = {}
+
+
+def register_category(exporter: CategoryExporter) -> CategoryExporter:
+    CATEGORY_EXPORTERS[exporter.collection] = exporter
+    return exporter
+
+
+register_category(CategoryExporter(
+    "walls", "wall", "Wall", "LineString", "curve_points",
+    [("name", "Unknown Wall"), ("length", None), ("height", None),
+     ("material", "Default"), ("level", None)]
+))
+register_category(CategoryExporter(
+    "openings", "opening", "Opening", "Point", "position",
+    [("name", None), ("width", None), ("height", None), ("family_type", None)],
+    covers=["Door", "Window"], type_key="element_type", geometry_default=[0, 0]
+))
+register_category(CategoryExporter(
+    "floors", "floor", "Floor", "Polygon", "boundary_points",
+    [("name", None), ("level", None), ("thickness", None), ("material", None)]
+))
+register_category(CategoryExporter(
+    "roofs", "roof", "Roof", "Polygon", "boundary_points",
+    [("name", None), ("level", None), ("thickness", None), ("slope", None), ("material", None)]
+))
+register_category(CategoryExporter(
+    "columns", "column", "Column", "Point", "position",
+    [("name", None), ("level", None), ("height", None), ("family_type", None), ("material", None)],
+    geometry_default=[0, 0]
+))
+register_category(CategoryExporter(
+    "beams", "beam", "Beam", "LineString", "curve_points",
+    [("name", None), ("level", None), ("length", None), ("family_type", None), ("material", None)]
+))
+register_category(CategoryExporter(
+    "ramps", "ramp", "Ramp", "Polygon", "boundary_points",
+    [("name", None), ("level", None), ("width", None), ("slope", None)]
+))
+register_category(CategoryExporter(
+    "stairs", "stair", "Stairs", "Polygon", "boundary_points",
+    [("name", None), ("base_level", None), ("top_level", None), ("width", None), ("riser_count", None)]
+))
+
+_uncovered = set(SUPPORTED_ELEMENTS) - {t for e in CATEGORY_EXPORTERS.values() for t in e.covers}
+if _uncovered:
+    logger.warning(f"No exporter registered for: {', '.join(sorted(_uncovered))}")
+
+
+class ExportStreamWriter:
+    """
+    Writes an export document (same JSON layout as export_all) element by
+    element to one or more sinks at once
+
+    Each element is serialized once and written to every sink. Path sinks
+    are written (compressed per IO_CONFIG) to a temporary file and only
+    replace the target on a successful close; file-like sinks are written
+    to as-is. self.paths lists the files produced.
+    """
+
+    def __init__(self, sinks: List[Any]):
+        self._files = []
+        self._owned = []  # (temporary path, target path)
+        self.paths: List[Path] = []
+        for sink in sinks:
+            if isinstance(sink, (str, Path)):
+                target = artifact_path(sink)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = target.with_name(target.name + ".tmp")
+                self._files.append(open_artifact(tmp_path, "w", compression=compression_from_suffix(target)))
+                self._owned.append((tmp_path, target))
+                self.paths.append(target)
+            else:
+                self._files.append(sink)
+        self._first_category = True
+        self._first_element = True
+
+    def _write(self, text: str):
+        for f in self._files:
+            f.write(text)
+
+    def begin(self, header: Dict[str, Any]):
+        """Write the top-level fields and open the elements object"""
+        fields = "".join(f'  {json.dumps(key)}: {json.dumps(value)},\n' for key, value in header.items())
+        self._write("{\n" + fields + '  "elements": {')
+
+    def begin_category(self, name: str):
+        self._write(("" if self._first_category else ",") + f"\n    {json.dumps(name)}: [")
+        self._first_category = False
+        self._first_element = True
+
+    def write_batch(self, elements: List[Dict[str, Any]]):
+        if not elements:
+            return
+        sep = "\n      " if self._first_element else ",\n      "
+        self._write(sep + ",\n      ".join(json.dumps(elem) for elem in elements))
+        self._first_element = False
+
+    def end_category(self):
+        self._write("]" if self._first_element else "\n    ]")
+
+    def close(self, commit: bool = True):
+        """Finish the document; with commit=False temporary files are discarded"""
+        if commit:
+            self._write("\n  }\n}\n")
+        for (tmp_path, target), f in zip(self._owned, self._files):
+            f.close()
+            if commit:
+                os.replace(tmp_path, target)
+                remove_other_variants(target)
+            else:
+                tmp_path.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None)
 
 
 class RevitExporter:
     """Exports Revit elements to JSON format for Grasshopper"""
     
-    def __init__(self, output_dir: Path = None):
+    def __init__(self, output_dir: Path = None, id_map_file: Path = None,
+                 generalizer: Optional[Generalizer] = None):
+        """
+        Args:
+            output_dir: Export directory (defaults to data/revit_exports)
+            id_map_file: Persisted revit_id → gh_id map
+            generalizer: Geometry simplification/quantization applied to every
+                         element (defaults to config.EXPORT_GENERALIZATION)
+        """
         self.output_dir = output_dir or Path(__file__).parent.parent / "data" / "revit_exports"
         self.output_dir.mkdir(parents=True, exist_ok=True)
-    
-    def export_walls(self, revit_elements: List[Any]) -> List[Dict[str, Any]]:
-        """Extract walls from Revit"""
-        walls = []
         
-        for elem in revit_elements:
+        # Persisted "<category>:<revit_id>" → gh_id map keeps IDs stable across exports
+        self.id_map_file = id_map_file or self.output_dir.parent / ".sync" / "id_map.json"
+        self.id_map = self._load_id_map()
+        self._assigned_ids = set(self.id_map.values())
+        self._revit_ids: Dict[str, str] = {}  # gh_id → revit_id, rebuilt when the map grows
+        self._id_map_dirty = False
+        self._id_lock = threading.Lock()
+        self.generalizer = generalizer or Generalizer.from_config(EXPORT_GENERALIZATION)
+        
+        # Per-element failures of the last export: {"category", "revit_id", "error"}
+        self.errors: List[Dict[str, Any]] = []
+    
+    def _load_id_map(self) -> Dict[str, str]:
+        if find_artifact(self.id_map_file) is not None:
             try:
-                wall = {
-                    "id": f"wall_{str(uuid.uuid4())[:8]}",
-                    "revit_id": elem.get("id"),
-                    "type": "Wall",
-                    "properties": {
-                        "name": elem.get("name", "Unknown Wall"),
-                        "length": elem.get("length"),
-                        "height": elem.get("height"),
-                        "material": elem.get("material", "Default"),
-                        "level": elem.get("level")
-                    },
-                    "geometry": {
-                        "type": "LineString",
-                        "coordinates": elem.get("curve_points", [])
-                    }
-                }
-                walls.append(wall)
+                return read_json(self.id_map_file)
             except Exception as e:
-                print(f"Error exporting wall: {e}")
-        
-        return walls
+                print(f"Failed to load ID map from {self.id_map_file}: {e}")
+        return {}
     
-    def export_doors_windows(self, revit_elements: List[Any]) -> List[Dict[str, Any]]:
-        """Extract openings (doors/windows) from Revit"""
-        openings = []
+    def save_id_map(self):
+        """Persist the revit_id → gh_id map (only if new IDs were assigned)"""
+        if not self._id_map_dirty:
+            return
+        write_json(self.id_map_file, self.id_map)
+        self._id_map_dirty = False
+    
+    def element_id(self, category: str, revit_id: Any) -> str:
+        """
+        Stable ID for a Revit element, e.g. wall_1a2b3c4d
+        
+        Derived from category + revit_id so the same element keeps its ID on
+        every export. Elements without a revit_id get a random ID.
+        """
+        if revit_id is None:
+            return f"{category}_{str(uuid.uuid4())[:8]}"
         
+        key = f"{category}:{revit_id}"
+        gh_id = self.id_map.get(key)
+        if gh_id is not None:
+            return gh_id
+        
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        with self._id_lock:  # categories may be exported concurrently
+            gh_id = self.id_map.get(key)
+            if gh_id is not None:
+                return gh_id
+            
+            length = 8
+            gh_id = f"{category}_{digest[:length]}"
+            while gh_id in self._assigned_ids:
+                # Extremely rare prefix collision: lengthen instead of reusing
+                length += 4
+                gh_id = f"{category}_{digest[:length]}"
+            
+            self.id_map[key] = gh_id
+            self._assigned_ids.add(gh_id)
+            self._id_map_dirty = True
+        return gh_id
+    
+    def revit_id_of(self, gh_id: Any) -> Optional[str]:
+        """revit_id an element ID was derived from (None for random or unknown IDs)"""
+        if len(self._revit_ids) != len(self.id_map):
+            self._revit_ids = {value: key.split(":", 1)[1] for key, value in self.id_map.items()}
+        return self._revit_ids.get(gh_id)
+    
+    def _iter_records(self, category: CategoryExporter, revit_elements: Iterable[Any],
+                      errors: List[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+        """Convert elements, collecting failures in `errors` instead of raising"""
         for elem in revit_elements:
             try:
-                opening = {
-                    "id": f"opening_{str(uuid.uuid4())[:8]}",
-                    "revit_id": elem.get("id"),
-                    "type": elem.get("element_type", "Opening"),
-                    "properties": {
-                        "name": elem.get("name"),
-                        "width": elem.get("width"),
-                        "height": elem.get("height"),
-                        "family_type": elem.get("family_type")
-                    },
-                    "geometry": {
-                        "type": "Point",
-                        "coordinates": elem.get("position", [0, 0])
-                    }
-                }
-                openings.append(opening)
+                yield category.convert(self, elem)
             except Exception as e:
-                print(f"Error exporting opening: {e}")
-        
-        return openings
+                revit_id = elem.get("id") if isinstance(elem, dict) else None
+                errors.append({"category": category.collection, "revit_id": revit_id, "error": str(e)})
+    
+    def export_category(self, collection: str, revit_elements: Iterable[Any],
+                        errors: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Extract one registered category (see CATEGORY_EXPORTERS)"""
+        errors = self.errors if errors is None else errors
+        return list(self._iter_records(CATEGORY_EXPORTERS[collection], revit_elements, errors))
+    
+    def export_walls(self, revit_elements: List[Any]) -> List[Dict[str, Any]]:
+        """Extract walls from Revit"""
+        return self.export_category("walls", revit_elements)
+    
+    def export_doors_windows(self, revit_elements: List[Any]) -> List[Dict[str, Any]]:
+        """Extract openings (doors/windows) from Revit"""
+        return self.export_category("openings", revit_elements)
     
     def export_floors(self, revit_elements: List[Any]) -> List[Dict[str, Any]]:
         """Extract floors from Revit"""
-        floors = []
-        
-        for elem in revit_elements:
-            try:
-                floor = {
-                    "id": f"floor_{str(uuid.uuid4())[:8]}",
-                    "revit_id": elem.get("id"),
-                    "type": "Floor",
-                    "properties": {
-                        "name": elem.get("name"),
-                        "level": elem.get("level"),
-                        "thickness": elem.get("thickness"),
-                        "material": elem.get("material")
-                    },
-                    "geometry": {
-                        "type": "Polygon",
-                        "coordinates": elem.get("boundary_points", [])
-                    }
-                }
-                floors.append(floor)
-            except Exception as e:
-                print(f"Error exporting floor: {e}")
-        
-        return floors
+        return self.export_category("floors", revit_elements)
     
-    def export_all(self, revit_document: Dict[str, Any]) -> Dict[str, Any]:
-        """Complete export of all relevant Revit elements"""
-        
-        export_data = {
+    def _report_errors(self):
+        if not self.errors:
+            return
+        by_category = {}
+        for error in self.errors:
+            by_category[error["category"]] = by_category.get(error["category"], 0) + 1
+        summary = ", ".join(f"{count} {name}" for name, count in by_category.items())
+        print(f"⚠️  {len(self.errors)} elements failed to export ({summary}); "
+              f"first error: {self.errors[0]['error']}")
+    
+    def _export_header(self, revit_document: Dict[str, Any]) -> Dict[str, Any]:
+        return {
             "timestamp": datetime.now().isoformat(),
             "revit_file": revit_document.get("file_path"),
             "project_name": revit_document.get("project_name"),
             "coordinate_system": {
                 "epsg": revit_document.get("epsg_code", "EPSG:32633"),  # Default to UTM 33N
                 "origin": revit_document.get("origin_point", [0, 0, 0])
-            },
-            "elements": {
-                "walls": self.export_walls(revit_document.get("walls", [])),
-                "openings": self.export_doors_windows(revit_document.get("openings", [])),
-                "floors": self.export_floors(revit_document.get("floors", []))
             }
         }
+    
+    def export_all(self, revit_document: Dict[str, Any], workers: int = 1) -> Dict[str, Any]:
+        """
+        Complete export of all relevant Revit elements
         
+        Every registered category is exported, on a thread pool when
+        workers > 1. Conversion is pure Python and holds the GIL, so threads
+        only pay off when reading elements from the document blocks (e.g. a
+        live Revit API). Per-element failures are collected in self.errors.
+        """
+        self.errors = []
+        collections = list(CATEGORY_EXPORTERS)
+        errors = {collection: [] for collection in collections}
+        
+        def export_one(collection):
+            return self.export_category(collection, revit_document.get(collection, []),
+                                        errors[collection])
+        
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(export_one, collections))
+        else:
+            results = [export_one(collection) for collection in collections]
+        
+        export_data = self._export_header(revit_document)
+        export_data["elements"] = dict(zip(collections, results))
+        for collection in collections:
+            self.errors.extend(errors[collection])
+        self._report_errors()
+        
+        self.save_id_map()
         return export_data
     
-    def save_export(self, data: Dict[str, Any], filename: str = None) -> Path:
-        """Save exported data to JSON file"""
-        if filename is None:
-            filename = f"revit_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    def export_stream(self, revit_document: Dict[str, Any], sinks: List[Any],
+                      batch_size: int = 1000,
+                      on_record: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Streaming export_all: write elements to every sink as they are converted
         
-        filepath = self.output_dir / filename
+        Element lists in revit_document may be iterators; only one batch of
+        converted elements is held in memory.
         
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=2)
+        Args:
+            revit_document: Same input as export_all
+            sinks: Output paths and/or writable text files
+            batch_size: Elements converted before each write
+            on_record: Called with (category, element) for every element written
+        
+        Returns:
+            Export header plus "counts" (category → elements written) and
+            "errors" (number of elements that failed, see self.errors)
+        """
+        header = self._export_header(revit_document)
+        counts = {}
+        self.errors = []
+        
+        with ExportStreamWriter(sinks) as writer:
+            writer.begin(header)
+            for name, category in CATEGORY_EXPORTERS.items():
+                writer.begin_category(name)
+                count = 0
+                batch = []
+                for record in self._iter_records(category, revit_document.get(name, []), self.errors):
+                    if on_record is not None:
+                        on_record(name, record)
+                    batch.append(record)
+                    if len(batch) >= batch_size:
+                        writer.write_batch(batch)
+                        count += len(batch)
+                        batch = []
+                writer.write_batch(batch)
+                counts[name] = count + len(batch)
+                writer.end_category()
+        
+        self._report_errors()
+        self.save_id_map()
+        return {**header, "counts": counts, "errors": len(self.errors)}
+    
+    def export_filename(self) -> str:
+        return f"revit_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    
+    def save_export(self, data: Dict[str, Any], filename: str = None) -> Path:
+        """Save exported data to JSON file"""
+        filepath = write_json(self.output_dir / (filename or self.export_filename()), data)
         
         print(f"Export saved to: {filepath}")
         return filepath
@@ -137,26 +416,127 @@ class RevitExporter:
 class RevitImporter:
     """Imports modified GH data back into Revit format"""
     
-    def __init__(self):
-        pass
+    OPERATIONS = ("create", "update", "delete")
+    
+    def __init__(self, chunk_size: int = None,
+                 revit_id_of: Optional[Callable[[Any], Optional[str]]] = None):
+        """
+        Args:
+            chunk_size: Max updates per chunk (default REVIT_IMPORT_CONFIG)
+            revit_id_of: Element ID → revit_id lookup for objects and snapshot
+                         entries without one (RevitExporter.revit_id_of)
+        """
+        self.chunk_size = chunk_size or REVIT_IMPORT_CONFIG["chunk_size"]
+        self.revit_id_of = revit_id_of
+    
+    @staticmethod
+    def category_of(obj_type: Optional[str]) -> str:
+        """Export collection for an element type ("other" if none covers it)"""
+        for category, exporter in CATEGORY_EXPORTERS.items():
+            if obj_type in exporter.covers:
+                return category
+        return "other"
     
-    def prepare_for_revit(self, gh_modified_data: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Convert GH output to Revit-compatible format"""
+    def classify(self, obj: Dict[str, Any],
+                 snapshot_index: Optional[Dict[str, List[Any]]]) -> Tuple[Optional[str], str, Optional[Dict[str, Any]]]:
+        """
+        (operation, category, update) for one GH object
         
-        revit_updates = {
-            "timestamp": datetime.now().isoformat(),
-            "updates": []
+        operation is None for objects matching the snapshot and for objects
+        created and deleted within GH (nothing to do in Revit). Objects are
+        matched to Revit elements by revit_id, falling back to their element
+        ID (snapshot entry or revit_id_of); only unmatched ones are created.
+        Entries of legacy indexes ([category, geometry hash, attribute hash])
+        can't confirm unchanged attributes, so they become updates.
+        """
+        entry = snapshot_index.get(obj.get("id")) if snapshot_index is not None else None
+        revit_id = obj.get("revit_id")
+        legacy = entry is not None and len(entry) < 4
+        if entry is not None:
+            category = entry[0]
+            if revit_id is None and not legacy:
+                revit_id = entry[3]
+        else:
+            category = self.category_of(obj.get("type"))
+        if revit_id is None and self.revit_id_of is not None:
+            revit_id = self.revit_id_of(obj.get("id"))
+        known = entry is not None or revit_id is not None
+        
+        if obj.get("deleted"):
+            if not known:
+                return None, category, None
+            return "delete", category, {"id": obj.get("id"), "revit_id": revit_id,
+                                        "type": obj.get("type"), "operation": "delete"}
+        
+        changed = ["geometry", "properties"]
+        if entry is not None:
+            geometry_hash, attribute_hash = element_hashes({**obj, "revit_id": revit_id})
+            changed = [part for part, same in (("geometry", geometry_hash == entry[1]),
+                                               ("properties", attribute_hash == entry[2] and not legacy))
+                       if not same]
+            if not changed:
+                return None, category, None
+        
+        # Without a snapshot nothing is known to be new: keep the old "update"
+        operation = "create" if not known and snapshot_index is not None else "update"
+        return operation, category, {
+            "id": obj.get("id"),
+            "revit_id": revit_id,
+            "type": obj.get("type"),
+            "geometry": obj.get("geometry"),
+            "properties": obj.get("properties"),
+            "operation": operation,
+            "changed": changed
         }
+    
+    def prepare_for_revit(self, gh_modified_data: Iterable[Dict[str, Any]],
+                          snapshot_index: Optional[Dict[str, List[Any]]] = None) -> Dict[str, Any]:
+        """
+        Convert GH output to Revit operations, skipping unchanged objects
+        
+        Args:
+            gh_modified_data: GH objects (soft-deleted ones carry "deleted")
+            snapshot_index: Hash index of the last Revit snapshot
+                            (snapshot_diff.load_index); None treats every
+                            object as modified
+        
+        Returns:
+            {"timestamp", "counts", "updates", "chunks"} where updates is
+            ordered by chunk and each chunk is {"category", "operation",
+            "start", "count"}: a slice of at most chunk_size updates of one
+            category and operation that Revit can apply in one transaction
+        """
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        counts = {operation: 0 for operation in self.OPERATIONS}
+        counts["unchanged"] = 0
         
         for obj in gh_modified_data:
-            update = {
-                "revit_id": obj.get("revit_id"),
-                "type": obj.get("type"),
-                "geometry": obj.get("geometry"),
-                "properties": obj.get("properties"),
-                "operation": "update"
-            }
-            revit_updates["updates"].append(update)
+            operation, category, update = self.classify(obj, snapshot_index)
+            if operation is None:
+                counts["unchanged"] += 1
+                continue
+            counts[operation] += 1
+            groups.setdefault((category, operation), []).append(update)
+        
+        revit_updates = {
+            "timestamp": datetime.now().isoformat(),
+            "counts": counts,
+            "updates": [],
+            "chunks": []
+        }
+        order = {category: i for i, category in enumerate(CATEGORY_EXPORTERS)}
+        for category, operation in sorted(groups, key=lambda key: (self.OPERATIONS.index(key[1]),
+                                                                   order.get(key[0], len(order)))):
+            updates = groups[(category, operation)]
+            for start in range(0, len(updates), self.chunk_size):
+                chunk = updates[start:start + self.chunk_size]
+                revit_updates["chunks"].append({
+                    "category": category,
+                    "operation": operation,
+                    "start": len(revit_updates["updates"]),
+                    "count": len(chunk)
+                })
+                revit_updates["updates"].extend(chunk)
         
         return revit_updates
 
@@ -167,44 +547,119 @@ class RevitGHBridge:
     def __init__(self, workspace_dir: Path = None):
         self.workspace_dir = workspace_dir or Path(__file__).parent.parent
         self.exporter = RevitExporter()
-        self.importer = RevitImporter()
+        self.importer = RevitImporter(revit_id_of=self.exporter.revit_id_of)
         
         self.data_dir = self.workspace_dir / "data"
         self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.snapshot_path = self.data_dir / "revit_snapshot.json"
+        self.changes_path = self.data_dir / "revit_changes.json"
+        
+        # Change set of the last export against the previous snapshot
+        self.last_changes: Optional[Dict[str, Any]] = None
+        
+        # Rotating, indexed record of GH imports
+        self.audit = AuditStore(self.data_dir / "audit")
+        self._migrate_legacy_imports()
+    
+    def _migrate_legacy_imports(self):
+        """Move per-import gh_import_*.json files of older versions into the audit store"""
+        legacy = sorted(self.data_dir.glob("gh_import_*.json"))
+        migrated = 0
+        for path in legacy:
+            try:
+                revit_updates = read_json(path)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable legacy import {path.name}: {e}")
+                continue
+            if revit_updates.get("updates"):
+                self.audit.record_import(revit_updates)
+            path.unlink()
+            migrated += 1
+        if migrated:
+            logger.info(f"Migrated {migrated} legacy GH import files into the audit store")
+    
+    def close(self):
+        """Close the audit store index"""
+        self.audit.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    @staticmethod
+    def _count_summary(counts: Dict[str, int]) -> str:
+        return ", ".join(f"{count} {name}" for name, count in counts.items() if count) or "0 elements"
+    
+    def _finish_diff(self, differ: SnapshotDiffer):
+        """Store the new snapshot index and change set (see snapshot_diff)"""
+        save_index(self.snapshot_path, differ.index)
+        self.last_changes = differ.result()
+        write_json(self.changes_path, self.last_changes)
+        print(f"🔍 Changes since last export: {summarize(self.last_changes)}")
     
     def export_from_revit(self, revit_doc: Dict[str, Any]) -> Dict[str, Any]:
         """Export from Revit, save to disk, return data"""
         print("📤 Exporting from Revit...")
         
         export_data = self.exporter.export_all(revit_doc)
-        export_path = self.exporter.save_export(export_data)
+        differ = SnapshotDiffer(load_index(self.snapshot_path))
+        for category, elements in export_data["elements"].items():
+            for element in elements:
+                differ.add(category, element)
         
-        # Also save a "current" snapshot for conflict detection
-        snapshot_path = self.data_dir / "revit_snapshot.json"
-        with open(snapshot_path, 'w') as f:
-            json.dump(export_data, f, indent=2)
+        # Serialize once, write the export and the "current" snapshot (for
+        # conflict detection) from the same text
+        text = dumps(export_data)
+        export_path = write_text(self.exporter.output_dir / self.exporter.export_filename(), text)
+        write_text(self.snapshot_path, text)
+        print(f"Export saved to: {export_path}")
         
-        print(f"✅ Exported {len(export_data['elements']['walls'])} walls, "
-              f"{len(export_data['elements']['openings'])} openings, "
-              f"{len(export_data['elements']['floors'])} floors")
+        print(f"✅ Exported {self._count_summary({k: len(v) for k, v in export_data['elements'].items()})}")
+        self._finish_diff(differ)
         
         return export_data
     
+    def export_from_revit_stream(self, revit_doc: Dict[str, Any],
+                                 batch_size: int = 1000) -> Dict[str, Any]:
+        """
+        Streaming export_from_revit for very large models
+        
+        Writes the export file and the snapshot in one pass without keeping
+        element lists in memory (the snapshot diff only keeps changed
+        elements). Returns the export header with per-category "counts" and
+        the "export_path".
+        """
+        print("📤 Streaming export from Revit...")
+        
+        differ = SnapshotDiffer(load_index(self.snapshot_path))
+        export_path = artifact_path(self.exporter.output_dir / self.exporter.export_filename())
+        summary = self.exporter.export_stream(revit_doc, [export_path, self.snapshot_path],
+                                              batch_size=batch_size, on_record=differ.add)
+        summary["export_path"] = str(export_path)
+        
+        print(f"✅ Exported {self._count_summary(summary['counts'])} to {export_path}")
+        self._finish_diff(differ)
+        
+        return summary
+    
     def import_from_grasshopper(self, gh_data_path: Path) -> Dict[str, Any]:
         """Load GH modifications and prepare for Revit"""
         print("📥 Importing from Grasshopper...")
         
-        with open(gh_data_path, 'r') as f:
-            gh_data = json.load(f)
-        
-        revit_updates = self.importer.prepare_for_revit(gh_data)
+        # Objects are classified as they are parsed
+        revit_updates = self.importer.prepare_for_revit(read_items(gh_data_path),
+                                                        load_index(self.snapshot_path))
+        counts = revit_updates["counts"]
         
-        # Save for audit trail
-        audit_path = self.data_dir / f"gh_import_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        with open(audit_path, 'w') as f:
-            json.dump(revit_updates, f, indent=2)
+        # Audit trail (deltas only)
+        if revit_updates["updates"]:
+            revit_updates["import_id"] = self.audit.record_import(revit_updates)
         
-        print(f"✅ Imported {len(revit_updates['updates'])} modifications from GH")
+        print(f"✅ Imported {len(revit_updates['updates'])} modifications from GH "
+              f"({counts['create']} create, {counts['update']} update, {counts['delete']} delete, "
+              f"{counts['unchanged']} unchanged) in {len(revit_updates['chunks'])} chunks")
         
         return revit_updates
 
@@ -0,0 +1,142 @@
+"""
+Diffs between successive Revit exports
+Compares a new export with the previous revit_snapshot by stable element ID
+and content hashes, producing a compact change set:
+
+    {"timestamp", "baseline", "full_export", "counts",
+     "added", "removed", "geometry_changed", "attribute_changed",  # ID lists
+     "elements": {id: element}}  # only added and changed elements
+
+Without a previous snapshot (first export) nothing is collected: the change
+set only has "full_export": True and the element count as "added", as the
+export itself is the change.
+
+The previous snapshot's hashes are kept in a small index next to it
+(revit_snapshot.index.json), so only the new export has to be hashed.
+Index entries are [category, geometry hash, attribute hash, revit_id].
+"""
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+from content_hash import compute_geometry_hash, compute_attribute_hash
+from artifact_io import read_json, write_json, find_artifact, base_path
+
+CHANGE_KINDS = ("added", "removed", "geometry_changed", "attribute_changed")
+
+
+def element_hashes(element: Dict[str, Any]) -> Tuple[str, str]:
+    """(geometry hash, attribute hash) of an exported element"""
+    attribute_hash = compute_attribute_hash(
+        element.get("type", "Unknown"), element.get("properties", {}), element.get("revit_id")
+    )
+    return compute_geometry_hash(element.get("geometry", {})), attribute_hash
+
+
+def index_path(snapshot_path: Path) -> Path:
+    base = base_path(snapshot_path)
+    return base.with_name(f"{Path(base.stem).stem}.index.json")
+
+
+def index_entry(category: str, element: Dict[str, Any]) -> List[Any]:
+    return [category, *element_hashes(element), element.get("revit_id")]
+
+
+def build_index(export_data: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """element ID → [category, geometry hash, attribute hash, revit_id]"""
+    index = {}
+    for category, elements in export_data.get("elements", {}).items():
+        for element in elements:
+            index[element["id"]] = index_entry(category, element)
+    return index
+
+
+def load_index(snapshot_path: Path) -> Optional[Dict[str, List[Any]]]:
+    """Hash index of the current snapshot (rebuilt from it if the index is missing)"""
+    if find_artifact(index_path(snapshot_path)) is not None:
+        return read_json(index_path(snapshot_path))
+    if find_artifact(snapshot_path) is not None:
+        return build_index(read_json(snapshot_path))
+    return None
+
+
+def save_index(snapshot_path: Path, index: Dict[str, List[Any]]) -> Path:
+    return write_json(index_path(snapshot_path), index, compact=True)
+
+
+class SnapshotDiffer:
+    """
+    Incremental differ: feed the new export element by element
+
+    Memory is the new hash index plus the changed elements, so it can run
+    alongside a streaming export.
+    """
+
+    def __init__(self, previous: Optional[Dict[str, List[Any]]]):
+        """
+        Args:
+            previous: Hash index of the previous snapshot (None: first export,
+                      every element counts as added but none is kept)
+        """
+        self.previous = previous or {}
+        self.baseline = previous is not None
+        self.index: Dict[str, List[Any]] = {}
+        self.changes: Dict[str, List[str]] = {kind: [] for kind in CHANGE_KINDS}
+        self.elements: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, category: str, element: Dict[str, Any]):
+        elem_id = element["id"]
+        entry = index_entry(category, element)
+        self.index[elem_id] = entry
+        geometry_hash, attribute_hash = entry[1], entry[2]
+
+        if not self.baseline:
+            return
+        old = self.previous.get(elem_id)
+        if old is None:
+            self.changes["added"].append(elem_id)
+        else:
+            changed = False
+            if old[1] != geometry_hash:
+                self.changes["geometry_changed"].append(elem_id)
+                changed = True
+            if old[2] != attribute_hash:
+                self.changes["attribute_changed"].append(elem_id)
+                changed = True
+            if not changed:
+                return
+        self.elements[elem_id] = element
+
+    def result(self) -> Dict[str, Any]:
+        """The change set (removed = previous IDs not seen in the new export)"""
+        self.changes["removed"] = [elem_id for elem_id in self.previous if elem_id not in self.index]
+        counts = {kind: len(ids) for kind, ids in self.changes.items()}
+        if self.baseline:
+            counts["unchanged"] = len(self.index) - len(self.elements)
+        else:
+            counts.update(added=len(self.index), unchanged=0)
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "baseline": self.baseline,
+            "full_export": not self.baseline,
+            "counts": counts,
+            **self.changes,
+            "elements": self.elements
+        }
+
+
+def diff_exports(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Change set between two export_all results (previous may be None)"""
+    differ = SnapshotDiffer(build_index(previous) if previous is not None else None)
+    for category, elements in current.get("elements", {}).items():
+        for element in elements:
+            differ.add(category, element)
+    return differ.result()
+
+
+def summarize(changes: Dict[str, Any]) -> str:
+    counts = changes["counts"]
+    return (f"{counts['added']} added, {counts['removed']} removed, "
+            f"{counts['geometry_changed']} geometry changed, "
+            f"{counts['attribute_changed']} attribute changed, {counts['unchanged']} unchanged")